@@ -1,24 +1,32 @@
 """
-Document upload → immediate embeddings → return count
-No vector store, no chunking, no persistence.
+Document upload → background ingestion job → poll status / SSE progress
+Files are saved to disk and ingested by the ingestion queue workers.
+Ingested documents are listed and deleted through the per-namespace catalog.
 """
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from app.core.config import settings
 from typing import Optional, List
 from pathlib import Path
+import aiofiles
+import asyncio
+import json
 import uuid
 import logging
 
-from langchain_core.documents import Document
-from app.services.langchain_service import langchain_service  # uses your Gemini embeddings
+from app.core.document_manifest import get_document_manifest
+from app.services.digest_service import digest_store
+from app.services.ingestion_jobs import TERMINAL_STATUSES, ingestion_queue, namespace_status
+from app.utils.helpers import sanitize_filename
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = Path("./data/uploads")
 MAX_FILE_SIZE = 10 * 1024 * 1024      # 10 MB
-ALLOWED_EXT = {".pdf", ".txt", ".doc", ".docx"}
+UPLOAD_CHUNK_SIZE = 256 * 1024        # bytes held in memory per file while spooling
+ALLOWED_EXT = {".pdf", ".txt", ".md", ".markdown", ".doc", ".docx"}
 MAX_FILES_PER_UPLOAD = 10
 
 
@@ -30,65 +38,51 @@ def _is_allowed_file(filename: str) -> bool:
     return Path(filename).suffix.lower() in ALLOWED_EXT
 
 
-async def _read_file_content(file: UploadFile) -> str:
-    """Convert file to text. Minimal fallback loaders."""
-    content = await file.read()
-
-    if len(content) > MAX_FILE_SIZE:
+async def _save_upload(file: UploadFile, dest_dir: Path, index: int) -> Path:
+    """
+    Stream an uploaded file to its spool path in UPLOAD_CHUNK_SIZE pieces,
+    rejecting it as soon as it crosses MAX_FILE_SIZE. The partial file is
+    removed on rejection; the job worker parses and deletes the rest.
+    """
+    # Starlette knows the size once the multipart part is spooled; reject before copying
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(400, f"File too large: {file.filename}")
 
-    suffix = Path(file.filename).suffix.lower()
-
-    if suffix == ".pdf":
-        try:
-            from langchain_community.document_loaders import PyPDFLoader
-            import tempfile
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(content)
-                tmp_path = tmp.name
-
-            loader = PyPDFLoader(tmp_path)
-            docs = loader.load()
-            return "\n".join([d.page_content for d in docs])
-        except Exception:
-            logger.warning("PDF loader failed; falling back to raw text")
-            return content.decode(errors="ignore")
-
-    elif suffix in (".txt", ".md"):
-        return content.decode("utf-8", errors="ignore")
-
-    elif suffix in (".doc", ".docx"):
-        try:
-            import docx2txt
-            import tempfile
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(content)
-                tmp_path = tmp.name
-
-            return docx2txt.process(tmp_path) or ""
-        except Exception:
-            logger.warning("docx loader failed; fallback text used")
-            return content.decode(errors="ignore")
-
-    # fallback for unknown extensions
-    return content.decode(errors="ignore")
+    _ensure_dir(dest_dir)
+    # prefixed with its position in the upload: two names may sanitize to the same one
+    dest = dest_dir / f"{index}_{sanitize_filename(file.filename) or uuid.uuid4().hex}"
+    written = 0
+    try:
+        async with aiofiles.open(dest, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_FILE_SIZE:
+                    raise HTTPException(400, f"File too large: {file.filename}")
+                await out.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    finally:
+        await file.close()
+    return dest
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_documents(
     files: Optional[List[UploadFile]] = File(None),
     user_id: Optional[str] = Form(None),
 ):
     """
-    Upload documents → convert directly to embeddings → return only count.
-    No vector store. No persistence.
+    Upload documents → save to disk → queue an ingestion job → return its id.
+    Parsing, splitting, embedding and upserting run in the background;
+    follow progress at /jobs/{job_id} or /jobs/{job_id}/events. Uploaded
+    files are not kept after the job: a file that failed must be uploaded again.
     """
     # Reject uploads when persistence is disabled (no data directory / no storage)
     if not getattr(settings, 'ENABLE_PERSISTENCE', False):
         raise HTTPException(403, "Document upload is disabled in this deployment (persistence disabled).")
 
+    job_dir = None
     try:
         if not files or len(files) == 0:
             raise HTTPException(400, "No files uploaded")
@@ -96,49 +90,151 @@ async def upload_documents(
         if len(files) > MAX_FILES_PER_UPLOAD:
             raise HTTPException(400, f"Maximum {MAX_FILES_PER_UPLOAD} files allowed")
 
-        logger.info("[UPLOAD] Received %d files for embedding", len(files))
+        logger.info("[UPLOAD] Received %d files for ingestion", len(files))
 
-        embedded_count = 0
-
-        # process one-by-one
-        for f in files:
+        # A bad file is reported in the response; the rest of the upload still goes through
+        job_id = uuid.uuid4().hex
+        job_dir = UPLOAD_DIR / job_id
+        saved, rejected = [], []
+        names = set()
+        for index, f in enumerate(files):
             if not _is_allowed_file(f.filename):
-                raise HTTPException(400, f"Unsupported file type: {f.filename}")
-
-            text = await _read_file_content(f)
-
-            if not text.strip():
-                logger.warning("Skipping empty file: %s", f.filename)
+                await f.close()
+                rejected.append({"name": f.filename, "error": "Unsupported file type"})
                 continue
-
-            # --- 🔥 CHUNK & UPSERT TO PINECONE HERE ---
+            if f.filename in names:
+                # both would be ingested as the same document
+                await f.close()
+                rejected.append({"name": f.filename, "error": "Duplicate file name in this upload"})
+                continue
+            names.add(f.filename)
             try:
-                # 1. Create Document object
-                doc = Document(page_content=text, metadata={"source": f.filename, "user_id": user_id or "anonymous"})
-                
-                # 2. Split chunks
-                chunks = langchain_service.split_documents([doc])
-                
-                # 3. Upsert to Pinecone - Use user_id as namespace (or specialized collection name)
-                # If user_id is provided, we use it as the namespace to isolate user data
-                namespace = user_id if user_id else "anonymous"
-                
-                await langchain_service.upsert_documents(chunks, collection_name=namespace)
-                
-                embedded_count += 1
-            except Exception as e:
-                logger.error("Embedding/Upsert failed for %s: %s", f.filename, e)
-                raise HTTPException(500, f"Embedding failed for file {f.filename}: {str(e)}")
-
-        logger.info("[UPLOAD] Successfully embedded %d documents", embedded_count)
+                path = await _save_upload(f, job_dir, index)
+            except HTTPException as e:
+                rejected.append({"name": f.filename, "error": e.detail})
+                continue
+            saved.append({"name": f.filename, "path": str(path)})
+
+        if not saved:
+            raise HTTPException(400, {"message": "No valid files uploaded", "rejected": rejected})
+
+        # Use user_id as namespace to isolate user data
+        namespace = user_id if user_id else "anonymous"
+        job = await ingestion_queue.submit(namespace, user_id, saved, job_id=job_id)
 
         return {
-            "count": embedded_count,
-            "message": f"Successfully embedded {embedded_count} document(s) to cloud storage"
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "files": [f["name"] for f in job["files"]],
+            "status_url": f"/api/documents/jobs/{job_id}",
+            "events_url": f"/api/documents/jobs/{job_id}/events",
+            "rejected": rejected,
+            "count": len(saved),
+            "message": f"Queued {len(saved)} document(s) for processing"
+            + (f", rejected {len(rejected)}" if rejected else "")
         }
 
     except HTTPException:
+        _discard(job_dir)
         raise
     except Exception as e:
+        _discard(job_dir)
         logger.error("Unexpected upload error: %s", e)
         raise HTTPException(500, "Internal server error during document upload")
+
+
+def _discard(job_dir: Optional[Path]):
+    if job_dir is None or not job_dir.exists():
+        return
+    for p in job_dir.iterdir():
+        p.unlink(missing_ok=True)
+    job_dir.rmdir()
+
+
+def _public_job(job: dict) -> dict:
+    files = [{k: v for k, v in f.items() if k != "path"} for f in job["files"]]
+    return {k: v for k, v in job.items() if k not in ("owner", "files")} | {"files": files}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of an ingestion job, with per-file stage and progress."""
+    job = await asyncio.to_thread(ingestion_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    return _public_job(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events stream of job status; ends once the job is done or failed."""
+    job = await asyncio.to_thread(ingestion_queue.store.get, job_id)
+    if not job:
+        raise HTTPException(404, f"Job not found: {job_id}")
+
+    async def stream():
+        last = None
+        current = job
+        while True:
+            payload = json.dumps(_public_job(current))
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if current["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(0.5)
+            current = await asyncio.to_thread(ingestion_queue.store.get, job_id) or current
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("")
+async def list_documents(user_id: Optional[str] = None, include_ids: bool = False):
+    """Documents indexed in the user's namespace, with chunk counts and upload times."""
+    namespace = user_id if user_id else "anonymous"
+    manifest = get_document_manifest()
+    documents = await asyncio.to_thread(manifest.documents, namespace)
+    if include_ids:
+        for doc in documents:
+            entries = await asyncio.to_thread(manifest.entries, namespace, doc["source"])
+            doc["vector_ids"] = [vid for _, vid in entries]
+    return {"namespace": namespace, "documents": documents, "count": len(documents)}
+
+
+@router.get("/status")
+async def get_namespace_status(user_id: Optional[str] = None):
+    """Whether the user's documents can be queried yet, with the indexed fraction of files in progress."""
+    return await asyncio.to_thread(namespace_status, user_id if user_id else "anonymous")
+
+
+@router.get("/digest/{source:path}")
+async def get_digest(source: str, user_id: Optional[str] = None):
+    """Outline, key terms and summary computed for a document at ingestion."""
+    namespace = user_id if user_id else "anonymous"
+    digest = await asyncio.to_thread(digest_store.get, namespace, source)
+    if not digest:
+        raise HTTPException(404, f"No digest for: {source}")
+    return {"namespace": namespace, **digest.to_dict()}
+
+
+@router.delete("/{source:path}")
+async def delete_document(source: str, user_id: Optional[str] = None):
+    """Remove one document's vectors, parent windows and catalog entry."""
+    from app.services.langchain_service import langchain_service
+
+    namespace = user_id if user_id else "anonymous"
+    if not await asyncio.to_thread(get_document_manifest().document, namespace, source):
+        raise HTTPException(404, f"Document not found: {source}")
+    if langchain_service is None:
+        raise HTTPException(503, "LangChain service unavailable")
+    try:
+        deleted = await langchain_service.delete_document(namespace, source)
+        await asyncio.to_thread(digest_store.delete, namespace, source)
+    except Exception as e:
+        logger.error("Failed to delete %s from %s: %s", source, namespace, e)
+        raise HTTPException(500, "Failed to delete document")
+    return {"namespace": namespace, "source": source, "deleted_vectors": deleted}
@@ -15,6 +15,7 @@ class FlashcardRequest(BaseModel):
     collection_name: Optional[str] = "default"
     count: Optional[int] = 10
     customPrompt: Optional[str] = None
+    source: Optional[str] = None  # uploaded document to use the digest of
 
 
 @router.post("/")
@@ -33,7 +34,8 @@ async def generate_flashcards(req: FlashcardRequest):
             topic=topic,
             count=count,
             custom_prompt=req.customPrompt,
-            collection_name=namespace
+            collection_name=namespace,
+            source=req.source
         )
 
         if not cards:
@@ -2,10 +2,16 @@
 FastAPI route for mindmap generation
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
+from app.core.mermaid_parser import header_kind
+from app.core.mindmap_tree import MindmapTree
+from app.services.digest_service import digest_store
 from app.services.langchain_service import langchain_service
+from app.services.mindmap_service import MODES, mindmap_service
 
 router = APIRouter()
 
@@ -18,6 +24,23 @@ class MindmapRequest(BaseModel):
     detail_level: Optional[int] = 3
     research: Optional[bool] = True
     systemPrompt: Optional[str] = None
+    source: Optional[str] = None  # uploaded document to use the digest of
+    mode: Optional[str] = None  # "fast" (one LLM call) or "quality" (multi-call pipeline)
+    fresh: Optional[bool] = False  # skip the diagram cache and generate a new variant
+
+
+class ExpandRequest(BaseModel):
+    path: List[str]  # node labels from below the root down to the node to expand
+    diagram_id: Optional[str] = None  # from a /api/mindmap response
+    tree: Optional[Dict] = None  # or the "tree" of a /api/mindmap response
+    max_children: Optional[int] = 5
+
+
+def _mindmap_tree(code: str) -> Optional[Dict]:
+    """JSON tree of a mindmap, for clients that draw it without parsing Mermaid; None for other diagrams."""
+    if header_kind(code.lstrip().split("\n", 1)[0]) != "mindmap":
+        return None
+    return MindmapTree.from_mermaid(code).to_dict()
 
 
 @router.post("/")
@@ -29,21 +52,72 @@ async def generate_mindmap(req: MindmapRequest):
         # Map frontend 'default' collection to userId namespace if needed
         namespace = req.userId if req.collection_name == "default" else req.collection_name
 
+        if req.mode:
+            if req.mode not in MODES:
+                raise HTTPException(status_code=400, detail=f"mode must be one of {list(MODES)}")
+            result = await mindmap_service.generate_diagram(
+                topic=req.topic,
+                diagram_type=req.diagram_type,
+                detail_level=req.detail_level,
+                research=req.research,
+                custom_prompt=req.systemPrompt,
+                mode=req.mode,
+                context=await asyncio.to_thread(digest_store.context, namespace, req.source),
+                fresh=bool(req.fresh),
+            )
+            mermaid_code = result["mermaid_code"]
+            return {
+                "mermaid_code": mermaid_code,
+                "tree": _mindmap_tree(mermaid_code),
+                "diagram_id": result["diagram_id"],
+                "themeVars": {},
+                "diagram_type": req.diagram_type,
+                "detail_level": req.detail_level,
+                "mode": req.mode,
+            }
+
         result = await langchain_service.generate_research_mindmap(
             topic=req.topic,
             depth=req.detail_level,
             diagram_type=req.diagram_type,
-            custom_prompt=req.systemPrompt
-            # LangChainService handles retrieval internally using 'default' namespace or we could pass namespace
+            custom_prompt=req.systemPrompt,
+            collection_name=namespace,
+            source=req.source,
+            fresh=bool(req.fresh)
         )
         
         # result is {"mermaidCode": "...", "themeVars": {...}}
+        mermaid_code = result.get("mermaidCode", "")
         return {
-            "mermaid_code": result.get("mermaidCode", ""),
+            "mermaid_code": mermaid_code,
+            "tree": _mindmap_tree(mermaid_code),
+            "diagram_id": result.get("diagramId"),
             "themeVars": result.get("themeVars", {}),
             "diagram_type": req.diagram_type,
             "detail_level": req.detail_level
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/expand")
+async def expand_mindmap_node(req: ExpandRequest):
+    """Generate the children of one mindmap node and splice them into the diagram."""
+    if not req.diagram_id and not req.tree:
+        raise HTTPException(status_code=400, detail="diagram_id or tree is required")
+    if not 1 <= (req.max_children or 5) <= 10:
+        raise HTTPException(status_code=400, detail="max_children must be between 1 and 10")
+
+    try:
+        return await mindmap_service.expand(
+            path=req.path, diagram_id=req.diagram_id, tree=req.tree, max_children=req.max_children or 5
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
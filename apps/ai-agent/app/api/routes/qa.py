@@ -8,6 +8,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 from pathlib import Path
 import os
+import asyncio
 from datetime import datetime
 import logging
 import json
@@ -49,7 +50,10 @@ class QAInput(BaseModel):
     collection_name: Optional[str] = "default"
     conversation_history: Optional[List[Dict[str, Any]]] = None
     system_prompt: Optional[str] = Field(default="You are a helpful AI tutor.", description="System instructions")
-    filter: Optional[Dict[str, Any]] = None
+    filter: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description='Metadata filter, e.g. {"source": "chapter3.pdf"} or {"source": ["a.pdf", "b.pdf"]}'
+    )
 
 
 @router.get("/greeting")
@@ -90,7 +94,8 @@ async def post_qa(payload: QAInput, request: Request):
             message=user_msg,
             collection_name=namespace,
             conversation_history=payload.conversation_history,
-            system_prompt=payload.system_prompt
+            system_prompt=payload.system_prompt,
+            filter=payload.filter
         )
         
         answer = response_data.get("answer", "")
@@ -114,12 +119,24 @@ async def post_qa(payload: QAInput, request: Request):
             # save logic... omit for speed unless critical
             pass
 
+        # 4. Let the client know when the answer came from a partially indexed namespace
+        index_status = None
+        try:
+            from app.services.ingestion_jobs import namespace_status
+            index_status = await asyncio.to_thread(namespace_status, namespace)
+        except Exception as e:
+            logger.warning("Index status lookup failed: %s", e)
+
         return {
             "answer": answer,
             "sources": sources,
             "mode": mode,
             "follow_up_questions": followups,
-            "qaId": qa_id
+            "qaId": qa_id,
+            "index_status": index_status and {
+                "state": index_status["state"],
+                "indexed_fraction": index_status["indexed_fraction"],
+            },
         }
 
     except HTTPException:
@@ -16,6 +16,7 @@ class QuizRequest(BaseModel):
     numQuestions: Optional[int] = 5
     difficulty: Optional[str] = "medium"
     customPrompt: Optional[str] = None
+    source: Optional[str] = None  # uploaded document to use the digest of
 
 
 @router.post("/")
@@ -35,7 +36,8 @@ async def generate_quiz(req: QuizRequest):
             num_questions=count,
             difficulty=difficulty,
             custom_prompt=req.customPrompt,
-            collection_name=namespace
+            collection_name=namespace,
+            source=req.source
         )
 
         if not questions:
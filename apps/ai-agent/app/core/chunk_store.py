@@ -0,0 +1,122 @@
+"""
+Local parent-window chunk store for small-to-big retrieval.
+
+Ingestion indexes small child chunks in the vector store and keeps the larger
+parent windows here, together with their sentence offsets. At query time a
+matched child is expanded to its sentence range plus a few neighbouring
+sentences from the parent, instead of sending a whole fixed-size chunk.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) character offsets of the sentences in `text`."""
+    spans = []
+    start = 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        if m.start() > start:
+            spans.append((start, m.start()))
+        start = m.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+@dataclass
+class ParentWindow:
+    id: str
+    namespace: str
+    source: str
+    text: str
+    spans: List[Tuple[int, int]]
+
+    def window(self, first: int, last: int, context: int = 0) -> Tuple[int, int]:
+        """Sentence range [lo, hi) covering sentences first..last plus `context` either side."""
+        lo = max(0, first - context)
+        hi = min(len(self.spans), last + 1 + context)
+        return lo, hi
+
+    def text_for(self, lo: int, hi: int) -> str:
+        if not self.spans or lo >= hi:
+            return self.text
+        return self.text[self.spans[lo][0]:self.spans[hi - 1][1]]
+
+
+class ChunkStore(SQLiteStore):
+    """SQLite-backed store of parent windows, keyed by parent id."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS parents ("
+        " id TEXT PRIMARY KEY, namespace TEXT NOT NULL, source TEXT,"
+        " text TEXT NOT NULL, spans TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS parents_ns_source ON parents(namespace, source)",
+    )
+
+    def put(self, parents: Iterable[ParentWindow]) -> List[str]:
+        """Store windows, replacing any with the same id; returns the ids that were not stored yet."""
+        rows = [(p.id, p.namespace, p.source, p.text, json.dumps(p.spans)) for p in parents]
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        existing = set()
+        with self._connect() as conn:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                existing.update(r[0] for r in conn.execute(f"SELECT id FROM parents WHERE id IN ({marks})", batch))
+            conn.executemany(
+                "INSERT OR REPLACE INTO parents (id, namespace, source, text, spans) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        return [i for i in ids if i not in existing]
+
+    def discard(self, ids: Iterable[str]) -> int:
+        """Delete windows by id; returns rows removed."""
+        with self._connect() as conn:
+            return conn.executemany("DELETE FROM parents WHERE id = ?", [(i,) for i in ids]).rowcount
+
+    def prune(self, namespace: str, source: str, keep: Iterable[str]) -> int:
+        """Delete the windows of (namespace, source) whose id is not in `keep`; returns rows removed."""
+        keep = set(keep)
+        with self._connect() as conn:
+            stale = [
+                (row[0],) for row in conn.execute(
+                    "SELECT id FROM parents WHERE namespace = ? AND source = ?", (namespace, source)
+                ) if row[0] not in keep
+            ]
+            conn.executemany("DELETE FROM parents WHERE id = ?", stale)
+        return len(stale)
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, ParentWindow]:
+        ids = list(dict.fromkeys(i for i in ids if i))
+        if not ids:
+            return {}
+        out: Dict[str, ParentWindow] = {}
+        with self._connect() as conn:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                for row in conn.execute(
+                    f"SELECT id, namespace, source, text, spans FROM parents WHERE id IN ({marks})", batch
+                ):
+                    out[row[0]] = ParentWindow(row[0], row[1], row[2], row[3], [tuple(s) for s in json.loads(row[4])])
+        return out
+
+    def delete(self, namespace: str, source: Optional[str] = None) -> int:
+        with self._connect() as conn:
+            if source is None:
+                cur = conn.execute("DELETE FROM parents WHERE namespace = ?", (namespace,))
+            else:
+                cur = conn.execute("DELETE FROM parents WHERE namespace = ? AND source = ?", (namespace, source))
+            return cur.rowcount
@@ -4,7 +4,8 @@ Configuration management for the AI Agent using LangChain
 import os
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from pydantic import field_validator, Field
+from typing import Optional
+from pydantic import field_validator, model_validator, Field
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +30,17 @@ else:
     print(f"📝 Please create .env file at: {ENV_FILE_PATH}")
 
 
+# deprecated character-sized chunk setting -> token-sized setting; the old
+# defaults (1000/200/2000/300 characters) are the new ones at 5 characters a token
+CHAR_CHUNK_SETTINGS = {
+    "chunk_size": "chunk_tokens",
+    "chunk_overlap": "chunk_overlap_tokens",
+    "parent_chunk_size": "parent_chunk_tokens",
+    "child_chunk_size": "child_chunk_tokens",
+}
+CHARS_PER_TOKEN = 5
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
@@ -52,8 +64,64 @@ class Settings(BaseSettings):
     vector_store_path: str = "./data/vector_store"
     embeddings_model: str = "ggml-all-MiniLM-L6-v2-f16.gguf"  # GPT4All model
     embeddings_device: str = "cpu"
-    chunk_size: int = 1000
-    chunk_overlap: int = 200
+    # Chunk sizes are in (approximate) tokens, see app/core/text_splitter.py
+    chunk_tokens: int = 200
+    chunk_overlap_tokens: int = 40
+    # Deprecated character-sized names (CHUNK_SIZE, ...): still honoured, converted to tokens
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    parent_chunk_size: Optional[int] = None
+    child_chunk_size: Optional[int] = None
+
+    # Pinecone ingestion (batched async upserts)
+    pinecone_embed_batch_size: int = 100
+    pinecone_upsert_batch_size: int = 100
+    pinecone_upsert_concurrency: int = 4
+    pinecone_upsert_max_retries: int = 5
+
+    # Retrieval: over-fetch candidates, keep the best rag_top_k after local rerank
+    rag_fetch_k: int = 30
+    rag_top_k: int = 4
+    rerank_budget_ms: float = 20.0
+
+    # Small-to-big retrieval: index small child chunks, expand to parent windows
+    small_to_big: bool = True
+    parent_chunk_tokens: int = 400
+    child_chunk_tokens: int = 60
+    window_context_sentences: int = 1
+    chunk_store_path: str = "./data/chunk_store.db"
+
+    # Incremental re-ingestion: chunk hashes + vector ids per uploaded source
+    manifest_path: str = "./data/document_manifest.db"
+
+    # Background ingestion jobs (/api/documents/upload)
+    ingestion_workers: int = 2
+    ingestion_file_concurrency: int = 3  # files of one job processed at once
+    ingestion_priority_pages: int = 20   # indexed first, so large documents are queryable early
+    ingestion_jobs_path: str = "./data/ingestion_jobs.db"
+
+    # Per-document digests (outline, key terms, summary) built during ingestion
+    document_digests: bool = True
+    digest_path: str = "./data/digests.db"
+
+    # Local topic normalization (spelling + diagram type); below this confidence the LLM normalizes
+    topic_confidence_threshold: float = 0.6
+    topic_vocab_path: str = "./data/topic_vocab.db"
+
+    # JSONL log of LLM Mermaid outputs the local repair could not fix ("" = off);
+    # replay it with `python -m benchmarks.mermaid_repair --corpus <file>`
+    mermaid_repair_log: str = ""
+
+    # Shared diagram cache (/api/mindmap): served fresh for ttl, then stale while one worker regenerates
+    diagram_cache: bool = True
+    diagram_cache_path: str = "./data/diagram_cache.db"
+    diagram_cache_ttl_s: float = 86400.0
+    diagram_cache_stale_s: float = 604800.0
+    diagram_cache_max_entries: int = 5000
+
+    # Process-pool text extraction (0 workers = one per CPU core)
+    extraction_workers: int = 0
+    pdf_min_pages_per_shard: int = 25
     
     # Logging
     log_level: str = "INFO"
@@ -69,6 +137,21 @@ class Settings(BaseSettings):
             return v
         return v
     
+    @model_validator(mode='after')
+    def convert_char_chunk_sizes(self):
+        """Map the old character-sized chunk settings onto their token-sized replacements"""
+        for old, new in CHAR_CHUNK_SETTINGS.items():
+            chars = getattr(self, old)
+            if chars is None:
+                continue
+            if new in self.model_fields_set:
+                logger.warning(f"{old.upper()} is deprecated and ignored because {new.upper()} is set")
+                continue
+            tokens = max(1, round(chars / CHARS_PER_TOKEN))
+            logger.warning(f"{old.upper()}={chars} (characters) is deprecated; using {new.upper()}={tokens}")
+            setattr(self, new, tokens)
+        return self
+
     def get_allowed_origins_list(self):
         """Get allowed origins as a list"""
         if isinstance(self.allowed_origins, str):
@@ -0,0 +1,224 @@
+"""
+Per-(namespace, source) manifest of indexed chunks for incremental re-ingestion,
+and the document catalog built on it.
+
+Every chunk written to the vector index is recorded with a content hash and
+its vector id. When the same file is uploaded again, the new chunk list is
+diffed against the manifest: unchanged chunks keep their vectors, only new
+chunks are embedded, and vectors of chunks that disappeared are deleted.
+
+The catalog keeps one row per document (source name, document hash, chunk
+count, upload times), so a user's documents can be listed and one of them
+removed by exactly the vector ids the manifest holds for it.
+"""
+
+import hashlib
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.sqlite_store import SQLiteStore
+
+_manifest_instance = None
+
+
+# where a chunk sits in its document: shifts whenever text before it changes, so
+# it is left out of the hash (a reused vector keeps the offset it was indexed with)
+POSITIONAL_KEYS = frozenset({"char_offset", "sent_start", "sent_end"})
+
+
+def chunk_hash(doc: Document) -> str:
+    """Hash of a chunk's text and non-positional metadata; any change means the stored vector is stale."""
+    metadata = {k: v for k, v in doc.metadata.items() if k not in POSITIONAL_KEYS}
+    payload = json.dumps([doc.page_content, metadata], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ManifestDiff:
+    """Outcome of diffing a new chunk list against the manifest."""
+    ids: List[str]                                        # vector id per new chunk, in order
+    hashes: List[str]                                     # content hash per new chunk, in order
+    new: List[int] = field(default_factory=list)          # indices of chunks that need embedding
+    stale: List[str] = field(default_factory=list)        # vector ids to delete
+
+    @property
+    def kept(self) -> int:
+        return len(self.ids) - len(self.new)
+
+
+class ManifestMatcher:
+    """
+    Incremental form of DocumentManifest.diff for chunks that arrive in a
+    stream: `match` assigns each chunk a vector id as it comes, `result()`
+    closes the diff and lists the stale ids. Only hashes and ids are kept.
+    """
+
+    def __init__(self, entries: Sequence[Tuple[str, str]]):
+        self.available: Dict[str, List[str]] = defaultdict(list)
+        for h, vid in entries:
+            self.available[h].append(vid)
+        self.diff = ManifestDiff(ids=[], hashes=[])
+
+    def match(self, chunk: Document, new_id) -> Optional[str]:
+        """Reuse a stored vector for `chunk` (returns None) or assign it `new_id()` (returned)."""
+        h = chunk_hash(chunk)
+        self.diff.hashes.append(h)
+        if self.available.get(h):
+            self.diff.ids.append(self.available[h].pop(0))
+            return None
+        vid = new_id()
+        self.diff.new.append(len(self.diff.ids))
+        self.diff.ids.append(vid)
+        return vid
+
+    def result(self) -> ManifestDiff:
+        self.diff.stale = [vid for vids in self.available.values() for vid in vids]
+        return self.diff
+
+
+class DocumentManifest(SQLiteStore):
+    """SQLite-backed chunk manifest, one row per indexed vector."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS manifest ("
+        " namespace TEXT NOT NULL, source TEXT NOT NULL, hash TEXT NOT NULL,"
+        " vector_id TEXT NOT NULL, position INTEGER NOT NULL,"
+        " PRIMARY KEY (namespace, source, vector_id))",
+        "CREATE TABLE IF NOT EXISTS documents ("
+        " namespace TEXT NOT NULL, source TEXT NOT NULL, hash TEXT NOT NULL,"
+        " chunks INTEGER NOT NULL, uploaded_at REAL NOT NULL, updated_at REAL NOT NULL,"
+        " PRIMARY KEY (namespace, source))",
+    )
+
+    @staticmethod
+    def _document(row) -> Dict:
+        return {
+            "source": row[0],
+            "hash": row[1],
+            "chunks": row[2],
+            "uploaded_at": row[3],
+            "updated_at": row[4],
+        }
+
+    def entries(self, namespace: str, source: str) -> List[Tuple[str, str]]:
+        """(hash, vector_id) rows for a document, in chunk order."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT hash, vector_id FROM manifest WHERE namespace = ? AND source = ? ORDER BY position",
+                (namespace, source),
+            ).fetchall()
+
+    def diff(self, namespace: str, source: str, chunks: Sequence[Document], new_id) -> ManifestDiff:
+        """
+        Match `chunks` to existing vectors by hash (duplicates matched one-to-one).
+        `new_id()` supplies ids for chunks that have no stored vector.
+        """
+        matcher = ManifestMatcher(self.entries(namespace, source))
+        for chunk in chunks:
+            matcher.match(chunk, new_id)
+        return matcher.result()
+
+    def replace(self, namespace: str, source: str, hashes: Sequence[str], ids: Sequence[str]):
+        """Make (hashes, ids) the manifest of this document and update its catalog entry."""
+        # the document hash is derived from its chunk hashes: equal iff the indexed content is
+        doc_hash = hashlib.sha1("\n".join(hashes).encode("ascii")).hexdigest()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM manifest WHERE namespace = ? AND source = ?", (namespace, source))
+            conn.executemany(
+                "INSERT INTO manifest (namespace, source, hash, vector_id, position) VALUES (?, ?, ?, ?, ?)",
+                [(namespace, source, h, vid, pos) for pos, (h, vid) in enumerate(zip(hashes, ids))],
+            )
+            conn.execute(
+                "INSERT INTO documents (namespace, source, hash, chunks, uploaded_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (namespace, source) DO UPDATE SET"
+                " hash = excluded.hash, chunks = excluded.chunks, updated_at = excluded.updated_at",
+                (namespace, source, doc_hash, len(ids), now, now),
+            )
+
+    def add(self, namespace: str, source: str, rows: Sequence[Tuple[str, str, int]]):
+        """
+        Record (hash, vector_id, position) rows of vectors written ahead of
+        replace(), so vectors of an ingestion that never finishes still belong
+        to the document: it is listed, can be deleted, and a re-upload reuses them.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO manifest (namespace, source, hash, vector_id, position) VALUES (?, ?, ?, ?, ?)",
+                [(namespace, source, h, vid, pos) for h, vid, pos in rows],
+            )
+            count = conn.execute(
+                "SELECT COUNT(*) FROM manifest WHERE namespace = ? AND source = ?", (namespace, source)
+            ).fetchone()[0]
+            # a document seen for the first time gets a catalog entry now (hash "" until replace())
+            conn.execute(
+                "INSERT INTO documents (namespace, source, hash, chunks, uploaded_at, updated_at)"
+                " VALUES (?, ?, '', ?, ?, ?)"
+                " ON CONFLICT (namespace, source) DO UPDATE SET chunks = excluded.chunks WHERE hash = ''",
+                (namespace, source, count, now, now),
+            )
+
+    def documents(self, namespace: str) -> List[Dict]:
+        """Catalog entries of a namespace, most recently updated first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT source, hash, chunks, uploaded_at, updated_at FROM documents"
+                " WHERE namespace = ? ORDER BY updated_at DESC",
+                (namespace,),
+            ).fetchall()
+        return [self._document(r) for r in rows]
+
+    def document(self, namespace: str, source: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT source, hash, chunks, uploaded_at, updated_at FROM documents"
+                " WHERE namespace = ? AND source = ?",
+                (namespace, source),
+            ).fetchone()
+        return self._document(row) if row else None
+
+    def version(self, namespace: str, source: Optional[str] = None) -> str:
+        """
+        Content version of a namespace (or of one document in it): changes
+        whenever a document is added, re-indexed with new content or deleted;
+        "" when there is nothing indexed.
+        """
+        with self._connect() as conn:
+            if source:
+                row = conn.execute(
+                    "SELECT hash FROM documents WHERE namespace = ? AND source = ?", (namespace, source)
+                ).fetchone()
+                return row[0] if row else ""
+            rows = conn.execute(
+                "SELECT source, hash FROM documents WHERE namespace = ? ORDER BY source", (namespace,)
+            ).fetchall()
+        if not rows:
+            return ""
+        return hashlib.sha1("\n".join(f"{s}\t{h}" for s, h in rows).encode("utf-8")).hexdigest()
+
+    def delete(self, namespace: str, source: str) -> List[str]:
+        """Forget a document; returns the vector ids it owned."""
+        with self._connect() as conn:
+            ids = [r[0] for r in conn.execute(
+                "SELECT vector_id FROM manifest WHERE namespace = ? AND source = ?", (namespace, source)
+            )]
+            conn.execute("DELETE FROM manifest WHERE namespace = ? AND source = ?", (namespace, source))
+            conn.execute("DELETE FROM documents WHERE namespace = ? AND source = ?", (namespace, source))
+        return ids
+
+
+def get_document_manifest() -> DocumentManifest:
+    """Get singleton document manifest / catalog"""
+    global _manifest_instance
+    from app.core.config import settings
+
+    if _manifest_instance is None:
+        _manifest_instance = DocumentManifest(settings.manifest_path)
+    return _manifest_instance
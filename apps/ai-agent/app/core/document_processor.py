@@ -3,21 +3,20 @@ Document processing utilities for handling various file formats
 """
 
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import logging
 import io
 import re
-import markdown
 
 logger = logging.getLogger(__name__)
 
 # Import with error handling
 try:
-    import pypdf2
+    import pypdf
     PDF_AVAILABLE = True
 except ImportError:
-    logger.warning("pypdf2 not available - PDF processing disabled")
+    logger.warning("pypdf not available - PDF processing disabled")
     PDF_AVAILABLE = False
 
 try:
@@ -56,7 +55,7 @@ def process_document(file_path: str, file_type: str = None) -> Dict[str, Any]:
     try:
         if file_type == 'pdf':
             if not PDF_AVAILABLE:
-                raise ImportError("pypdf2 is not installed. Install with: pip install pypdf2")
+                raise ImportError("pypdf is not installed. Install with: pip install pypdf")
             return process_pdf(file_path)
         elif file_type in ['doc', 'docx']:
             if not DOCX_AVAILABLE:
@@ -78,21 +77,13 @@ def process_document(file_path: str, file_type: str = None) -> Dict[str, Any]:
 def process_pdf(file_path: str) -> Dict[str, Any]:
     """Extract text from PDF file"""
     try:
-        text_content = []
-        with open(file_path, 'rb') as file:
-            pdf_reader = pypdf2.PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-            
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                text_content.append(page.extract_text())
-        
-        full_text = "\n".join(text_content)
+        pages = extract_pdf_pages(file_path)
+        full_text = "\n".join(text for _, text in pages)
         
         return {
             "text": full_text,
             "type": "pdf",
-            "pages": num_pages,
+            "pages": len(pages),
             "file_path": file_path
         }
     except Exception as e:
@@ -154,29 +145,85 @@ def process_markdown(file_path: str) -> Dict[str, Any]:
         raise
 
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
+# Page-level extractors. These are module-level so they can run in a process
+# pool (see app/core/extraction.py); page numbers are 1-based, None when the
+# format has no pages.
+
+def pdf_page_count(file_path: str) -> int:
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def extract_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, str]]:
+    """Extract (page_number, text) for pages [start, end) of a PDF."""
+    reader = pypdf.PdfReader(file_path)
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def docx_to_markdown(doc) -> str:
+    """
+    Render a python-docx Document as Markdown-style text: "Heading N" / "Title"
+    paragraphs become '#' headings and list paragraphs '- ' items, so the
+    structure survives for chunking (see app/core/structure.py).
+    """
+    parts: List[str] = []
+    in_list = False
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        style = para.style.name if para.style is not None else ""
+        level = 0
+        if style == "Title":
+            level = 1
+        elif style.startswith("Heading"):
+            digits = style[len("Heading"):].strip()
+            level = min(int(digits), 6) if digits.isdigit() else 1
+        is_item = style.startswith("List")
+
+        if level:
+            parts.append("\n\n" + "#" * level + " " + text)
+        elif is_item:
+            parts.append(("\n" if in_list else "\n\n") + "- " + text)
+        else:
+            parts.append("\n\n" + text)
+        in_list = is_item
+    return "".join(parts).lstrip("\n")
+
+
+def extract_docx_text(file_path: str) -> str:
+    """
+    Extract text from a Word document. python-docx keeps heading and list
+    styles (rendered as Markdown); docx2txt is the fallback.
+    """
+    if DOCX_AVAILABLE:
+        try:
+            return docx_to_markdown(Document(file_path))
+        except Exception as e:
+            logger.warning(f"python-docx failed for {file_path} ({e}); trying docx2txt")
+    import docx2txt
+    return docx2txt.process(file_path) or ""
+
+
+def read_text_file(file_path: str) -> str:
+    with open(file_path, "rb") as file:
+        return file.read().decode("utf-8", errors="ignore")
+
+
+def chunk_text(text: str, chunk_tokens: int = 200, overlap_tokens: int = 40) -> List[str]:
     """
     Split text into chunks for processing
     
     Args:
         text: Input text to chunk
-        chunk_size: Size of each chunk in characters
-        overlap: Number of characters to overlap between chunks
+        chunk_tokens: Size of each chunk in tokens
+        overlap_tokens: Number of tokens to overlap between chunks
         
     Returns:
         List of text chunks
     """
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    while start < text_length:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start = end - overlap
-    
-    return chunks
+    from app.core.text_splitter import TokenSplitter
+    return TokenSplitter(chunk_tokens, overlap_tokens).split_text(text)
 
 
 def extract_key_points(text: str, max_points: int = 5) -> List[str]:
@@ -204,6 +251,11 @@ __all__ = [
     'process_docx',
     'process_txt',
     'process_markdown',
+    'pdf_page_count',
+    'extract_pdf_pages',
+    'docx_to_markdown',
+    'extract_docx_text',
+    'read_text_file',
     'chunk_text',
     'extract_key_points'
 ]
@@ -0,0 +1,142 @@
+"""
+Process-pool text extraction for uploaded documents.
+
+PDF and DOCX parsing is CPU-bound, so it runs in a pool of worker processes
+instead of on the event loop. Large PDFs are sharded by page range across the
+workers and reassembled in page order, keeping page numbers for metadata;
+`iter_pages` streams them shard by shard instead.
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+from app.core import document_processor as dp
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_extractor_instance = None
+
+Page = Tuple[Optional[int], str]
+
+
+class PageExtractor:
+    """Extract (page_number, text) pairs from a file using a lazily started process pool."""
+
+    def __init__(self, workers: int = 0, min_pages_per_shard: int = 25):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_pages_per_shard = max(1, min_pages_per_shard)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def shards(self, num_pages: int) -> List[Tuple[int, int]]:
+        """
+        Page ranges [start, end), one per worker. Every shard re-opens the PDF, so
+        small documents are not split below min_pages_per_shard pages.
+        """
+        size = max(self.min_pages_per_shard, math.ceil(num_pages / self.workers))
+        return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+    async def _submit(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def _extract_pdf(self, file_path: str) -> List[Page]:
+        num_pages = await self._submit(dp.pdf_page_count, file_path)
+        parts = await asyncio.gather(*[
+            self._submit(dp.extract_pdf_pages, file_path, start, end)
+            for start, end in self.shards(num_pages)
+        ])
+        return [page for part in parts for page in part]
+
+    async def extract(self, file_path: str) -> List[Page]:
+        """
+        Pages of `file_path` in order. PDFs and Word files are parsed in the pool;
+        anything else, or a file whose parser fails, is read as lenient UTF-8 text.
+        """
+        suffix = Path(file_path).suffix.lower()
+
+        if suffix == ".pdf":
+            try:
+                return await self._extract_pdf(file_path)
+            except Exception as e:
+                logger.warning("PDF extraction failed for %s (%s); falling back to raw text", file_path, e)
+
+        elif suffix in (".doc", ".docx"):
+            try:
+                return [(None, await self._submit(dp.extract_docx_text, file_path))]
+            except Exception as e:
+                logger.warning("docx extraction failed for %s (%s); fallback text used", file_path, e)
+
+        return [(None, await asyncio.to_thread(dp.read_text_file, file_path))]
+
+    async def page_count(self, file_path: str) -> Optional[int]:
+        """Number of pages of a PDF; None for other formats or an unreadable PDF."""
+        if Path(file_path).suffix.lower() != ".pdf":
+            return None
+        try:
+            return await self._submit(dp.pdf_page_count, file_path)
+        except Exception as e:
+            logger.warning("PDF extraction failed for %s (%s); falling back to raw text", file_path, e)
+            return None
+
+    async def iter_pages(
+        self, file_path: str, num_pages: Optional[int] = None, first_pages: int = 0
+    ) -> AsyncIterator[List[Page]]:
+        """
+        Pages of `file_path` in order, a shard at a time, for streaming ingestion.
+        PDFs are cut into shards of min_pages_per_shard pages with at most one
+        shard per worker in flight, so the first pages arrive before the rest of
+        the file is parsed, and extraction waits while the consumer is busy.
+        `first_pages` makes the first shard exactly that many pages, so they
+        are handed on on their own. Other formats (and PDFs that can't be
+        opened) yield a single shard. Pass `num_pages` if already known.
+        """
+        if num_pages is None:
+            num_pages = await self.page_count(file_path)
+        if num_pages is not None:
+            size = self.min_pages_per_shard
+            bounds = [0] + ([first_pages] if 0 < first_pages < num_pages else [])
+            bounds += list(range(bounds[-1] + size, num_pages, size)) + [num_pages]
+            in_flight: Deque[asyncio.Future] = deque()
+            try:
+                for start, end in zip(bounds, bounds[1:]):
+                    in_flight.append(asyncio.ensure_future(
+                        self._submit(dp.extract_pdf_pages, file_path, start, end)
+                    ))
+                    if len(in_flight) >= self.workers:
+                        yield await in_flight.popleft()
+                while in_flight:
+                    yield await in_flight.popleft()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+            return
+        yield await self.extract(file_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def get_page_extractor() -> PageExtractor:
+    """Get singleton page extractor"""
+    global _extractor_instance
+    if _extractor_instance is None:
+        _extractor_instance = PageExtractor(settings.extraction_workers, settings.pdf_min_pages_per_shard)
+    return _extractor_instance
@@ -0,0 +1,738 @@
+"""
+Tokenizer and parser for the Mermaid diagram types the generators emit:
+mindmap, flowchart (and graph), sequenceDiagram, classDiagram, erDiagram and
+stateDiagram-v2.
+
+Mermaid statements are line-oriented, so the parser reads a line at a time:
+the header picks a per-type statement parser, and each line is scanned left
+to right (node ids, shapes, quoted strings, arrows, labels) into Statement
+records. Syntax errors carry the 1-based line and column of the offending
+token, e.g. an unquoted "(" inside a flowchart "[...]" label, an "end" with no
+open block, or an ER relationship without its ": label". Block openers
+(subgraph, loop/alt, class and entity bodies, composite states) are tracked
+on a stack and reported at their opening line when left unclosed.
+
+Every line is parsed once with anchored regexes, so the cost is linear in
+the input. MermaidParser.feed() accepts text as it streams and parses each
+line as soon as it is complete; parse() is feed() + close() for a whole
+diagram.
+
+    diagram = parse(code)
+    if not diagram.ok:
+        print(diagram.errors[0])   # line 4, column 12: unquoted '(' in a '[' label ...
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+HEADERS = {
+    "mindmap": "mindmap",
+    "flowchart": "flowchart",
+    "graph": "flowchart",
+    "sequenceDiagram": "sequence",
+    "classDiagram": "class",
+    "classDiagram-v2": "class",
+    "erDiagram": "er",
+    "stateDiagram": "state",
+    "stateDiagram-v2": "state",
+}
+
+_HEADER_RE = re.compile(r"\s*(" + "|".join(sorted(map(re.escape, HEADERS), key=len, reverse=True)) + r")(?![\w-])\s*(.*?)\s*$")
+_DIRECTIONS = frozenset(("TB", "TD", "BT", "RL", "LR"))
+_DIRECTION_RE = re.compile(r"direction\s+(TB|TD|BT|RL|LR)\s*$")
+_COMMON_RE = re.compile(r"(?:accTitle|accDescr|title)\b")
+
+
+class MermaidSyntaxError(NamedTuple):
+    line: int    # 1-based
+    column: int  # 1-based
+    message: str
+    code: str = "syntax"  # machine-readable category, e.g. "unquoted_label", "unclosed:subgraph"
+
+    def __str__(self) -> str:
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+
+class Statement(NamedTuple):
+    kind: str    # e.g. "node", "edge", "message", "relationship", "transition"
+    line: int
+    column: int
+    data: Dict[str, Any]
+
+
+@dataclass
+class Diagram:
+    kind: str = ""             # "mindmap", "flowchart", "sequence", "class", "er", "state"; "" without a header
+    header: str = ""           # the header line as written, e.g. "flowchart TD"
+    header_line: int = 0
+    statements: List[Statement] = field(default_factory=list)
+    errors: List[MermaidSyntaxError] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.kind) and not self.errors
+
+    def of(self, *kinds: str) -> List[Statement]:
+        return [s for s in self.statements if s.kind in kinds]
+
+
+class _Scanner:
+    """Left-to-right cursor over one line, with 1-based columns."""
+
+    def __init__(self, text: str, pos: int = 0):
+        self.text = text
+        self.pos = pos
+
+    def skip(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t":
+            self.pos += 1
+
+    def match(self, pattern: "re.Pattern") -> Optional["re.Match"]:
+        self.skip()
+        m = pattern.match(self.text, self.pos)
+        if m:
+            self.pos = m.end()
+        return m
+
+    def done(self) -> bool:
+        self.skip()
+        return self.pos >= len(self.text)
+
+    @property
+    def column(self) -> int:
+        return self.pos + 1
+
+
+class _ParseError(Exception):
+    def __init__(self, column: int, message: str, code: str = "syntax"):
+        super().__init__(message)
+        self.column = column
+        self.message = message
+        self.code = code
+
+
+class _Parser:
+    """Statement parser for one diagram type; subclasses implement statement()."""
+
+    kind = ""
+
+    def __init__(self, diagram: Diagram):
+        self.diagram = diagram
+        self.blocks: List[Tuple[str, int, int]] = []  # (block kind, line, column) of open blocks
+
+    def add(self, kind: str, line: int, column: int, **data) -> int:
+        self.diagram.statements.append(Statement(kind, line, column, data))
+        return len(self.diagram.statements) - 1
+
+    def error(self, line: int, column: int, message: str, code: str = "syntax"):
+        self.diagram.errors.append(MermaidSyntaxError(line, column, message, code))
+
+    def line(self, number: int, text: str):
+        stripped = text.strip()
+        if not stripped or stripped.startswith("%%"):
+            return
+        column = len(text) - len(text.lstrip()) + 1
+        try:
+            self.statement(number, column, stripped, text)
+        except _ParseError as e:
+            self.error(number, e.column, e.message, e.code)
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        raise NotImplementedError
+
+    def open_block(self, kind: str, number: int, column: int):
+        self.blocks.append((kind, number, column))
+
+    def close_block(self, number: int, column: int, token: str) -> Optional[str]:
+        if not self.blocks:
+            raise _ParseError(column, f"'{token}' without an open block", "stray_close")
+        return self.blocks.pop()[0]
+
+    def finish(self):
+        for kind, number, column in self.blocks:
+            self.error(number, column, f"unclosed '{kind}' block", f"unclosed:{kind}")
+        self.blocks = []
+
+
+# ---------------------------------------------------------------------------
+# mindmap
+# ---------------------------------------------------------------------------
+
+# (open, close, shape) longest first
+MINDMAP_SHAPES = (
+    ("((", "))", "circle"),
+    ("))", "((", "bang"),
+    ("{{", "}}", "hexagon"),
+    ("(", ")", "rounded"),
+    (")", "(", "cloud"),
+    ("[", "]", "square"),
+)
+_MINDMAP_DECORATION = re.compile(r"(::icon\(.*\)|:::.*)$")
+_BRACKETS = "()[]{}"
+
+
+def _quoted(label: str) -> bool:
+    return len(label) >= 2 and label[0] == label[-1] and label[0] in "\"`"
+
+
+class _MindmapParser(_Parser):
+    kind = "mindmap"
+
+    def __init__(self, diagram: Diagram):
+        super().__init__(diagram)
+        self.stack: List[Tuple[int, int]] = []  # (indent, statement index) of the open ancestors
+        self.root_indent: Optional[int] = None
+        self.last: Optional[int] = None
+
+    def _node(self, stripped: str, column: int) -> Tuple[str, str, str]:
+        """(id, shape, label) of a node line."""
+        start = next((i for i, c in enumerate(stripped) if c in "([{)]}"), -1)
+        if start < 0:
+            return stripped, "default", stripped
+        if stripped[start] in "]}":
+            raise _ParseError(column + start, f"unexpected '{stripped[start]}'", "stray_bracket")
+        node_id, rest = stripped[:start].strip(), stripped[start:]
+        for open_, close, shape in MINDMAP_SHAPES:
+            if rest.startswith(open_):
+                if not rest.endswith(close) or len(rest) < len(open_) + len(close):
+                    raise _ParseError(column + start, f"unclosed '{open_}' shape (expected '{close}' at the end)", "unclosed_shape")
+                inner = rest[len(open_):len(rest) - len(close)]
+                label = inner.strip()
+                if not label:
+                    raise _ParseError(column + start, f"empty '{open_}{close}' label", "empty_label")
+                if not _quoted(label):
+                    bad = next((i for i, c in enumerate(inner) if c in _BRACKETS), -1)
+                    if bad >= 0:
+                        raise _ParseError(
+                            column + start + len(open_) + bad,
+                            f"unquoted '{inner[bad]}' in a '{open_}' label; quote the label",
+                            "unquoted_label",
+                        )
+                return node_id or label, shape, label
+        raise _ParseError(column + start, f"unexpected '{rest[0]}'", "stray_bracket")
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        if _MINDMAP_DECORATION.match(stripped):
+            if self.last is None:
+                raise _ParseError(column, "icon or class before any node", "orphan_decoration")
+            self.add("decoration", number, column, node=self.last, text=stripped)
+            return
+
+        indent = len(text.expandtabs(4)) - len(text.expandtabs(4).lstrip())
+        node_id, shape, label = self._node(stripped, column)
+        if self.root_indent is None:
+            self.root_indent = indent
+        elif indent <= self.root_indent:
+            raise _ParseError(column, "a mindmap has exactly one root; indent this node under it", "multiple_roots")
+
+        while self.stack and self.stack[-1][0] >= indent:
+            self.stack.pop()
+        parent = self.stack[-1][1] if self.stack else None
+        self.last = self.add(
+            "node", number, column, id=node_id, shape=shape, label=label,
+            indent=indent, depth=len(self.stack) + 1, parent=parent,
+        )
+        self.stack.append((indent, self.last))
+
+    def finish(self):
+        if self.root_indent is None:
+            self.error(self.diagram.header_line, 1, "mindmap has no root node", "no_root")
+        super().finish()
+
+
+# ---------------------------------------------------------------------------
+# flowchart
+# ---------------------------------------------------------------------------
+
+_FLOW_ID = re.compile(r"\w+(?:-(?![-.>=])\w+)*")
+_AMPERSAND = re.compile(r"&")
+_FLOW_CLASS = re.compile(r":::([\w-]+)")
+# (open, closes) longest first
+FLOWCHART_SHAPES = (
+    ("(((", (")))",)), ("((", ("))",)), ("([", ("])",)), ("[[", ("]]",)), ("[(", (")]",)),
+    ("[/", ("/]", "\\]")), ("[\\", ("\\]", "/]")), ("{{", ("}}",)),
+    ("[", ("]",)), ("(", (")",)), ("{", ("}",)), (">", ("]",)),
+)
+FLOWCHART_LINK = re.compile(r"<?(?:-{2,}|={2,}|-\.+-|~{3,})(?:>|[ox](?=[\s|]|$))?")
+_FLOW_TEXT_LINK = re.compile(
+    r"(?P<open><?(?:--|==|-\.))\s+(?P<text>[^-=.|>][^|]*?)\s*(?P<close>-{2,}>|-{3,}|={2,}>|={3,}|\.-+>|\.-+)"
+)
+_PIPE_LABEL = re.compile(r"\|(?P<label>[^|]*)\|")
+_FLOW_KEYWORD = re.compile(r"(subgraph|end|classDef|class|style|linkStyle|click|direction)\b")
+
+
+class _FlowchartParser(_Parser):
+    kind = "flowchart"
+
+    def _shape(self, scan: _Scanner) -> Tuple[str, str]:
+        """(shape, label) at the cursor, or ("", "") when there is no shape."""
+        text, pos = scan.text, scan.pos
+        for open_, closes in FLOWCHART_SHAPES:
+            if not text.startswith(open_, pos):
+                continue
+            start = pos + len(open_)
+            if text.startswith('"', start):
+                end_quote = text.find('"', start + 1)
+                if end_quote < 0:
+                    raise _ParseError(start + 1, "unterminated string", "unterminated_string")
+                label, after = text[start + 1:end_quote], end_quote + 1
+                for close in closes:
+                    if text.startswith(close, after):
+                        scan.pos = after + len(close)
+                        return open_, label
+                raise _ParseError(after + 1, f"expected '{closes[0]}' to close '{open_}'", "unclosed_shape")
+            for i in range(start, len(text)):
+                for close in closes:
+                    if text.startswith(close, i):
+                        label = text[start:i]
+                        if not label.strip():
+                            raise _ParseError(pos + 1, f"empty '{open_}{close}' label", "empty_label")
+                        scan.pos = i + len(close)
+                        return open_, label.strip()
+                if text[i] in _BRACKETS or text[i] == '"':
+                    raise _ParseError(i + 1, f"unquoted '{text[i]}' in a '{open_}' label; quote the label", "unquoted_label")
+            raise _ParseError(pos + 1, f"unclosed '{open_}' (expected '{closes[0]}')", "unclosed_shape")
+        return "", ""
+
+    def _node(self, number: int, scan: _Scanner) -> str:
+        column = scan.column
+        m = scan.match(_FLOW_ID)
+        if not m:
+            rest = scan.text[scan.pos:]
+            raise _ParseError(scan.column, f"expected a node id, found '{rest[:10]}'", "expected_node")
+        node_id = m.group(0)
+        if node_id == "end":
+            raise _ParseError(column, "'end' is a keyword; use another node id", "keyword_id")
+        shape, label = self._shape(scan)
+        css = scan.match(_FLOW_CLASS)
+        self.add("node", number, column, id=node_id, shape=shape, label=label or None,
+                 css_class=css.group(1) if css else None)
+        return node_id
+
+    def _group(self, number: int, scan: _Scanner) -> List[str]:
+        ids = [self._node(number, scan)]
+        while scan.match(_AMPERSAND):
+            ids.append(self._node(number, scan))
+        return ids
+
+    def _chain(self, number: int, scan: _Scanner):
+        sources = self._group(number, scan)
+        while not scan.done() and scan.text[scan.pos] != ";":
+            column = scan.column
+            m = scan.match(_FLOW_TEXT_LINK)
+            if m:
+                arrow, label = "<" * m.group("open").startswith("<") + m.group("close"), m.group("text")
+            else:
+                m = scan.match(FLOWCHART_LINK)
+                if not m:
+                    raise _ParseError(scan.column, f"expected a link such as '-->', found '{scan.text[scan.pos:][:10]}'", "expected_link")
+                arrow, label = m.group(0), None
+                pipe = scan.match(_PIPE_LABEL)
+                if pipe:
+                    label = pipe.group("label").strip()
+            if scan.done() or scan.text[scan.pos] == ";":
+                raise _ParseError(scan.column, f"link '{arrow}' has no target node", "dangling_link")
+            targets = self._group(number, scan)
+            for src in sources:
+                for dst in targets:
+                    self.add("edge", number, column, source=src, target=dst, arrow=arrow, label=label)
+            sources = targets
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        keyword = _FLOW_KEYWORD.match(stripped)
+        if keyword and (len(stripped) == keyword.end() or stripped[keyword.end()] in " \t;"):
+            word = keyword.group(1)
+            if word == "subgraph":
+                title = stripped[len(word):].strip()
+                self.add("subgraph", number, column, title=title)
+                self.open_block("subgraph", number, column)
+            elif word == "end":
+                self.close_block(number, column, "end")
+                self.add("end", number, column)
+            elif word == "direction" and not _DIRECTION_RE.match(stripped):
+                raise _ParseError(column + len(word) + 1, "direction must be one of TB, TD, BT, RL, LR", "direction")
+            else:
+                self.add(word, number, column, text=stripped)
+            return
+        if _COMMON_RE.match(stripped):
+            self.add("meta", number, column, text=stripped)
+            return
+
+        # statements may be separated by ';' on one line
+        scan = _Scanner(text, column - 1)
+        while not scan.done():
+            if text[scan.pos] == ";":
+                scan.pos += 1
+            else:
+                self._chain(number, scan)
+
+
+# ---------------------------------------------------------------------------
+# sequenceDiagram
+# ---------------------------------------------------------------------------
+
+_SEQ_PARTICIPANT = re.compile(r"(?:create\s+)?(participant|actor)\s+(?P<name>.+?)(?:\s+as\s+(?P<alias>.+?))?\s*$")
+_SEQ_ARROW = re.compile(r"<<-->>|<<->>|-->>|->>|--[x)]|-[x)]|-->|->")
+_SEQ_ACTOR = re.compile(r"[^\->:,;+]+?(?=\s*(?:<<|-|:|$))")
+_SEQ_NOTE = re.compile(r"note\s+(?:(left|right)\s+of|over)\s+(?P<actors>[^:]+?)\s*:(?P<text>.*)$", re.I)
+_SEQ_BLOCKS = ("loop", "alt", "opt", "par", "critical", "break", "rect", "box")
+_SEQ_BRANCHES = {"else": "alt", "and": "par", "option": "critical"}
+_SEQ_SIMPLE = re.compile(r"(activate|deactivate|destroy)\s+(?P<name>\S.*?)\s*$|(autonumber|links?)\b")
+
+
+class _SequenceParser(_Parser):
+    kind = "sequence"
+
+    def __init__(self, diagram: Diagram):
+        super().__init__(diagram)
+        self.declared: set = set()
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        first = stripped.split(None, 1)[0]
+        if first in _SEQ_BLOCKS:
+            self.add(first, number, column, text=stripped[len(first):].strip())
+            self.open_block(first, number, column)
+            return
+        if first in _SEQ_BRANCHES:
+            if not self.blocks or self.blocks[-1][0] != _SEQ_BRANCHES[first]:
+                raise _ParseError(column, f"'{first}' outside an '{_SEQ_BRANCHES[first]}' block", "orphan_branch")
+            self.add(first, number, column, text=stripped[len(first):].strip())
+            return
+        if stripped == "end":
+            self.close_block(number, column, "end")
+            self.add("end", number, column)
+            return
+        m = _SEQ_PARTICIPANT.match(stripped)
+        if m:
+            name = m.group("name").strip('"')
+            self.declared.add(name)
+            self.add("participant", number, column, role=m.group(1), name=name, alias=m.group("alias"))
+            return
+        m = _SEQ_NOTE.match(stripped)
+        if m:
+            actors = [a.strip() for a in m.group("actors").split(",")]
+            self.add("note", number, column, placement=m.group(1) or "over", actors=actors, text=m.group("text").strip())
+            return
+        if _SEQ_SIMPLE.match(stripped) or _COMMON_RE.match(stripped):
+            self.add(first, number, column, text=stripped)
+            return
+        self._message(number, column, text)
+
+    def _message(self, number: int, column: int, text: str):
+        scan = _Scanner(text, column - 1)
+        source = scan.match(_SEQ_ACTOR)
+        if not source:
+            raise _ParseError(column, "expected a message like 'A->>B: text'", "statement")
+        arrow = scan.match(_SEQ_ARROW)
+        if not arrow:
+            raise _ParseError(scan.column, "unrecognized statement; messages need an arrow such as '->>'", "statement")
+        activation = scan.match(re.compile(r"[+-]"))
+        target_column = scan.column
+        target = scan.match(_SEQ_ACTOR)
+        if not target or not target.group(0).strip():
+            raise _ParseError(target_column, f"message arrow '{arrow.group(0)}' has no target", "dangling_link")
+        scan.skip()
+        if scan.pos >= len(text) or text[scan.pos] != ":":
+            raise _ParseError(scan.column, "message needs ': text' after the target", "message_text")
+        self.add(
+            "message", number, column, source=source.group(0).strip(), target=target.group(0).strip(),
+            arrow=arrow.group(0), activation=activation.group(0) if activation else None,
+            text=text[scan.pos + 1:].strip(),
+        )
+
+
+# ---------------------------------------------------------------------------
+# classDiagram
+# ---------------------------------------------------------------------------
+
+_CLASS_NAME = r"[\w.]+(?:~[\w<>,\s]+~)?"
+_CLASS_DECL = re.compile(r"class\s+(?P<name>" + _CLASS_NAME + r")(?:\s*\[\"[^\"]*\"\])?\s*(?P<open>\{)?\s*(?P<close>\})?\s*$")
+_CLASS_REL = re.compile(
+    r"(?P<a>" + _CLASS_NAME + r')\s*(?:"(?P<ca>[^"]*)"\s*)?'
+    r"(?P<rel><\|--\|>|<\|--|<\|\.\.|--\|>|\.\.\|>|\*--|--\*|o--|--o|<-->|-->|<--|\.\.>|<\.\.|--|\.\.)"
+    r'\s*(?:"(?P<cb>[^"]*)"\s*)?(?P<b>' + _CLASS_NAME + r")\s*(?::\s*(?P<label>.*))?$"
+)
+_CLASS_MEMBER = re.compile(r"(?P<name>" + _CLASS_NAME + r")\s*:\s*(?P<member>.+)$")
+_CLASS_ANNOTATION = re.compile(r"<<\s*\w+\s*>>(?:\s+[\w.]+)?$")
+_CLASS_NOTE = re.compile(r'note(?:\s+for\s+[\w.]+)?\s+"[^"]*"$')
+_CLASS_MISC = re.compile(r"(classDef|cssClass|style|click|link|callback|direction)\b")
+_NAMESPACE = re.compile(r"namespace\s+[\w.]+\s*\{\s*$")
+
+
+
+def class_body_line(stripped: str) -> bool:
+    """Whether a line can be a member of a class body, rather than a statement that ends it."""
+    if stripped.endswith(("{", "}")) or _CLASS_DECL.match(stripped) or _NAMESPACE.match(stripped):
+        return False
+    return not (
+        _CLASS_REL.match(stripped) or _CLASS_MEMBER.match(stripped)
+        or _CLASS_NOTE.match(stripped) or _CLASS_MISC.match(stripped)
+    )
+
+class _ClassParser(_Parser):
+    kind = "class"
+
+    def __init__(self, diagram: Diagram):
+        super().__init__(diagram)
+        self._owner = ""  # class whose { ... } body is open
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        if self.blocks and self.blocks[-1][0] == "class":
+            if stripped == "}":
+                self.close_block(number, column, "}")
+                return
+            if stripped.endswith("{"):
+                raise _ParseError(column, "nested block inside a class body; close it with '}' first", "nested_block")
+            self.add("member", number, column, owner=self._owner, member=stripped)
+            return
+        if stripped == "}":
+            self.close_block(number, column, "}")
+            return
+        m = _CLASS_DECL.match(stripped)
+        if m:
+            self._owner = m.group("name")
+            self.add("class", number, column, name=m.group("name"))
+            if m.group("open") and not m.group("close"):
+                self.open_block("class", number, column)
+            elif m.group("close") and not m.group("open"):
+                raise _ParseError(column + len(stripped) - 1, "'}' without an open block", "stray_close")
+            return
+        if _NAMESPACE.match(stripped):
+            self.add("namespace", number, column, text=stripped)
+            self.open_block("namespace", number, column)
+            return
+        m = _CLASS_REL.match(stripped)
+        if m:
+            self.add("relation", number, column, source=m.group("a"), target=m.group("b"), relation=m.group("rel"),
+                     cardinality=(m.group("ca"), m.group("cb")), label=m.group("label"))
+            return
+        m = _CLASS_MEMBER.match(stripped)
+        if m:
+            self.add("member", number, column, owner=m.group("name"), member=m.group("member").strip())
+            return
+        if _CLASS_ANNOTATION.match(stripped) or _CLASS_NOTE.match(stripped) or _CLASS_MISC.match(stripped):
+            self.add("meta", number, column, text=stripped)
+            return
+        if _COMMON_RE.match(stripped):
+            self.add("meta", number, column, text=stripped)
+            return
+        if re.fullmatch(_CLASS_NAME, stripped):
+            self.add("class", number, column, name=stripped)
+            return
+        raise _ParseError(column, "unrecognized class diagram statement", "statement")
+
+
+# ---------------------------------------------------------------------------
+# erDiagram
+# ---------------------------------------------------------------------------
+
+_ER_NAME = r'[\w-]+|"[^"]+"'
+_ER_ENTITY = re.compile(r"(?P<name>" + _ER_NAME + r")(?:\s*\[[^\]]*\])?\s*\{\s*(?P<close>\})?\s*$")
+_ER_ATTRIBUTE = re.compile(
+    r"(?P<type>[\w\-\[\]().,]+)\s+(?P<name>[\w\-\[\]()*]+)"
+    r"(?:\s+(?P<keys>(?:PK|FK|UK)(?:\s*,\s*(?:PK|FK|UK))*))?(?:\s+\"(?P<comment>[^\"]*)\")?\s*$"
+)
+_ER_CARDINALITY = r"(?:\|o|\|\||\}o|\}\|)(?:--|\.\.)(?:o\||\|\||o\{|\|\{)"
+_ER_REL_PREFIX = re.compile(r"(?P<a>" + _ER_NAME + r")\s*(?P<card>[|}{o]*(?:--|\.\.)[|{}o]*)\s*(?P<b>" + _ER_NAME + r")")
+
+
+class _ErParser(_Parser):
+    kind = "er"
+
+    def __init__(self, diagram: Diagram):
+        super().__init__(diagram)
+        self._entity = ""  # entity whose { ... } body is open
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        if self.blocks:
+            if stripped == "}":
+                self.close_block(number, column, "}")
+                return
+            m = _ER_ATTRIBUTE.match(stripped)
+            if not m:
+                if len(stripped.split()) == 1:
+                    raise _ParseError(column, f"attribute '{stripped}' needs a type and a name", "attribute_type")
+                raise _ParseError(column, "attribute must be 'type name [PK|FK|UK] [\"comment\"]'", "attribute")
+            self.add("attribute", number, column, entity=self._entity, type=m.group("type"), name=m.group("name"),
+                     keys=[k.strip() for k in (m.group("keys") or "").split(",") if k.strip()],
+                     comment=m.group("comment"))
+            return
+        if stripped == "}":
+            raise _ParseError(column, "'}' without an open block", "stray_close")
+        m = _ER_ENTITY.match(stripped)
+        if m:
+            self._entity = m.group("name").strip('"')
+            self.add("entity", number, column, name=self._entity)
+            if not m.group("close"):
+                self.open_block("entity", number, column)
+            return
+        m = _ER_REL_PREFIX.match(stripped)
+        if m:
+            if not re.fullmatch(_ER_CARDINALITY, m.group("card")):
+                raise _ParseError(column + m.start("card"), f"invalid relationship cardinality '{m.group('card')}'", "cardinality")
+            rest = stripped[m.end():].strip()
+            if not rest.startswith(":") or not rest[1:].strip():
+                raise _ParseError(column + m.end(), "relationship needs ': label'", "relationship_label")
+            self.add("relationship", number, column, left=m.group("a").strip('"'), right=m.group("b").strip('"'),
+                     cardinality=m.group("card"), label=rest[1:].strip().strip('"'))
+            return
+        if re.fullmatch(_ER_NAME, stripped):
+            self.add("entity", number, column, name=stripped.strip('"'))
+            return
+        if _COMMON_RE.match(stripped):
+            self.add("meta", number, column, text=stripped)
+            return
+        raise _ParseError(column, "unrecognized ER statement", "statement")
+
+
+# ---------------------------------------------------------------------------
+# stateDiagram-v2
+# ---------------------------------------------------------------------------
+
+_STATE_ID = r"\[\*\]|[\w.]+(?:-[\w.]+)*(?::::[\w-]+)?"
+_STATE_TRANSITION = re.compile(
+    r"(?P<a>" + _STATE_ID + r")\s*(?P<arrow>-->|->|=>|-{3,}>|—>)\s*(?P<b>" + _STATE_ID + r")\s*(?P<rest>.*)$"
+)
+_STATE_DECL = re.compile(
+    r'state\s+(?:"(?P<desc>[^"]*)"\s+as\s+)?(?P<name>[\w.-]+)\s*(?P<kind><<(?:fork|join|choice)>>)?\s*(?P<open>\{)?\s*$'
+)
+_STATE_DESC = re.compile(r"(?P<name>[\w.-]+)\s*:\s*(?P<desc>.*)$")
+_STATE_NOTE = re.compile(r"note\s+(?:left|right)\s+of\s+[\w.-]+\s*(?::\s*(?P<text>.*))?$", re.I)
+_STATE_MISC = re.compile(r"(classDef|class|style|direction|scale|hide\s+empty\s+description)\b")
+
+
+class _StateParser(_Parser):
+    kind = "state"
+
+    def statement(self, number: int, column: int, stripped: str, text: str):
+        if self.blocks and self.blocks[-1][0] == "note":
+            if stripped.lower() == "end note":
+                self.close_block(number, column, "end note")
+            return
+        m = _STATE_TRANSITION.match(stripped)
+        if m:
+            if m.group("arrow") != "-->":
+                raise _ParseError(column + m.start("arrow"), f"state transitions use '-->', not '{m.group('arrow')}'", "arrow")
+            rest = m.group("rest").strip()
+            if rest and not rest.startswith(":"):
+                raise _ParseError(column + m.start("rest"), "transition label must follow ':'", "transition_label")
+            self.add("transition", number, column, source=m.group("a"), target=m.group("b"),
+                     label=rest[1:].strip() if rest else None)
+            return
+        if stripped == "}":
+            self.close_block(number, column, "}")
+            return
+        if stripped == "--":
+            if not self.blocks:
+                raise _ParseError(column, "'--' outside a composite state", "statement")
+            self.add("concurrency", number, column)
+            return
+        if stripped.startswith("state"):
+            m = _STATE_DECL.match(stripped)
+            if not m:
+                raise _ParseError(column, "state declaration must be 'state Name', 'state \"Desc\" as Name' or 'state Name {'", "statement")
+            self.add("state", number, column, name=m.group("name"), description=m.group("desc"),
+                     pseudo=(m.group("kind") or "").strip("<>") or None)
+            if m.group("open"):
+                self.open_block("state", number, column)
+            return
+        m = _STATE_NOTE.match(stripped)
+        if m:
+            self.add("note", number, column, text=m.group("text"))
+            if m.group("text") is None:
+                self.open_block("note", number, column)
+            return
+        if _STATE_MISC.match(stripped) or _COMMON_RE.match(stripped):
+            self.add("meta", number, column, text=stripped)
+            return
+        m = _STATE_DESC.match(stripped)
+        if m:
+            self.add("state", number, column, name=m.group("name"), description=m.group("desc").strip(), pseudo=None)
+            return
+        if re.fullmatch(_STATE_ID, stripped):
+            self.add("state", number, column, name=stripped, description=None, pseudo=None)
+            return
+        raise _ParseError(column, "unrecognized state diagram statement", "statement")
+
+
+_PARSERS = {p.kind: p for p in (_MindmapParser, _FlowchartParser, _SequenceParser, _ClassParser, _ErParser, _StateParser)}
+
+
+class MermaidParser:
+    """Incremental parser: feed() text as it arrives, close() for the final Diagram."""
+
+    def __init__(self):
+        self.diagram = Diagram()
+        self._parser: Optional[_Parser] = None
+        self._pending = ""
+        self._line = 0
+        self._frontmatter = False
+        self._closed = False
+
+    def feed(self, text: str) -> List[MermaidSyntaxError]:
+        """Parse the complete lines in `text` (plus any partial line held back); return the new errors."""
+        seen = len(self.diagram.errors)
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._feed_line(line.rstrip("\r"))
+        return self.diagram.errors[seen:]
+
+    def close(self) -> Diagram:
+        if not self._closed:
+            if self._pending:
+                self._feed_line(self._pending.rstrip("\r"))
+                self._pending = ""
+            if self._parser:
+                self._parser.finish()
+            elif not self.diagram.errors:
+                self.diagram.errors.append(MermaidSyntaxError(max(self._line, 1), 1, "missing diagram header", "header"))
+            self._closed = True
+        return self.diagram
+
+    def _feed_line(self, line: str):
+        self._line += 1
+        if self._parser:
+            self._parser.line(self._line, line)
+            return
+
+        stripped = line.strip()
+        if stripped == "---":  # YAML front matter before the header
+            self._frontmatter = not self._frontmatter
+            return
+        if self._frontmatter or not stripped or stripped.startswith("%%"):
+            return
+        m = _HEADER_RE.match(line)
+        if not m:
+            self.diagram.errors.append(
+                MermaidSyntaxError(self._line, len(line) - len(line.lstrip()) + 1, f"expected a diagram header, found '{stripped[:30]}'", "header")
+            )
+            return
+        keyword, rest = m.groups()
+        kind = HEADERS[keyword]
+        self.diagram.kind, self.diagram.header, self.diagram.header_line = kind, stripped, self._line
+        self._parser = _PARSERS[kind](self.diagram)
+        if rest:
+            column = m.start(2) + 1
+            direction, _, extra = rest.partition(" ")
+            if kind == "flowchart" and direction.rstrip(";") in _DIRECTIONS:
+                if extra.strip(" ;"):
+                    self.diagram.errors.append(MermaidSyntaxError(self._line, column, "unexpected text after the direction", "header_extra"))
+            elif kind == "flowchart":
+                self.diagram.errors.append(MermaidSyntaxError(self._line, column, f"unknown direction '{direction}'", "direction"))
+            else:
+                self.diagram.errors.append(MermaidSyntaxError(self._line, column, f"unexpected text after '{keyword}'", "header_extra"))
+
+
+def header_kind(line: str) -> Optional[str]:
+    """Diagram kind of a header line ("graph LR" -> "flowchart"), or None."""
+    m = _HEADER_RE.match(line)
+    return HEADERS[m.group(1)] if m else None
+
+
+def parse(code: str) -> Diagram:
+    """Parse a whole Mermaid diagram."""
+    parser = MermaidParser()
+    parser.feed(code or "")
+    return parser.close()
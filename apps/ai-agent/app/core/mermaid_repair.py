@@ -0,0 +1,441 @@
+"""
+Local, deterministic repair of LLM-produced Mermaid.
+
+Most invalid diagrams fail for mechanical reasons, so they are fixed here
+instead of being sent back to the LLM:
+
+1. Text cleanup before parsing: <think> blocks, code fences, prose before the
+   header or after the diagram, tabs, and a missing, wrong or decorated header
+   ("mindmap about X", "graph" when a mindmap was asked for). A mindmap
+   written as flowchart edges ("A --> B") is rebuilt as a tree, and a mindmap
+   with several top-level nodes gets a single root.
+2. Error-driven fixes: the diagram is parsed (app.core.mermaid_parser) and
+   each error is fixed at its line with a rule for its code: quote labels
+   that contain brackets, close unclosed shapes, rename an "end" node id,
+   complete messages and relationships that lack ": text", fix state arrows,
+   close unclosed blocks. A line no rule can fix is dropped.
+   This repeats for a few rounds, until the diagram parses.
+
+repair() reports every change in `fixes`; callers fall back to an LLM repair
+only when `ok` is False.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.mermaid_parser import (
+    FLOWCHART_LINK,
+    FLOWCHART_SHAPES,
+    MINDMAP_SHAPES,
+    Diagram,
+    MermaidSyntaxError,
+    class_body_line,
+    header_kind,
+    parse,
+)
+
+# header written for each diagram kind
+KEYWORDS = {
+    "mindmap": "mindmap",
+    "flowchart": "flowchart TD",
+    "sequence": "sequenceDiagram",
+    "class": "classDiagram",
+    "er": "erDiagram",
+    "state": "stateDiagram-v2",
+}
+
+# line that closes each kind of block
+_CLOSERS = {"subgraph": "end", "class": "}", "namespace": "}", "entity": "}", "state": "}", "note": "end note"}
+
+_THINK_RE = re.compile(r"<think>[\s\S]*?(?:</think>|$)", re.I)
+_FENCE_RE = re.compile(r"```[ \t]*([\w-]*)[^\n]*\n([\s\S]*?)(?:\n[ \t]*```|$)")
+_FENCE_LINE = re.compile(r"\s*(?:```|~~~)\S*\s*$")
+_PROSE_ARTIFACTS = re.compile(r"-->|->|--|==|::|[{}]")
+_LIST_MARKER = re.compile(r"(\s*)(?:[-*•]|\d+[.)])\s+(?=\S)")
+_FLOW_EDGE = re.compile(r"-->|---|==>|-\.->")
+_FLOW_LINK_AHEAD = re.compile(r"\s*(?:-->|---|==>|-\.->|-\.-|~~~|&|;|:::|$)")
+_TRAILING_LINK = re.compile(r"\s*(?:" + FLOWCHART_LINK.pattern + r")\s*(?:\|[^|]*\|)?\s*;?\s*$")
+_STATE_ARROW = re.compile(r"-->|->|=>|-{3,}>|—>")
+_ER_CARD = re.compile(r"[|}{o]*(?:--|\.\.)[|{}o]*")
+
+
+class RepairResult(NamedTuple):
+    code: str
+    ok: bool
+    fixes: List[str]       # human-readable log of every change
+    diagram: Diagram       # parse of `code`
+
+
+def clean_text(raw: str) -> str:
+    """Strip <think> blocks, unwrap code fences and turn indenting tabs into two spaces."""
+    text = _THINK_RE.sub("", (raw or "").replace("\r\n", "\n"))
+    blocks = _FENCE_RE.findall(text)
+    if blocks:
+        bodies = [body for lang, body in blocks if lang.lower() == "mermaid"]
+        bodies += [body for _, body in blocks if any(header_kind(line) for line in body.splitlines())]
+        text = bodies[0] if bodies else blocks[0][1]
+    lines = [
+        re.sub(r"^\t+", lambda m: "  " * len(m.group(0)), line)
+        for line in text.split("\n") if not _FENCE_LINE.match(line)
+    ]
+    return "\n".join(lines).strip("\n")
+
+
+def _header_index(lines: List[str]) -> Optional[int]:
+    return next((i for i, line in enumerate(lines) if header_kind(line)), None)
+
+
+def _is_prose(line: str) -> bool:
+    stripped = line.strip()
+    return (
+        len(stripped.split()) >= 5 and stripped[-1:] in ".!?" and line[:1] not in " \t"
+        and not _PROSE_ARTIFACTS.search(stripped)
+    )
+
+
+def _fix_header(lines: List[str], kind: Optional[str], fixes: List[str]) -> List[str]:
+    index = _header_index(lines)
+    if index is None:
+        if not kind:
+            return lines
+        fixes.append(f"added '{KEYWORDS[kind]}' header")
+        return [KEYWORDS[kind]] + [line for line in lines if line.strip()]
+
+    if index:
+        kept = [line for line in lines[:index] if line.strip().startswith("%%")]
+        fixes.append(f"dropped {index - len(kept)} line(s) before the header")
+        lines = kept + lines[index:]
+        index = len(kept)
+
+    header = lines[index].strip()
+    found = header_kind(header)
+    words = header.rstrip(";").split()
+    if kind and found != kind:
+        fixed = KEYWORDS[kind]
+    elif found == "flowchart":
+        direction = words[1].upper() if len(words) > 1 else ""
+        fixed = f"{words[0]} {direction}" if direction in ("TB", "TD", "BT", "RL", "LR") else f"{words[0]} TD"
+    else:
+        fixed = words[0]
+    if fixed != header:
+        fixes.append(f"header '{header}' -> '{fixed}'")
+        lines[index] = fixed
+
+    # prose after the diagram: a trailing paragraph of plain sentences
+    end = len(lines)
+    while end > index + 1 and (not lines[end - 1].strip() or _is_prose(lines[end - 1])):
+        end -= 1
+    if any(line.strip() for line in lines[end:]):
+        fixes.append("dropped prose after the diagram")
+    return lines[:end]
+
+
+# ---------------------------------------------------------------------------
+# mindmap structure
+# ---------------------------------------------------------------------------
+
+def _plain_label(text: str) -> str:
+    return " ".join(re.sub(r"[\[\](){}\"]", " ", text).split())
+
+
+def _mindmap_from_edges(lines: List[str], root_label: str, fixes: List[str]) -> List[str]:
+    """Rebuild a mindmap whose body was written as flowchart edges."""
+    body = lines[1:]
+    if not any(_FLOW_EDGE.search(line) for line in body):
+        return lines
+    diagram = parse("\n".join(["flowchart TD"] + body))
+    edges = diagram.of("edge")
+    if not edges:
+        return lines
+
+    labels: Dict[str, str] = {}
+    for node in diagram.of("node"):
+        if node.data["label"] and node.data["id"] not in labels:
+            labels[node.data["id"]] = _plain_label(node.data["label"])
+    children: Dict[str, List[str]] = {}
+    targets = set()
+    order: List[str] = []
+    for edge in edges:
+        src, dst = edge.data["source"], edge.data["target"]
+        for node_id in (src, dst):
+            if node_id not in order:
+                order.append(node_id)
+        if dst not in children.setdefault(src, []):
+            children[src].append(dst)
+        targets.add(dst)
+
+    roots = [n for n in order if n not in targets] or order[:1]
+    out = [lines[0]]
+    seen = set()
+
+    def emit(node_id: str, depth: int):
+        if node_id in seen:
+            return
+        seen.add(node_id)
+        out.append("  " * (depth + 1) + (labels.get(node_id) or node_id))
+        for child in children.get(node_id, []):
+            emit(child, depth + 1)
+
+    if len(roots) == 1:
+        out.append(f"  root(({labels.get(roots[0]) or roots[0]}))")
+        seen.add(roots[0])
+        for child in children.get(roots[0], []):
+            emit(child, 1)
+    else:
+        out.append(f"  root(({_plain_label(root_label) or 'Topic'}))")
+        for root in roots:
+            emit(root, 1)
+    fixes.append(f"rebuilt mindmap from {len(edges)} flowchart edge(s)")
+    return out
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _mindmap_single_root(lines: List[str], root_label: str, fixes: List[str]) -> List[str]:
+    """Give a mindmap exactly one root, re-indenting its other nodes under it."""
+    header, body = lines[0], [line.replace("\t", "  ") for line in lines[1:]]
+    nodes = [i for i, line in enumerate(body) if line.strip() and not line.strip().startswith(("%%", "::"))]
+    if not nodes:
+        return lines
+    # list markers ("- Topic", "1. Topic") are not part of the labels
+    for i in nodes:
+        m = _LIST_MARKER.match(body[i])
+        if m:
+            body[i] = m.group(1) + body[i][m.end():]
+    first = nodes[0]
+    root_indent = _indent(body[first])
+    rest = [i for i in nodes[1:]]
+    if not rest or min(_indent(body[i]) for i in rest) > root_indent:
+        return [header] + body
+
+    first_text = body[first].strip()
+    if first_text.lower().startswith("root") or first_text.startswith("(("):
+        shift = root_indent + 2 - min(_indent(body[i]) for i in rest)
+        fixes.append("indented nodes under the root")
+        return [header] + body[: first + 1] + [" " * shift + line if line.strip() else line for line in body[first + 1:]]
+
+    base = min(_indent(body[i]) for i in nodes)
+    fixes.append("added a root node")
+    return [header, f"  root(({_plain_label(root_label) or 'Topic'}))"] + [
+        " " * (4 - base) + line if line.strip() and base < 4 else line for line in body
+    ]
+
+
+# ---------------------------------------------------------------------------
+# per-error fixes
+# ---------------------------------------------------------------------------
+
+def _quote(label: str) -> str:
+    return '"' + label.strip().replace('"', "#quot;") + '"'
+
+
+def _fix_mindmap_node(line: str) -> str:
+    indent, text = line[: _indent(line)], line.strip()
+    start = next((i for i, c in enumerate(text) if c in "([{)]}"), -1)
+    if start < 0:
+        return line
+    node_id, rest = text[:start].strip(), text[start:]
+    for open_, close, _ in MINDMAP_SHAPES:
+        if rest.startswith(open_):
+            inner = rest[len(open_):]
+            inner = (inner[: -len(close)] if inner.endswith(close) else inner.rstrip(")]}(")).strip()
+            if inner.startswith('"') and inner.endswith('"') and len(inner) > 1:
+                inner = inner[1:-1]
+            if inner:
+                needs_quotes = any(c in inner for c in "()[]{}\"")
+                return f"{indent}{node_id}{open_}{_quote(inner) if needs_quotes else inner}{close}"
+            break
+    return indent + (_plain_label(text) or "Node")
+
+
+def _flow_closer(text: str, start: int, closes: Tuple[str, ...]) -> Tuple[int, str]:
+    """(offset, closer) ending the shape opened before `start`: the first closer followed by a link or the end."""
+    for i in range(start, len(text)):
+        for close in closes:
+            if text.startswith(close, i) and _FLOW_LINK_AHEAD.match(text, i + len(close)):
+                return i, close
+    return -1, closes[0]
+
+
+def _fix_flowchart_labels(line: str) -> str:
+    """Quote shape labels that contain brackets or quotes, and close unclosed shapes."""
+    out, pos = [], 0
+    id_re = re.compile(r"\w+")
+    while pos < len(line):
+        m = id_re.search(line, pos)
+        if not m:
+            break
+        after = m.end()
+        shape = next(((o, c) for o, c in FLOWCHART_SHAPES if line.startswith(o, after)), None)
+        if not shape:
+            out.append(line[pos:after])
+            pos = after
+            continue
+        open_, closes = shape
+        start = after + len(open_)
+        end, close = _flow_closer(line, start, closes)
+        if end < 0:  # unclosed: the label runs to the next link
+            link = re.compile(r"\s+(?:-->|---|==>|-\.->|-\.-)").search(line, start)
+            end = link.start() if link else len(line.rstrip())
+            label, resume = line[start:end], end
+        else:
+            label, resume = line[start:end], end + len(close)
+        inner = label.strip()
+        if inner.startswith('"') and inner.endswith('"') and len(inner) > 1:
+            inner = inner[1:-1]
+        if any(c in inner for c in "()[]{}\"") or not label.strip():
+            inner = _quote(inner or m.group(0))
+        out.append(line[pos:start - len(open_)] + open_ + inner + close)
+        pos = resume
+    out.append(line[pos:])
+    return "".join(out)
+
+
+def _fix_line(kind: str, line: str, error: MermaidSyntaxError) -> Optional[str]:
+    """The fixed line, or None when no rule applies."""
+    code, col = error.code, error.column - 1
+    if kind == "mindmap" and code in ("unquoted_label", "unclosed_shape", "stray_bracket", "empty_label"):
+        return _fix_mindmap_node(line)
+    if kind == "flowchart":
+        if code in ("unquoted_label", "unclosed_shape", "empty_label", "unterminated_string"):
+            fixed = _fix_flowchart_labels(line.replace('"', "") if code == "unterminated_string" else line)
+            return fixed if fixed != line else None
+        if code == "keyword_id":
+            return line[:col] + "End" + line[col + 3:]
+        if code == "dangling_link":
+            fixed = _TRAILING_LINK.sub("", line[:col])
+            return fixed if fixed.strip() else None
+    if kind == "sequence":
+        if code == "message_text":
+            return f"{line.rstrip()}: message"
+        if code == "statement" and re.search(r"=>|→", line) and ":" in line:
+            return re.sub(r"\s*(?:=>|→)\s*", "->>", line, count=1)
+    if kind == "er":
+        if code == "attribute_type":
+            return f"{line[:col]}string {line[col:].strip()}"
+        if code == "cardinality":
+            m = _ER_CARD.match(line, col)
+            if m:
+                return line[:col] + ("||..o{" if ".." in m.group(0) else "||--o{") + line[m.end():]
+        if code == "relationship_label":
+            return f'{line.rstrip()} : "relates to"'
+    if kind == "state":
+        if code == "arrow":
+            m = _STATE_ARROW.match(line, col)
+            if m:
+                return line[:col] + "-->" + line[m.end():]
+        if code == "transition_label":
+            return f"{line[:col].rstrip()} : {line[col:].strip()}"
+    if code == "header_extra" or code == "direction" and error.line == 1:
+        return KEYWORDS.get(kind, line)
+    return None
+
+
+def _close_blocks(lines: List[str], errors: List[MermaidSyntaxError]) -> List[str]:
+    """
+    Insert the closer of each unclosed block. A "}" block ends before the first
+    line indented no deeper than its opener (LLMs indent braced bodies); a
+    class body, whose members are often not indented, before the first line
+    that is not a member, or back at the opener's indent after indented ones.
+    "end" blocks are often not indented, so they are closed at the end.
+    """
+    inserts = []
+    for error in errors:
+        block = error.code.split(":", 1)[1]
+        closer = _CLOSERS.get(block, "end")
+        opener = error.line - 1
+        indent = _indent(lines[opener])
+        at = len(lines)
+        if block == "class":
+            indented = False
+            for j in range(opener + 1, len(lines)):
+                stripped = lines[j].strip()
+                if not stripped:
+                    continue
+                if not class_body_line(stripped) or (indented and _indent(lines[j]) <= indent):
+                    at = j
+                    break
+                indented = indented or _indent(lines[j]) > indent
+        elif closer == "}":
+            at = next(
+                (j for j in range(opener + 1, len(lines)) if lines[j].strip() and _indent(lines[j]) <= indent),
+                len(lines),
+            )
+        while at > opener + 1 and not lines[at - 1].strip():
+            at -= 1
+        inserts.append((at, opener, " " * indent + closer))
+    # at equal positions the inner (later) opener must close first, so it is inserted last
+    for at, _, closer in sorted(inserts, key=lambda item: (-item[0], item[1])):
+        lines = lines[:at] + [closer] + lines[at:]
+    return lines
+
+
+def _declare_participants(lines: List[str], diagram: Diagram, fixes: List[str]) -> List[str]:
+    """Declare the actors of a sequence diagram in order of appearance when none are declared."""
+    if diagram.of("participant"):
+        return lines
+    names: List[str] = []
+    for message in diagram.of("message"):
+        for name in (message.data["source"], message.data["target"]):
+            if name not in names and " " not in name:
+                names.append(name)
+    if not names:
+        return lines
+    at = diagram.header_line
+    fixes.append(f"declared {len(names)} participant(s)")
+    return lines[:at] + [f"    participant {name}" for name in names] + lines[at:]
+
+
+def repair(raw: str, kind: Optional[str] = None, root_label: str = "Topic", rounds: int = 4) -> RepairResult:
+    """
+    Fix a Mermaid diagram locally. `kind` is the expected diagram kind
+    ("mindmap", "flowchart", ...); without it the header's kind is kept.
+    """
+    fixes: List[str] = []
+    text = clean_text(raw)
+    if text != (raw or "").strip("\n"):
+        fixes.append("removed fences / <think> blocks")
+    lines = _fix_header(text.split("\n"), kind, fixes)
+
+    diagram = parse("\n".join(lines))
+    if diagram.kind == "mindmap" and not diagram.ok:
+        lines = _mindmap_from_edges(lines, root_label, fixes)
+        lines = _mindmap_single_root(lines, root_label, fixes)
+
+    for _ in range(rounds):
+        diagram = parse("\n".join(lines))
+        if diagram.ok or not diagram.kind:
+            break
+        unclosed = [e for e in diagram.errors if e.code.startswith("unclosed:")]
+        if unclosed:
+            # close blocks first: what else is wrong depends on where they end
+            lines = _close_blocks(lines, unclosed)
+            fixes.append(f"closed {len(unclosed)} block(s)")
+            continue
+
+        first_error: Dict[int, MermaidSyntaxError] = {}
+        for error in diagram.errors:
+            first_error.setdefault(error.line, error)
+        for number in sorted(first_error, reverse=True):  # bottom-up keeps line numbers valid
+            error = first_error[number]
+            fixed = _fix_line(diagram.kind, lines[number - 1], error)
+            if fixed is None:
+                fixes.append(f"dropped line {number} ({error.message})")
+                del lines[number - 1]
+            else:
+                fixes.append(f"line {number}: {error.code}")
+                lines[number - 1] = fixed
+    else:
+        diagram = parse("\n".join(lines))
+
+    if diagram.kind == "sequence" and diagram.ok:
+        declared = _declare_participants(lines, diagram, fixes)
+        if declared is not lines:
+            lines = declared
+            diagram = parse("\n".join(lines))
+
+    code = "\n".join(lines).strip("\n")
+    ok = diagram.ok and (kind is None or diagram.kind == kind)
+    return RepairResult(code, ok, fixes, diagram)
@@ -0,0 +1,152 @@
+"""
+Metadata filtering helpers shared by the Pinecone and local (Chroma) backends.
+
+Filters arrive from the API as plain dicts, e.g. {"source": "chapter3.pdf"} or
+{"source": ["a.pdf", "b.pdf"], "user_id": "u1"}. They are normalized once and
+then translated to the backend's native filter syntax. The local backend also
+keeps a bitmap index per `source` / `user_id` value so that filtered queries
+only scan the matching rows.
+"""
+
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEXED_FIELDS = ("source", "user_id")
+
+
+def _as_values(condition: Any) -> Optional[List[str]]:
+    """Return the allowed values for an equality/membership condition, else None."""
+    if isinstance(condition, (str, int, float, bool)):
+        return [str(condition)]
+    if isinstance(condition, (list, tuple, set)):
+        return [str(v) for v in condition]
+    if isinstance(condition, dict) and len(condition) == 1:
+        op, value = next(iter(condition.items()))
+        if op == "$eq":
+            return [str(value)]
+        if op == "$in" and isinstance(value, (list, tuple, set)):
+            return [str(v) for v in value]
+    return None
+
+
+def split_filter(
+    filter: Optional[Dict[str, Any]],
+    fields: Tuple[str, ...] = INDEXED_FIELDS,
+) -> Tuple[Dict[str, List[str]], Dict[str, Any]]:
+    """
+    Split a user filter into (indexed equality terms, remaining raw conditions).
+    Indexed terms map field -> allowed values and can be served from bitmaps.
+    """
+    indexed: Dict[str, List[str]] = {}
+    rest: Dict[str, Any] = {}
+    for field, condition in (filter or {}).items():
+        values = _as_values(condition) if field in fields else None
+        if values is not None:
+            indexed[field] = values
+        else:
+            rest[field] = condition
+    return indexed, rest
+
+
+def _normalize_condition(condition: Any) -> Any:
+    if isinstance(condition, dict):
+        return condition
+    values = _as_values(condition)
+    if values is None:
+        return condition
+    return {"$eq": values[0]} if len(values) == 1 else {"$in": values}
+
+
+def to_pinecone_filter(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Translate a user filter into Pinecone metadata filter syntax."""
+    if not filter:
+        return None
+    return {field: _normalize_condition(cond) for field, cond in filter.items()}
+
+
+def to_chroma_where(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Translate a user filter into a Chroma `where` clause ($and of field conditions)."""
+    if not filter:
+        return None
+    clauses = [{field: _normalize_condition(cond)} for field, cond in filter.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _iter_bits(bitmap: int) -> Iterator[int]:
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+class MetadataIndex:
+    """
+    In-memory bitmap index over a collection's rows.
+
+    Every row id gets a stable position; for each indexed field value we keep a
+    Python int whose bit N is set when row N has that value. Filters are resolved
+    by OR-ing the bitmaps of the allowed values per field and AND-ing the fields,
+    so the vector scan only touches the surviving rows.
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = INDEXED_FIELDS):
+        self.fields = fields
+        self._ids: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._bitmaps: Dict[str, Dict[str, int]] = {f: {} for f in fields}
+        self._live = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Index rows; re-adding an existing id replaces its metadata."""
+        for doc_id, meta in zip(ids, metadatas):
+            if doc_id in self._positions:
+                self.remove([doc_id])
+            pos = len(self._ids)
+            self._ids.append(doc_id)
+            self._positions[doc_id] = pos
+            bit = 1 << pos
+            self._live |= bit
+            for field in self.fields:
+                value = (meta or {}).get(field)
+                if value is None:
+                    continue
+                bitmaps = self._bitmaps[field]
+                key = str(value)
+                bitmaps[key] = bitmaps.get(key, 0) | bit
+
+    def remove(self, ids: List[str]):
+        for doc_id in ids:
+            pos = self._positions.pop(doc_id, None)
+            if pos is None:
+                continue
+            mask = ~(1 << pos)
+            self._ids[pos] = None
+            self._live &= mask
+            for bitmaps in self._bitmaps.values():
+                for key in list(bitmaps):
+                    if bitmaps[key] >> pos & 1:
+                        bitmaps[key] &= mask
+                        if not bitmaps[key]:
+                            del bitmaps[key]
+
+    def match(self, terms: Dict[str, List[str]]) -> int:
+        """Return the bitmap of rows satisfying every field term."""
+        result = self._live
+        for field, values in terms.items():
+            bitmaps = self._bitmaps.get(field, {})
+            field_bits = 0
+            for value in values:
+                field_bits |= bitmaps.get(value, 0)
+            result &= field_bits
+            if not result:
+                break
+        return result
+
+    def candidates(self, terms: Dict[str, List[str]]) -> List[str]:
+        """Return the row ids satisfying every field term."""
+        return [self._ids[pos] for pos in _iter_bits(self.match(terms))]
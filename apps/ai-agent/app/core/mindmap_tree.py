@@ -0,0 +1,271 @@
+"""
+Mindmap tree: the intermediate form of a generated mindmap.
+
+LLM output is parsed once (tolerantly: fences, list markers, tabs, stray
+brackets and several top-level nodes are all accepted) into a tree of
+MindmapNode. Cleanup works on the tree in linear time:
+
+- clean_labels(): strip markup from labels, drop empty nodes (their children
+  move up), merge duplicate siblings
+- limit_depth(): lift nodes below a depth to their ancestor at that depth
+- prune(): keep a target number of nodes, shallowest first, so every kept
+  node keeps its parent
+- prune_by_importance(): the same, ranked by importance within a depth
+  limit; this is how lower detail levels (DETAIL_BUDGETS) are derived from
+  one full-detail tree
+
+and the result is rendered as Mermaid text (to_mermaid) or as a JSON tree
+(to_dict) the frontend can draw without parsing Mermaid.
+"""
+
+import heapq
+import itertools
+import math
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.mermaid_parser import MINDMAP_SHAPES, header_kind
+from app.core.mermaid_repair import clean_text
+
+# detail level -> (max nodes, max depth with root = 1): the upper ends of what
+# the generation prompt asks for at each level ("12-18 nodes, 3-4 levels", ...)
+DETAIL_BUDGETS = {1: (7, 2), 2: (10, 3), 3: (18, 4), 4: (25, 5), 5: (35, 6)}
+MAX_DETAIL = max(DETAIL_BUDGETS)
+
+_SHAPES = {shape: (open_, close) for open_, close, shape in MINDMAP_SHAPES}
+_LIST_MARKER = re.compile(r"^(?:[-*+•–—]|\d+[.)]|#{1,6})\s+")
+_DECORATION = re.compile(r"\s*(?:::icon\(.*\)|:::[\w-]*)$")  # own line or trailing a node
+_UNSAFE = re.compile(r"[\[\]{}()<>\"`|;]")
+
+
+def clean_label(label: str, max_words: Optional[int] = None, max_chars: Optional[int] = 120) -> str:
+    """Label without list markers, brackets, quotes and extra whitespace; "" if nothing is left."""
+    text = _LIST_MARKER.sub("", label.strip())
+    text = " ".join(_UNSAFE.sub(" ", text.replace("#quot;", "")).split())
+    if max_words:
+        text = " ".join(text.split()[:max_words])
+    if max_chars and len(text) > max_chars:
+        text = text[: max_chars - 3].rstrip() + "..."
+    return text
+
+
+def _node_text(text: str) -> Tuple[str, str]:
+    """(shape, label) of a node line; unclosed shapes are accepted."""
+    start = next((i for i, c in enumerate(text) if c in "([{)"), -1)
+    if start >= 0:
+        rest = text[start:]
+        for open_, close, shape in MINDMAP_SHAPES:
+            if rest.startswith(open_):
+                inner = rest[len(open_):]
+                inner = inner[: -len(close)] if inner.endswith(close) else inner.rstrip(")]}(")
+                inner = inner.strip()
+                if len(inner) > 1 and inner[0] == inner[-1] and inner[0] in "\"`":
+                    inner = inner[1:-1]
+                if inner:
+                    return shape, inner
+                break
+    return "default", text
+
+
+@dataclass
+class MindmapNode:
+    label: str
+    shape: str = "default"  # one of the mindmap shapes ("circle", "square", ...) or "default"
+    children: List["MindmapNode"] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {"label": self.label, "shape": self.shape, "children": [c.to_dict() for c in self.children]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MindmapNode":
+        return cls(data["label"], data.get("shape", "default"), [cls.from_dict(c) for c in data.get("children", [])])
+
+
+class MindmapTree:
+    """A mindmap as a tree with a single root."""
+
+    def __init__(self, root: MindmapNode):
+        self.root = root
+
+    @classmethod
+    def from_mermaid(cls, code: str, root_label: str = "Topic") -> "MindmapTree":
+        """
+        Parse mindmap text in one pass. Several top-level nodes are put under a
+        new root labelled `root_label`; so is everything when there is no node.
+        """
+        roots: List[MindmapNode] = []
+        stack: List[Tuple[int, MindmapNode]] = []  # (indent, node) of the open ancestors
+        header_seen = False
+        for line in clean_text(code or "").split("\n"):
+            stripped = line.strip()
+            stripped = _DECORATION.sub("", stripped)
+            if not stripped or stripped.startswith("%%"):
+                continue
+            if not header_seen and not roots and header_kind(stripped):
+                header_seen = True
+                continue
+            shape, label = _node_text(_LIST_MARKER.sub("", stripped))
+            indent = len(line) - len(line.lstrip())
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            node = MindmapNode(label, shape)
+            (stack[-1][1].children if stack else roots).append(node)
+            stack.append((indent, node))
+
+        if len(roots) == 1:
+            return cls(roots[0])
+        return cls(MindmapNode(root_label or "Topic", "circle", roots))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MindmapTree":
+        return cls(MindmapNode.from_dict(data))
+
+    # ------------------------------------------------------------------
+    # traversal
+    # ------------------------------------------------------------------
+    def walk(self) -> Iterator[Tuple[MindmapNode, int]]:
+        """(node, depth) in document order; the root has depth 1."""
+        stack = [(self.root, 1)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+    def breadth_first(self) -> Iterator[Tuple[MindmapNode, int]]:
+        queue = deque([(self.root, 1)])
+        while queue:
+            node, depth = queue.popleft()
+            yield node, depth
+            queue.extend((child, depth + 1) for child in node.children)
+
+    @property
+    def size(self) -> int:
+        return sum(1 for _ in self.walk())
+
+    @property
+    def depth(self) -> int:
+        return max(depth for _, depth in self.walk())
+
+    # ------------------------------------------------------------------
+    # normalization (each pass is O(n))
+    # ------------------------------------------------------------------
+    def clean_labels(self, max_words: Optional[int] = None, max_chars: Optional[int] = 120) -> "MindmapTree":
+        """Clean every label; empty nodes are replaced by their children, duplicate siblings merged."""
+        self.root.label = clean_label(self.root.label, max_words, max_chars) or "Topic"
+
+        def merge(children: List[MindmapNode]) -> List[MindmapNode]:
+            merged: Dict[str, MindmapNode] = {}
+            for child in children:
+                child.label = clean_label(child.label, max_words, max_chars)
+                if not child.label:
+                    grandchildren = merge(child.children)
+                    for node in grandchildren:
+                        _add(merged, node)
+                    continue
+                child.children = merge(child.children)
+                _add(merged, child)
+            return list(merged.values())
+
+        self.root.children = merge(self.root.children)
+        return self
+
+    def limit_depth(self, max_depth: int) -> "MindmapTree":
+        """Move nodes deeper than `max_depth` (root = 1) up to their ancestor at `max_depth` - 1."""
+        if max_depth < 2:
+            self.root.children = []
+            return self
+        for node, depth in list(self.walk()):
+            if depth == max_depth - 1:
+                lifted = [descendant for descendant, _ in MindmapTree(node).walk()][1:]
+                for descendant in lifted:
+                    descendant.children = []
+                node.children = lifted
+        return self
+
+    def prune(self, max_nodes: int) -> "MindmapTree":
+        """Keep at most `max_nodes` nodes (root included), shallowest and earliest first."""
+        if max_nodes < 1:
+            raise ValueError("max_nodes must be at least 1")
+        keep = set()
+        for node, _ in self.breadth_first():
+            if len(keep) >= max_nodes:
+                break
+            keep.add(id(node))
+        for node, _ in self.walk():
+            node.children = [child for child in node.children if id(child) in keep]
+        return self
+
+    def prune_by_importance(self, max_nodes: int, max_depth: Optional[int] = None) -> "MindmapTree":
+        """
+        Keep the `max_nodes` most important nodes (root included) no deeper than
+        `max_depth`. Importance grows with the size of a node's subtree (branches
+        the LLM elaborated on) and falls with its position among its siblings
+        (main points come first) and with depth. Nodes are taken best-first from
+        the children of the nodes kept so far, so every kept node keeps its parent.
+        """
+        if max_nodes < 1:
+            raise ValueError("max_nodes must be at least 1")
+        order = list(self.walk())
+        sizes: Dict[int, int] = {}
+        for node, _ in reversed(order):
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in node.children)
+
+        def push(frontier: list, parent: MindmapNode, depth: int):
+            if max_depth is not None and depth > max_depth:
+                return
+            for index, child in enumerate(parent.children):
+                score = (1 + math.log(sizes[id(child)])) / ((depth - 1) * (1 + 0.3 * index))
+                heapq.heappush(frontier, (-score, next(sequence), depth, child))  # ties: document order
+
+        keep = {id(self.root)}
+        sequence = itertools.count()
+        frontier: list = []
+        push(frontier, self.root, 2)
+        while frontier and len(keep) < max_nodes:
+            _, _, depth, node = heapq.heappop(frontier)
+            keep.add(id(node))
+            push(frontier, node, depth + 1)
+        for node, _ in order:
+            node.children = [child for child in node.children if id(child) in keep]
+        return self
+
+    def at_detail(self, level: int) -> "MindmapTree":
+        """Prune to the budget of a detail level (1-5; anything else means 3)."""
+        max_nodes, max_depth = DETAIL_BUDGETS.get(level, DETAIL_BUDGETS[3])
+        return self.prune_by_importance(max_nodes, max_depth)
+
+    # ------------------------------------------------------------------
+    # renderers
+    # ------------------------------------------------------------------
+    def to_mermaid(self) -> str:
+        root = self.root
+        open_, close = _SHAPES.get(root.shape, _SHAPES["circle"])
+        lines = ["mindmap", f"  root{open_}{_shape_label(root.label)}{close}"]
+        for node, depth in self.walk():
+            if node is root:
+                continue
+            indent = "  " * depth
+            if node.shape in _SHAPES:
+                open_, close = _SHAPES[node.shape]
+                lines.append(f"{indent}n{len(lines)}{open_}{_shape_label(node.label)}{close}")
+            else:
+                lines.append(indent + (clean_label(node.label, max_chars=None) or "Node"))
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        return self.root.to_dict()
+
+
+def _add(merged: Dict[str, MindmapNode], node: MindmapNode):
+    key = node.label.lower()
+    if key in merged:
+        merged[key].children.extend(node.children)
+    else:
+        merged[key] = node
+
+
+def _shape_label(label: str) -> str:
+    text = " ".join(label.replace('"', "#quot;").split()) or "Node"
+    return f'"{text}"' if any(c in text for c in "()[]{}") else text
@@ -0,0 +1,39 @@
+"""
+Minimal base class for the small SQLite-backed local stores (chunk store, ingestion jobs, ...).
+
+Each store declares its SCHEMA statements; the database file and tables are
+created on first use. Connections are short-lived and serialized per store
+instance; WAL mode lets other worker processes read while one writes.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Tuple
+
+
+class SQLiteStore:
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            if not self._ready:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            try:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    for statement in self.SCHEMA:
+                        conn.execute(statement)
+                    self._ready = True
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
@@ -0,0 +1,249 @@
+"""
+Structure-aware chunking: headings, list blocks and page boundaries.
+
+Extracted text is parsed line by line into blocks (heading, list, text).
+Markdown (and Word files, whose heading styles are rendered as Markdown by
+document_processor.extract_docx_text) use `#` headings; PDF and plain text
+fall back to layout heuristics: numbered headings ("2.3 Results"), ALL CAPS
+lines and short Title Case lines.
+
+StructuredSplitter packs consecutive blocks of one section into chunks of up
+to `chunk_tokens`, never across a heading or a page (each page is its own
+Document), and never inside a list block unless the list alone is too large.
+Oversized blocks go through the TokenSplitter. Every chunk carries:
+
+    page          - from the page Document, when the format has pages
+    section_path  - "Chapter > Section > Subsection" of enclosing headings
+    char_offset   - offset of the chunk in its page (or document) text
+
+The heading stack carries over from one page to the next of the same source.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.text_splitter import TokenSplitter, _tokens
+
+MARKDOWN_SUFFIXES = (".md", ".markdown", ".docx")
+
+SECTION_SEPARATOR = " > "
+
+_MD_HEADING = re.compile(r" {0,3}(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$")
+_NUMBERED_HEADING = re.compile(r"((?:\d{1,2}\.)*\d{1,2})\.?[ \t]+(\S.*)$")
+_NAMED_HEADING = re.compile(r"(?:chapter|section|part|appendix)[ \t]+[\w.]+\b", re.I)
+_LIST_ITEM = re.compile(r"[ \t]*(?:[-*+•▪◦‣]|\(?\d{1,3}[.)]|\(?[a-zA-Z][.)])[ \t]+\S")
+_FENCE = ("```", "~~~")
+_MINOR_WORDS = frozenset(
+    "a an and as at but by for from in into of on or the to vs via with".split()
+)
+
+
+class Block(NamedTuple):
+    kind: str        # "heading", "list" or "text"
+    start: int
+    end: int
+    level: int = 0   # heading level, 1 = top
+    title: str = ""
+
+
+def is_markdown_source(source: str) -> bool:
+    return str(source).lower().endswith(MARKDOWN_SUFFIXES)
+
+
+def _lines(text: str) -> Iterator[Tuple[int, int]]:
+    pos, n = 0, len(text)
+    while pos < n:
+        nl = text.find("\n", pos)
+        if nl < 0:
+            nl = n
+        yield pos, nl
+        pos = nl + 1
+
+
+def _is_title_case(words: List[str]) -> bool:
+    if not words[0][:1].isupper():
+        return False
+    return all(w[:1].isupper() or not w[:1].isalpha() or w.lower() in _MINOR_WORDS for w in words)
+
+
+def _layout_heading(line: str, after_break: bool) -> Optional[Tuple[int, str]]:
+    """(level, title) if a line of PDF/plain text looks like a heading."""
+    s = line.strip()
+    if not 2 < len(s) <= 80 or s[-1] in ".,;:":
+        return None
+    words = s.split()
+    if len(words) > 12:
+        return None
+
+    m = _NUMBERED_HEADING.match(s)
+    if m:
+        number, title = m.groups()
+        depth = number.count(".") + 1
+        # "1. Preheat the oven" is a list item; "1. Introduction" / "2.3 Results" are headings
+        if depth > 1 or _is_title_case(title.split()):
+            return min(depth, 6), s
+        return None
+    if _NAMED_HEADING.match(s):
+        return 1, s
+    if sum(c.isalpha() for c in s) >= 3 and s.isupper():
+        return 1, s
+    if after_break and len(words) <= 8 and _is_title_case(words) and s[-1] not in "!?":
+        return 2, s
+    return None
+
+
+def parse_blocks(text: str, markdown: bool = False) -> Iterator[Block]:
+    """Yield the heading, list and text blocks of `text` in order, as offsets."""
+    current: Optional[List] = None  # [kind, start, end] of the open block
+    fenced = False
+    prev_line = ""
+
+    for start, end in _lines(text):
+        line = text[start:end]
+        stripped = line.strip()
+        if markdown and stripped.startswith(_FENCE):
+            fenced = not fenced
+
+        if not stripped and not fenced:
+            if current:
+                yield Block(*current)
+                current = None
+            prev_line = ""
+            continue
+
+        if not fenced:
+            if markdown:
+                m = _MD_HEADING.match(line)
+                heading = (len(m.group(1)), m.group(2).strip()) if m else None
+            else:
+                after_break = not prev_line or prev_line.rstrip()[-1:] in ".!?:"
+                heading = _layout_heading(line, after_break)
+            if heading:
+                if current:
+                    yield Block(*current)
+                    current = None
+                yield Block("heading", start, end, heading[0], heading[1])
+                prev_line = ""
+                continue
+
+            if _LIST_ITEM.match(line):
+                if current and current[0] != "list":
+                    yield Block(*current)
+                    current = None
+                if current is None:
+                    current = ["list", start, end]
+                else:
+                    current[2] = end
+                prev_line = line
+                continue
+
+            if current and current[0] == "list":
+                # indented or lower-case continuation lines belong to the last item
+                if line[:1] in " \t" or (stripped[:1].islower() and prev_line.rstrip()[-1:] not in ".!?:"):
+                    current[2] = end
+                    prev_line = line
+                    continue
+                yield Block(*current)
+                current = None
+
+        if current is None:
+            current = ["text", start, end]
+        else:
+            current[2] = end
+        prev_line = line
+
+    if current:
+        yield Block(*current)
+
+
+def format_context_chunk(doc: Document) -> str:
+    """Chunk text prefixed with its section path and page, for building LLM context."""
+    label = [doc.metadata["section_path"]] if doc.metadata.get("section_path") else []
+    if doc.metadata.get("page"):
+        label.append(f"p. {doc.metadata['page']}")
+    if not label:
+        return doc.page_content
+    return f"[{', '.join(label)}]\n{doc.page_content}"
+
+
+class StructuredSplitter:
+    """Cut documents into chunks on heading, list and page boundaries, sized by a TokenSplitter."""
+
+    def __init__(self, splitter: TokenSplitter):
+        self.splitter = splitter
+
+    @property
+    def chunk_tokens(self) -> int:
+        return self.splitter.chunk_tokens
+
+    def _pieces(self, text: str, markdown: bool, stack: List[Tuple[int, str]]) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, section_path) of each chunk of one page; updates `stack` in place."""
+        size = self.splitter.chunk_tokens
+        group: Optional[List[int]] = None  # [start, end] of the blocks packed so far
+        heading_start: Optional[int] = None  # first line of the headings not yet in a chunk
+        heading_end = 0
+        path = SECTION_SEPARATOR.join(title for _, title in stack)
+
+        for block in parse_blocks(text, markdown):
+            if block.kind == "heading":
+                if group:
+                    yield group[0], group[1], path
+                    group = None
+                while stack and stack[-1][0] >= block.level:
+                    stack.pop()
+                stack.append((block.level, block.title))
+                path = SECTION_SEPARATOR.join(title for _, title in stack)
+                if heading_start is None:  # consecutive headings all go with the body that follows
+                    heading_start = block.start
+                heading_end = block.end
+                continue
+
+            # the first chunk of a section starts with its heading line
+            start = block.start if heading_start is None else heading_start
+            heading_start = None
+            if _tokens(text, start, block.end) > size:
+                if group:
+                    yield group[0], group[1], path
+                    group = None
+                for span in self.splitter.spans(text, start, block.end):
+                    yield span.start, span.end, path
+            elif group and _tokens(text, group[0], block.end) <= size:
+                group[1] = block.end
+            else:
+                if group:
+                    yield group[0], group[1], path
+                group = [start, block.end]
+
+        if group:
+            yield group[0], group[1], path
+        if heading_start is not None:
+            # headings with no body after them on this page are a chunk of their own
+            for span in self.splitter.spans(text, heading_start, heading_end):
+                yield span.start, span.end, path
+
+    def iter_documents(
+        self, documents: Iterable[Document], headings: Optional[Dict[str, List[Tuple[int, str]]]] = None
+    ) -> Iterator[Document]:
+        """
+        Chunk `documents` (pages in order). `headings` holds the open heading
+        stack per source; pass the same dict to carry sections across calls
+        when a document arrives a few pages at a time.
+        """
+        if headings is None:
+            headings = {}
+        for doc in documents:
+            source = str(doc.metadata.get("source") or "")
+            stack = headings.setdefault(source, [])
+            text = doc.page_content
+            for start, end, path in self._pieces(text, is_markdown_source(source), stack):
+                metadata = {**doc.metadata, "char_offset": start}
+                if path:
+                    metadata["section_path"] = path
+                yield Document(page_content=text[start:end], metadata=metadata)
+
+    def split_documents(
+        self, documents: Iterable[Document], headings: Optional[Dict[str, List[Tuple[int, str]]]] = None
+    ) -> List[Document]:
+        return list(self.iter_documents(documents, headings))
@@ -0,0 +1,218 @@
+"""
+Single-pass, token-aware text splitter.
+
+The splitter walks the text once, a chunk at a time: it guesses a window of
+`chunk_tokens` tokens from the token density of the previous chunk, cuts it
+at the last paragraph break in its second half, else the last line break,
+sentence end or space, and counts the tokens of that chunk; only when the
+guess overshoots is the window re-sized by measuring. Boundary search is
+str.rfind over offsets and token counting is str.count, so a chunk costs one
+rfind and two counts in the common case, with no recursive separator retries
+and no per-word Python loop. Chunks are yielded as character offsets into the
+source text; strings are only sliced when a caller asks for them.
+
+Overlap is carried across cuts inside running text. A chunk that ends at a
+paragraph break is followed by one starting at the next paragraph, as with
+the recursive character splitter this replaced.
+
+Tokens are estimated from the word count (TOKENS_PER_WORD), which tracks
+sub-word tokenizers closely enough for sizing chunks, and never from fewer
+than one token per MAX_CHARS_PER_TOKEN characters, so text without spaces
+(long identifiers, base64, CJK) is cut to a bounded size too.
+"""
+
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# sub-word tokenizers average about 4 tokens per 3 English words
+TOKENS_PER_WORD = 4 / 3
+# a chunk is at most chunk_tokens * MAX_CHARS_PER_TOKEN characters, however few spaces it has
+MAX_CHARS_PER_TOKEN = 8
+
+_SENTENCE_ENDS = (". ", "? ", "! ")
+
+_splitter_instance = None
+_new_span = tuple.__new__  # Span(...) without the NamedTuple constructor call
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+
+
+def _tokens(text: str, start: int, end: int) -> int:
+    if start >= end:
+        return 0
+    words = text.count(" ", start, end) + text.count("\n", start, end) + 1
+    return max(int(words * TOKENS_PER_WORD + 0.5), -(-(end - start) // MAX_CHARS_PER_TOKEN))
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count, consistent with how TokenSplitter sizes chunks."""
+    text = text.strip()
+    return _tokens(text, 0, len(text))
+
+
+def _skip_space(text: str, pos: int, end: int) -> int:
+    while pos < end and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _trim_space(text: str, start: int, end: int) -> int:
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+def _cut(text: str, lo: int, hi: int) -> int:
+    """Offset ending the chunk at the coarsest boundary in text[lo:hi], or hi when there is none."""
+    found = text.rfind("\n\n", lo, hi)
+    if found < 0:
+        found = text.rfind("\n", lo, hi)
+    if found < 0:
+        found = max(text.rfind(sep, lo, hi) for sep in _SENTENCE_ENDS)
+        if found >= 0:
+            return found + 1  # keep the mark
+    if found < 0:
+        found = text.rfind(" ", lo, hi)
+    return found if found >= 0 else hi
+
+
+class TokenSplitter:
+    """
+    Split text into chunks of at most `chunk_tokens` tokens; chunks cut inside a
+    paragraph overlap the next one by about `overlap_tokens`.
+    """
+
+    def __init__(self, chunk_tokens: int = 200, overlap_tokens: int = 40, min_fill: float = 0.5):
+        if chunk_tokens < 1:
+            raise ValueError("chunk_tokens must be positive")
+        if not 0 <= overlap_tokens < chunk_tokens * min_fill:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens * min_fill")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_fill = min_fill
+
+    def _window(self, text: str, pos: int, end: int, chars_per_token: float):
+        """Furthest offset (and its token count) reachable from `pos` within chunk_tokens, approximately."""
+        size = self.chunk_tokens
+        stop = min(end, pos + max(1, int(size * chars_per_token)))
+        tokens = _tokens(text, pos, stop)
+        for _ in range(4):  # converge on the target size from the measured density
+            if tokens > size:
+                stop = pos + max(1, int((stop - pos) * size / tokens) - 1)
+            elif stop < end and tokens < size * 0.9:
+                stop = min(end, pos + int((stop - pos) * size / max(tokens, 1)))
+            else:
+                break
+            tokens = _tokens(text, pos, stop)
+        while tokens > size and stop - pos > 1:
+            stop = pos + (stop - pos) * 9 // 10
+            tokens = _tokens(text, pos, stop)
+        return stop, tokens
+
+    def spans(self, text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Span]:
+        """Yield chunk offsets into text[start:end], in order, trimmed of surrounding whitespace."""
+        end = _trim_space(text, start, len(text) if end is None else end)
+        pos = _skip_space(text, start, end)
+        size, overlap, min_fill = self.chunk_tokens, self.overlap_tokens, self.min_fill
+        count, rfind, find = text.count, text.rfind, text.find  # bound once: this loop is the hot path
+        chars_per_token = 4.0
+        prev_end = start
+
+        while pos < end:
+            # guess the window from the last chunk's density and measure only the chunk cut
+            # from it; when that overshoots, shrink once, then size it by measuring (_window)
+            stop = pos + int(size * chars_per_token) + 1
+            # the common case of _cut_at, inline: a paragraph break in the second part of the window
+            lo = pos + int((stop - pos) * min_fill)
+            cut = rfind("\n\n", lo, stop) if stop < end and lo > prev_end else -1
+            if cut > pos and not text[cut - 1].isspace():
+                paragraph = True
+            else:
+                cut, paragraph = self._cut_at(text, pos, stop, end, prev_end, rfind)
+            tokens = max(
+                int((count(" ", pos, cut) + count("\n", pos, cut) + 1) * TOKENS_PER_WORD + 0.5),
+                -(-(cut - pos) // MAX_CHARS_PER_TOKEN),
+            )
+            if tokens > size:  # denser than the last chunk: shrink by the measured density once
+                stop = pos + int((cut - pos) * size / tokens)
+                if stop > prev_end:
+                    cut, paragraph = self._cut_at(text, pos, stop, end, prev_end, rfind)
+                    tokens = _tokens(text, pos, cut)
+            if tokens > size:
+                stop, _ = self._window(text, pos, end, chars_per_token)
+                cut, paragraph = self._cut_at(text, pos, stop, end, prev_end, rfind)
+                tokens = _tokens(text, pos, cut)
+            if cut <= prev_end:  # overlap swallowed the whole window: drop it
+                pos = _skip_space(text, prev_end, end)
+                continue
+            yield _new_span(Span, (pos, cut, tokens))
+            if cut >= end:
+                return
+            prev_end = cut
+            chars_per_token = (cut - pos) / (tokens or 1)
+
+            # overlap carries context across a cut inside running text; a chunk that
+            # ends at a paragraph break is followed by one that starts at the next paragraph
+            if paragraph or not overlap:
+                pos = cut
+            else:
+                back = cut - int(overlap * chars_per_token)
+                space = find(" ", back, cut) if back > pos else -1
+                pos = space + 1 if space >= 0 else cut
+            while pos < end and text[pos].isspace():
+                pos += 1
+
+    def _cut_at(self, text: str, pos: int, stop: int, end: int, prev_end: int, rfind) -> Tuple[int, bool]:
+        """
+        (end, at a paragraph break) of the chunk starting at `pos`: the coarsest
+        boundary in the second part of text[pos:stop], else a hard cut at `stop`.
+        """
+        if stop >= end:
+            return end, True
+        # every chunk must end past the previous one
+        lo = max(pos + int((stop - pos) * self.min_fill), prev_end + 1)
+        if lo < stop:
+            found = rfind("\n\n", lo, stop)
+            paragraph = found >= 0
+            if not paragraph:
+                found = rfind("\n", lo, stop)
+                if found < 0:
+                    found = _cut(text, lo, stop)
+            found = _trim_space(text, pos, found)
+            if found > pos and found > prev_end:
+                return found, paragraph
+        # unbreakable run: hard cut at the window, before any whitespace it ends in
+        # (at or before prev_end when the window only adds whitespace)
+        return _trim_space(text, pos, stop), False
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[s.start:s.end] for s in self.spans(text)]
+
+    def iter_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for doc in documents:
+            text = doc.page_content
+            for span in self.spans(text):
+                yield Document(page_content=text[span.start:span.end], metadata=dict(doc.metadata))
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        return list(self.iter_documents(documents))
+
+
+def get_text_splitter(chunk_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> TokenSplitter:
+    """Get the default splitter (configured chunk sizes), or a new one for explicit sizes."""
+    global _splitter_instance
+    from app.core.config import settings
+
+    if chunk_tokens is not None or overlap_tokens is not None:
+        return TokenSplitter(
+            chunk_tokens if chunk_tokens is not None else settings.chunk_tokens,
+            overlap_tokens if overlap_tokens is not None else settings.chunk_overlap_tokens,
+        )
+    if _splitter_instance is None:
+        _splitter_instance = TokenSplitter(settings.chunk_tokens, settings.chunk_overlap_tokens)
+    return _splitter_instance
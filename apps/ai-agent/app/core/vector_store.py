@@ -3,38 +3,50 @@ Vector Store using ChromaDB (FREE and local) - NO HUGGINGFACE
 """
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any
 from pathlib import Path
 
 from app.config import settings
 from app.core.embeddings import get_embedding_service
+from app.core.metadata_index import MetadataIndex, split_filter, to_chroma_where
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 _vector_store_instance = None
 
+# Filtered queries whose bitmap candidate set is at most this large are served by
+# an exact scan over just those rows; larger sets are pushed down to Chroma's HNSW.
+EXACT_SCAN_LIMIT = 2000
+
 class VectorStoreService:
-    def __init__(self):
-        # Create data directory
-        data_dir = Path(settings.CHROMA_PERSIST_DIR)
-        data_dir.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            self.client = chromadb.PersistentClient(
-                path=str(data_dir),
-                settings=ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
+    def __init__(self, client=None):
+        if client is not None:
+            self.client = client
+        else:
+            # Create data directory
+            data_dir = Path(settings.CHROMA_PERSIST_DIR)
+            data_dir.mkdir(parents=True, exist_ok=True)
+
+            try:
+                self.client = chromadb.PersistentClient(
+                    path=str(data_dir),
+                    settings=ChromaSettings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
                 )
-            )
-            logger.info(f"✅ ChromaDB initialized at {data_dir}")
-        except Exception as e:
-            logger.warning(f"ChromaDB initialization error: {e}, using in-memory")
-            self.client = chromadb.Client()
+                logger.info(f"✅ ChromaDB initialized at {data_dir}")
+            except Exception as e:
+                logger.warning(f"ChromaDB initialization error: {e}, using in-memory")
+                self.client = chromadb.Client()
         
         self.embedding_service = get_embedding_service()
+        self._metadata_indexes: Dict[str, MetadataIndex] = {}
+        # Cached collection sizes; invalidated whenever a collection is written to
+        self._counts: Dict[str, int] = {}
     
     def get_or_create_collection(self, name: str):
         """Get or create a collection"""
@@ -45,6 +57,24 @@ class VectorStoreService:
             )
         except Exception:
             return self.client.get_or_create_collection(name=name)
+
+    def _get_metadata_index(self, collection_name: str, collection) -> MetadataIndex:
+        """Get the bitmap index for a collection, building it from storage on first use"""
+        index = self._metadata_indexes.get(collection_name)
+        if index is None:
+            index = MetadataIndex()
+            existing = collection.get(include=["metadatas"])
+            index.add(existing.get("ids") or [], existing.get("metadatas") or [])
+            self._metadata_indexes[collection_name] = index
+        return index
+
+    def _count(self, collection_name: str, collection) -> int:
+        """Collection size, cached to avoid a storage round trip per query"""
+        count = self._counts.get(collection_name)
+        if count is None:
+            count = collection.count()
+            self._counts[collection_name] = count
+        return count
     
     async def add_documents(
         self,
@@ -76,39 +106,127 @@ class VectorStoreService:
         except Exception as e:
             logger.error(f"Add documents error: {e}")
             raise
+        finally:
+            self._counts.pop(collection_name, None)
+
+        index = self._metadata_indexes.get(collection_name)
+        if index is not None:
+            index.add(ids, metadatas)
     
     async def query_documents(
         self,
         collection_name: str,
         query_text: str,
-        n_results: int = 3
+        n_results: int = 3,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[Dict]:
-        """Query documents from collection"""
+        """Query documents from collection, optionally restricted by a metadata filter"""
         try:
             collection = self.get_or_create_collection(collection_name)
             query_embedding = await self.embedding_service.embed_text(query_text)
-            
+
+            where = None
+            if filter:
+                terms, rest = split_filter(filter)
+                if terms:
+                    candidates = self._get_metadata_index(collection_name, collection).candidates(terms)
+                    if not candidates:
+                        return []
+                    if len(candidates) <= EXACT_SCAN_LIMIT:
+                        return self._scan_candidates(collection, candidates, query_embedding, n_results, rest)
+                where = to_chroma_where(filter)
+
             results = collection.query(
                 query_embeddings=[query_embedding],
-                n_results=min(n_results, collection.count() or 1)
+                n_results=min(n_results, self._count(collection_name, collection) or 1),
+                where=where
             )
             
-            documents = []
-            if results["documents"] and results["documents"][0]:
-                for i, doc in enumerate(results["documents"][0]):
-                    documents.append({
-                        "content": doc,
-                        "metadata": results["metadatas"][0][i] if results.get("metadatas") and results["metadatas"][0] else {},
-                        "distance": results["distances"][0][i] if results.get("distances") and results["distances"][0] else 0
-                    })
-            
-            return documents
+            return self._format_results(results, 0)
         except Exception as e:
             logger.error(f"Query error: {e}")
             return []
+
+    async def query_many(
+        self,
+        collection_name: str,
+        queries: List[str],
+        n_results: int = 3
+    ) -> List[List[Dict]]:
+        """
+        Query several texts at once: one embedding call and one collection.query
+        with multiple query_embeddings. Returns one result list per query, in order.
+        """
+        if not queries:
+            return []
+        try:
+            collection = self.get_or_create_collection(collection_name)
+            count = self._count(collection_name, collection)
+            if not count:
+                return [[] for _ in queries]
+
+            query_embeddings = await self.embedding_service.embed_documents(queries)
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, count)
+            )
+            return [self._format_results(results, q) for q in range(len(queries))]
+        except Exception as e:
+            logger.error(f"Batch query error: {e}")
+            return [[] for _ in queries]
+
+    @staticmethod
+    def _format_results(results: Dict[str, Any], q: int) -> List[Dict]:
+        """Flatten the q-th query of a Chroma query result into document dicts"""
+        documents = []
+        docs = results.get("documents") or []
+        metadatas = results.get("metadatas") or []
+        distances = results.get("distances") or []
+        if len(docs) > q and docs[q]:
+            for i, doc in enumerate(docs[q]):
+                documents.append({
+                    "content": doc,
+                    "metadata": metadatas[q][i] if len(metadatas) > q and metadatas[q] else {},
+                    "distance": distances[q][i] if len(distances) > q and distances[q] else 0
+                })
+        return documents
     
+    def _scan_candidates(
+        self,
+        collection,
+        candidates: List[str],
+        query_embedding: List[float],
+        n_results: int,
+        rest: Dict[str, Any]
+    ) -> List[Dict]:
+        """Exact cosine scan restricted to the rows selected by the bitmap index"""
+        rows = collection.get(
+            ids=candidates,
+            where=to_chroma_where(rest),
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if not rows.get("ids"):
+            return []
+
+        matrix = np.asarray(rows["embeddings"], dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        similarities = matrix @ query / np.where(norms == 0, 1.0, norms)
+
+        top = np.argsort(-similarities)[:n_results]
+        return [
+            {
+                "content": rows["documents"][i],
+                "metadata": rows["metadatas"][i] or {},
+                "distance": float(1.0 - similarities[i])
+            }
+            for i in top
+        ]
+
     def delete_collection(self, name: str):
         """Delete a collection"""
+        self._metadata_indexes.pop(name, None)
+        self._counts.pop(name, None)
         try:
             self.client.delete_collection(name)
         except Exception as e:
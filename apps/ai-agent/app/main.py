@@ -180,8 +180,12 @@ async def startup_event():
         logger.info("🎉 ENTROPY AI AGENT STARTING UP...")
         logger.info("=" * 80)
         logger.info(f"📍 Server: http://{getattr(settings, 'host', 'localhost')}:{getattr(settings, 'port', 8000)}")
-        # If you need to run any async init, do it here and catch exceptions
-        # Example: await some_async_init()  (wrap in try/except inside)
+        # Start the background ingestion workers (resumes jobs left by a restart)
+        try:
+            from app.services.ingestion_jobs import ingestion_queue
+            await ingestion_queue.start()
+        except Exception as e:
+            logger.error(f"❌ Failed to start ingestion queue: {e}")
         # Log registered routes (best-effort - do not fail startup if something breaks)
         logger.info(f"📚 Registered Routes (pre-mount):")
         for route in app.routes:
@@ -205,6 +209,16 @@ async def startup_event():
         # Do not raise; allow the ASGI server to continue so endpoints can report degraded status.
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the extraction worker processes."""
+    try:
+        from app.core.extraction import get_page_extractor
+        get_page_extractor().close()
+    except Exception as e:
+        logger.error(f"❌ Error during shutdown: {e}")
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
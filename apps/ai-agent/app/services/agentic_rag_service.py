@@ -250,7 +250,7 @@ Polished Answer:"""
             if vector_store:
                 result = await self.langchain.rag_chat(
                     message=question,
-                    vector_store=vector_store,
+                    collection_name=collection_name,
                     system_prompt=system_prompt or "You are a helpful AI assistant. Answer based on the provided context."
                 )
                 mode = "rag"
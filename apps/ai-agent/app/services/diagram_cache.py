@@ -0,0 +1,173 @@
+"""
+Shared cache of generated diagrams.
+
+Entries are keyed by everything that shapes a diagram: the canonical topic
+(after normalization, so "photosynthesis" and "Photosynthesis " share one
+entry), diagram type, detail level, prompt options and the version of the
+content it was generated from (see DocumentManifest.version). The store is a
+SQLite file, so every worker process shares it.
+
+Reads are stale-while-revalidate: an entry younger than `ttl_s` is served
+as is; up to `stale_s` later it is still served, and one worker (whichever
+claims the refresh lease) regenerates it in the background. Callers pass
+fresh=True to skip the lookup and get (and store) a new variant.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts) -> str:
+    """Stable key of JSON-serializable parts."""
+    return hashlib.sha1(json.dumps(parts, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class DiagramCache(SQLiteStore):
+    """SQLite-backed diagram cache with stale-while-revalidate reads."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS diagrams ("
+        " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL,"
+        " refresh_until REAL NOT NULL DEFAULT 0)",  # refresh lease held by one worker
+        "CREATE INDEX IF NOT EXISTS diagrams_created ON diagrams (created_at)",
+    )
+
+    def __init__(self, path: str, ttl_s: float = 86400.0, stale_s: float = 604800.0, max_entries: int = 5000,
+                 refresh_lease_s: float = 120.0):
+        super().__init__(path)
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self.refresh_lease_s = refresh_lease_s
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+
+    def get(self, key: str) -> Tuple[Optional[Dict], bool]:
+        """(value, stale); (None, False) when there is no usable entry."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM diagrams WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None, False
+        age = time.time() - row[1]
+        if age > self.ttl_s + self.stale_s:
+            return None, False
+        return json.loads(row[0]), age > self.ttl_s
+
+    def put(self, key: str, value: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO diagrams (key, value, created_at, refresh_until) VALUES (?, ?, ?, 0)",
+                (key, json.dumps(value), time.time()),
+            )
+            # drop expired entries, then the oldest beyond max_entries
+            conn.execute("DELETE FROM diagrams WHERE created_at < ?", (time.time() - self.ttl_s - self.stale_s,))
+            conn.execute(
+                "DELETE FROM diagrams WHERE key IN ("
+                " SELECT key FROM diagrams ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def replace(self, key: str, value: Dict) -> bool:
+        """Update an entry's value in place (its age is kept); False when it is gone."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE diagrams SET value = ? WHERE key = ?", (json.dumps(value), key)
+            ).rowcount == 1
+
+    def update(self, key: str, change: Callable[[Dict], Dict]) -> Optional[Dict]:
+        """
+        Replace an entry's value by `change(current value)` in one transaction
+        (its age is kept), so concurrent updates from any worker all apply.
+        Returns the new value; None when the entry is gone.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM diagrams WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            value = change(json.loads(row[0]))
+            conn.execute("UPDATE diagrams SET value = ? WHERE key = ?", (json.dumps(value), key))
+        return value
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM diagrams WHERE key = ?", (key,))
+
+    def claim_refresh(self, key: str) -> bool:
+        """Take the refresh lease of a stale entry; False when another worker holds it."""
+        now = time.time()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE diagrams SET refresh_until = ? WHERE key = ? AND refresh_until < ?",
+                (now + self.refresh_lease_s, key, now),
+            ).rowcount
+        return claimed == 1
+
+    async def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[Dict]],
+        fresh: bool = False,
+        cacheable: Callable[[Dict], bool] = lambda value: True,
+    ) -> Dict:
+        """
+        Cached value of `key`, else `await generate()` (stored when `cacheable`).
+        Concurrent misses of one key in this process share a single generation,
+        which runs to completion even if the caller that started it is cancelled.
+        """
+        if not fresh:
+            value, stale = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                if stale and await asyncio.to_thread(self.claim_refresh, key):
+                    task = asyncio.create_task(self._refresh(key, generate, cacheable))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+                return value
+            if key in self._inflight:
+                return await asyncio.shield(self._inflight[key])
+
+        # the generation belongs to the cache, not to the caller that started it: a caller
+        # that is cancelled (client gone) leaves it running for the others and the cache
+        task = asyncio.create_task(self._generate(key, generate, cacheable))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    async def _generate(self, key: str, generate: Callable[[], Awaitable[Dict]], cacheable: Callable[[Dict], bool]):
+        value = await generate()
+        if cacheable(value):
+            await asyncio.to_thread(self.put, key, value)
+        return value
+
+    def _settle(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark it retrieved: only the callers still waiting (if any) re-raise it
+
+    async def _refresh(self, key: str, generate: Callable[[], Awaitable[Dict]], cacheable: Callable[[Dict], bool]):
+        try:
+            await self._generate(key, generate, cacheable)
+        except Exception as e:
+            logger.warning("Background refresh of diagram %s failed: %s", key[:12], e)
+
+
+diagram_cache: Optional[DiagramCache] = (
+    DiagramCache(
+        settings.diagram_cache_path,
+        ttl_s=settings.diagram_cache_ttl_s,
+        stale_s=settings.diagram_cache_stale_s,
+        max_entries=settings.diagram_cache_max_entries,
+    )
+    if settings.diagram_cache
+    else None
+)
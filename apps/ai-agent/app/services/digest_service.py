@@ -0,0 +1,199 @@
+"""
+Per-document digests: an outline, key terms and a short extractive summary.
+
+A digest is built while a document streams through ingestion (one pass over
+its pages, with memory bounded by the vocabulary and a capped list of
+candidate sentences) and stored per (namespace, source). The quiz, flashcard
+and mindmap generators use it as pre-packed context when asked about that
+document, instead of retrieving raw chunks on every request, so repeated
+generation over the same document sends the same small prompt.
+"""
+
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.sqlite_store import SQLiteStore
+from app.core.structure import is_markdown_source, parse_blocks
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9'-]*[A-Za-z0-9]")
+_SENTENCE_RE = re.compile(r"[A-Z][^.!?\n]{30,280}[.!?](?=\s|$)")
+
+STOPWORDS = frozenset("""
+a about above after again against all also although am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc even ever every few for
+from further had has have having he her here hers him his how however i if in into is it its itself just
+least less like made make many may me might more most much must my neither no nor not now of off often on
+once one only onto or other others our ours out over own per perhaps rather same see shall she should since
+so some such than that the their theirs them then there therefore these they this those though through thus
+to too two under until up upon us use used uses using very via was we well were what when where whether
+which while who whom whose why will with within without would yet you your yours
+""".split())
+
+
+@dataclass
+class Digest:
+    source: str
+    outline: List[Tuple[int, str]] = field(default_factory=list)  # (level, title) of headings
+    key_terms: List[str] = field(default_factory=list)
+    summary: List[str] = field(default_factory=list)             # sentences, in document order
+    pages: int = 0
+
+    def render(self, max_chars: int = 1200) -> str:
+        """Compact, stable text form used as generator context."""
+        parts = [f"Document: {self.source}"]
+        if self.outline:
+            parts.append("Outline:\n" + "\n".join(f"{'  ' * (level - 1)}- {title}" for level, title in self.outline))
+        if self.key_terms:
+            parts.append("Key terms: " + ", ".join(self.key_terms))
+        if self.summary:
+            parts.append("Summary: " + " ".join(self.summary))
+        return "\n".join(parts)[:max_chars]
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Digest":
+        return cls(**{**data, "outline": [tuple(h) for h in data.get("outline", [])]})
+
+
+class DigestBuilder:
+    """Accumulate a Digest from a document's pages as they stream past."""
+
+    def __init__(
+        self,
+        source: str,
+        max_outline: int = 40,
+        max_terms: int = 20,
+        max_sentences: int = 5,
+        max_candidates: int = 300,
+    ):
+        self.source = source
+        self.markdown = is_markdown_source(source)
+        self.max_outline = max_outline
+        self.max_terms = max_terms
+        self.max_sentences = max_sentences
+        self.max_candidates = max_candidates
+        self.pages = 0
+        self.outline: List[Tuple[int, str]] = []
+        self._titles = set()  # running headers repeat on every page
+        self.terms: Counter = Counter()
+        self.bigrams: Counter = Counter()
+        self.heading_terms: Counter = Counter()
+        self.candidates: List[str] = []
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        return [w.lower() for w in _WORD_RE.findall(text)]
+
+    def add(self, documents: Iterable[Document]):
+        for doc in documents:
+            self.pages += 1
+            text = doc.page_content
+            section_start = True
+            for block in parse_blocks(text, self.markdown):
+                if block.kind == "heading":
+                    if block.title.lower() not in self._titles and len(self.outline) < self.max_outline:
+                        self._titles.add(block.title.lower())
+                        self.outline.append((block.level, block.title))
+                    self.heading_terms.update(w for w in self._words(block.title) if w not in STOPWORDS)
+                    section_start = True
+                    continue
+
+                body = text[block.start:block.end]
+                words = self._words(body)
+                self.terms.update(w for w in words if w not in STOPWORDS and len(w) > 2)
+                self.bigrams.update(
+                    (a, b) for a, b in zip(words, words[1:])
+                    if a not in STOPWORDS and b not in STOPWORDS and len(a) > 2 and len(b) > 2
+                )
+                # summary candidates: the opening sentence of each section, and of the first pages
+                if block.kind == "text" and (section_start or self.pages <= 3):
+                    if len(self.candidates) < self.max_candidates:
+                        match = _SENTENCE_RE.search(body)
+                        if match:
+                            self.candidates.append(" ".join(match.group(0).split()))
+                section_start = False
+
+    def _weights(self) -> Dict[str, float]:
+        return {
+            term: count * (1.0 + 2.0 * min(self.heading_terms.get(term, 0), 3))
+            for term, count in self.terms.items()
+            if count >= 2
+        }
+
+    def build(self) -> Digest:
+        weights = self._weights()
+
+        key_terms: List[str] = []
+        covered = set()
+        phrases = [
+            (count * (weights.get(a, 0) + weights.get(b, 0)) ** 0.5, f"{a} {b}", (a, b))
+            for (a, b), count in self.bigrams.items()
+            if count >= 3
+        ]
+        for _, phrase, words in sorted(phrases, reverse=True)[: self.max_terms // 2]:
+            key_terms.append(phrase)
+            covered.update(words)
+        for term, _ in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+            if len(key_terms) >= self.max_terms:
+                break
+            if term not in covered:
+                key_terms.append(term)
+
+        def score(sentence: str) -> float:
+            words = self._words(sentence)
+            return sum(weights.get(w, 0.0) for w in set(words)) / math.sqrt(len(words) or 1)
+
+        ranked = sorted(range(len(self.candidates)), key=lambda i: -score(self.candidates[i]))
+        summary = [self.candidates[i] for i in sorted(ranked[: self.max_sentences])]
+        return Digest(self.source, list(self.outline), key_terms, summary, self.pages)
+
+
+class DigestStore(SQLiteStore):
+    """SQLite-backed digests, one per (namespace, source)."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS digests ("
+        " namespace TEXT NOT NULL, source TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL,"
+        " PRIMARY KEY (namespace, source))",
+    )
+
+    def put(self, namespace: str, digest: Digest):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO digests (namespace, source, data, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, digest.source, json.dumps(digest.to_dict()), time.time()),
+            )
+
+    def get(self, namespace: str, source: str) -> Optional[Digest]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM digests WHERE namespace = ? AND source = ?", (namespace, source)
+            ).fetchone()
+        return Digest.from_dict(json.loads(row[0])) if row else None
+
+    def delete(self, namespace: str, source: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM digests WHERE namespace = ? AND source = ?", (namespace, source))
+
+    def context(self, namespace: str, source: Optional[str], max_chars: int = 1200) -> str:
+        """Rendered digest of a document, or "" when there is none."""
+        if not source:
+            return ""
+        digest = self.get(namespace, source)
+        return digest.render(max_chars) if digest else ""
+
+
+digest_store = DigestStore(settings.digest_path)
@@ -0,0 +1,385 @@
+"""
+Background ingestion jobs for /api/documents/upload.
+
+An upload is saved to disk and recorded as a job in SQLite; the request
+returns immediately with the job id. A bounded pool of asyncio workers streams
+each file through extraction, splitting, embedding and upserting (see
+LangChainService.ingest_stream), several files of a job at once, each failing
+on its own, writing per-file stage and progress back to the job row so
+`/jobs/{id}` and its SSE stream can report it. Jobs survive
+a restart: queued jobs, and running jobs whose owning process is gone, are
+picked up again when the queue starts.
+
+Files of one (namespace, source) are ingested one at a time in a process,
+since each run diffs against and then replaces that document's manifest.
+Uploaded files are deleted once their job completes, failed ones included:
+a failed file is retried by uploading it again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.extraction import get_page_extractor
+from app.core.sqlite_store import SQLiteStore
+from app.services.digest_service import DigestBuilder, digest_store
+from app.services.topic_normalizer import topic_normalizer
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore(SQLiteStore):
+    """SQLite-backed ingestion job records; per-file state is kept as a JSON list."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " id TEXT PRIMARY KEY, namespace TEXT NOT NULL, user_id TEXT,"
+        " status TEXT NOT NULL, owner TEXT, error TEXT, files TEXT NOT NULL,"
+        " created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)",
+    )
+
+    @staticmethod
+    def _row(row) -> Dict:
+        return {
+            "job_id": row[0],
+            "namespace": row[1],
+            "user_id": row[2],
+            "status": row[3],
+            "owner": row[4],
+            "error": row[5],
+            "files": json.loads(row[6]),
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def create(self, namespace: str, user_id: Optional[str], files: List[Dict], job_id: Optional[str] = None) -> Dict:
+        """Record a queued job; `files` are dicts with at least `name` and `path`."""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        entries = [
+            {**f, "status": "queued", "stage": "queued", "progress": 0.0, "chunks": 0, "error": None}
+            for f in files
+        ]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, namespace, user_id, status, owner, error, files, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', NULL, NULL, ?, ?, ?)",
+                (job_id, namespace, user_id, json.dumps(entries), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, namespace, user_id, status, owner, error, files, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Atomically move a queued job to running; False if another worker got it first."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                (owner, time.time(), job_id),
+            )
+            return cur.rowcount == 1
+
+    def update_file(self, job_id: str, index: int, **fields):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT files FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return
+            files = json.loads(row[0])
+            files[index].update(fields)
+            conn.execute(
+                "UPDATE jobs SET files = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(files), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def active(self, namespace: str) -> List[Dict]:
+        """Queued and running jobs of a namespace, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, namespace, user_id, status, owner, error, files, created_at, updated_at"
+                " FROM jobs WHERE namespace = ? AND status IN ('queued', 'running') ORDER BY created_at",
+                (namespace,),
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def recover(self) -> List[str]:
+        """
+        Requeue running jobs whose owner process on this host has died, then
+        return the ids of every queued job, oldest first.
+        """
+        host = socket.gethostname()
+        with self._connect() as conn:
+            running = conn.execute("SELECT id, owner FROM jobs WHERE status = 'running'").fetchall()
+            for job_id, owner in running:
+                owner_host, _, pid = (owner or "").rpartition(":")
+                if owner_host == host and pid.isdigit() and _pid_alive(int(pid)):
+                    continue
+                if owner_host and owner_host != host:
+                    # can't see other hosts' processes; leave their jobs alone
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+                    (time.time(), job_id),
+                )
+            rows = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [r[0] for r in rows]
+
+
+class IngestionQueue:
+    """Bounded pool of asyncio workers draining persisted ingestion jobs."""
+
+    def __init__(self, store: JobStore, workers: int = 2, file_concurrency: int = 3):
+        self.store = store
+        self.workers = max(1, workers)
+        self.file_concurrency = max(1, file_concurrency)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # (namespace, source) -> lock held while a file of that document is ingested
+        self._sources: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def _source_lock(self, namespace: str, source: str) -> asyncio.Lock:
+        lock = self._sources.get((namespace, source))
+        if lock is None:
+            lock = self._sources[(namespace, source)] = asyncio.Lock()
+        return lock
+
+    async def start(self):
+        """Spawn the workers and resume pending jobs; safe to call more than once."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        for job_id in await asyncio.to_thread(self.store.recover):
+            self._queue.put_nowait(job_id)
+        logger.info("IngestionQueue: %d workers started (%d pending jobs)", self.workers, self._queue.qsize())
+
+    async def submit(self, namespace: str, user_id: Optional[str], files: List[Dict], job_id: Optional[str] = None) -> Dict:
+        await self.start()
+        job = await asyncio.to_thread(self.store.create, namespace, user_id, files, job_id)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if await asyncio.to_thread(self.store.claim, job_id, self.owner):
+                    await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Ingestion job %s crashed", job_id)
+                await asyncio.to_thread(self.store.finish, job_id, "failed", str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _update(self, job_id: str, index: int, **fields):
+        await asyncio.to_thread(self.store.update_file, job_id, index, **fields)
+
+    async def _ingest_file(self, job: Dict, index: int, entry: Dict):
+        """
+        Stream one file into the index. The first ingestion_priority_pages pages
+        go first; once they are written the file is "partial" (queryable) and
+        pages_indexed / indexed_fraction track the backfill of the rest. The
+        document's digest is built from the same pages and stored at the end.
+        """
+        from app.services.langchain_service import langchain_service
+
+        job_id = job["job_id"]
+        await self._update(job_id, index, status="running", stage="parsing", progress=0.0)
+        if langchain_service is None:
+            raise RuntimeError("LangChain service unavailable")
+
+        extractor = get_page_extractor()
+        num_pages = await extractor.page_count(entry["path"])
+        total = num_pages or 1
+        priority = min(settings.ingestion_priority_pages, total)
+        await self._update(job_id, index, pages=total, pages_indexed=0, indexed_fraction=0.0)
+
+        async def progress(stage: str, done: int, total: int):
+            await self._update(job_id, index, stage=stage, progress=round(done / total, 3) if total else 0.0)
+
+        metadata = {"source": entry["name"], "user_id": job["user_id"] or "anonymous"}
+        page_numbers: List[int] = []  # page number of each document handed on, in order
+        digest = DigestBuilder(entry["name"]) if settings.document_digests else None
+
+        async def pages():
+            # extraction, splitting and upserting overlap: pages are handed on a shard at a time
+            async for shard in extractor.iter_pages(entry["path"], num_pages, first_pages=priority):
+                docs = []
+                for number, text in shard:
+                    if text.strip():
+                        docs.append(Document(
+                            page_content=text, metadata={**metadata, "page": number} if number else metadata
+                        ))
+                        page_numbers.append(number or total)
+                if docs:
+                    if digest:
+                        await asyncio.to_thread(digest.add, docs)
+                    yield docs
+
+        async def on_indexed(count: int):
+            indexed = page_numbers[count - 1]
+            fields = {"pages_indexed": indexed, "indexed_fraction": round(indexed / total, 3)}
+            if indexed >= priority and indexed < total:
+                fields["status"] = "partial"
+            await self._update(job_id, index, **fields)
+
+        ids = await langchain_service.ingest_stream(
+            pages(), collection_name=job["namespace"], progress=progress,
+            on_indexed=on_indexed, priority_pages=priority,
+        )
+        if not ids:
+            # a re-upload with no text replaces the old version with nothing
+            removed = await langchain_service.delete_document(job["namespace"], entry["name"])
+            await asyncio.to_thread(digest_store.delete, job["namespace"], entry["name"])
+            logger.warning("Skipping empty file: %s (%d old vectors removed)", entry["name"], removed)
+            await self._update(job_id, index, status="skipped", stage="done", progress=1.0)
+            return
+        if digest:
+            await asyncio.to_thread(digest_store.put, job["namespace"], digest.build())
+            await asyncio.to_thread(topic_normalizer.add_vocabulary, digest.terms)
+        await self._update(
+            job_id, index, status="done", stage="done", progress=1.0, chunks=len(ids),
+            pages_indexed=total, indexed_fraction=1.0,
+        )
+
+    async def _run(self, job_id: str):
+        """
+        Ingest the job's files concurrently, at most file_concurrency at a time, so
+        one file is parsed while another is embedded and upserted. A failing file
+        is marked failed without affecting the others. A file whose document is
+        being ingested by another job waits for it before taking a slot.
+        """
+        job = await asyncio.to_thread(self.store.get, job_id)
+        limit = asyncio.Semaphore(self.file_concurrency)
+
+        async def ingest(index: int, entry: Dict) -> bool:
+            async with self._source_lock(job["namespace"], entry["name"]), limit:
+                try:
+                    await self._ingest_file(job, index, entry)
+                    return True
+                except Exception as e:
+                    logger.error("Ingestion failed for %s (job %s): %s", entry["name"], job_id, e)
+                    # ingest_stream has removed what it wrote: nothing of the file stays queryable
+                    await self._update(
+                        job_id, index, status="failed", error=str(e), pages_indexed=0, indexed_fraction=0.0
+                    )
+                    return False
+
+        results = await asyncio.gather(*[
+            ingest(index, entry)
+            for index, entry in enumerate(job["files"])
+            if entry["status"] not in ("done", "skipped")  # resumed job: keep what already finished
+        ])
+        failures = results.count(False)
+        # uploads are kept until the job completes so an interrupted job can resume
+        self._cleanup(job["files"])
+
+        # only files attempted in this run count: a resumed job keeps what already finished
+        if results and failures == len(results):
+            await asyncio.to_thread(self.store.finish, job_id, "failed", "All files failed to ingest")
+        else:
+            await asyncio.to_thread(self.store.finish, job_id, "done")
+        logger.info("Ingestion job %s finished (%d/%d files failed)", job_id, failures, len(results))
+
+    @staticmethod
+    def _cleanup(files: List[Dict]):
+        dirs = set()
+        for entry in files:
+            path = Path(entry["path"])
+            dirs.add(path.parent)
+            path.unlink(missing_ok=True)
+        for d in dirs:
+            try:
+                d.rmdir()
+            except OSError:
+                pass
+
+
+def namespace_status(namespace: str) -> Dict:
+    """
+    Readiness of a namespace for querying: "ready" (everything indexed),
+    "partially_ready" (some documents or first pages are queryable while
+    others are still being indexed), "indexing" (nothing queryable yet) or
+    "empty". Lists the files still in progress with their indexed fraction.
+    """
+    from app.core.document_manifest import get_document_manifest
+
+    documents = get_document_manifest().documents(namespace)
+    indexing = [
+        {
+            "job_id": job["job_id"],
+            "name": f["name"],
+            "status": f["status"],
+            "pages": f.get("pages"),
+            "pages_indexed": f.get("pages_indexed", 0),
+            "indexed_fraction": f.get("indexed_fraction", 0.0),
+        }
+        for job in ingestion_queue.store.active(namespace)
+        for f in job["files"]
+        if f["status"] in ("queued", "running", "partial")
+    ]
+    if not indexing:
+        state = "ready" if documents else "empty"
+    elif documents or any(f["status"] == "partial" for f in indexing):
+        state = "partially_ready"
+    else:
+        state = "indexing"
+    pages = sum(f["pages"] or 0 for f in indexing)
+    if pages:
+        fraction = round(sum(f["pages_indexed"] or 0 for f in indexing) / pages, 3)
+    else:
+        fraction = 0.0 if indexing else 1.0
+    return {
+        "namespace": namespace,
+        "state": state,
+        "documents": len(documents),
+        "indexing": indexing,
+        "indexed_fraction": fraction,
+    }
+
+
+ingestion_queue = IngestionQueue(
+    JobStore(settings.ingestion_jobs_path),
+    workers=settings.ingestion_workers,
+    file_concurrency=settings.ingestion_file_concurrency,
+)
@@ -3,7 +3,12 @@ Core LangChain service with RAG capabilities - Using latest LangChain API
 """
 import logging
 import json
-from typing import List, Dict, Any, Optional
+import asyncio
+import time
+import uuid
+import bisect
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import re
 import os
@@ -29,8 +34,9 @@ try:
     from langchain_core.documents import Document
     logger.info("Importing prompts...")
     from langchain_core.prompts import ChatPromptTemplate
-    logger.info("Importing text splitters...")
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    logger.info("Importing text splitter...")
+    from app.core.text_splitter import TokenSplitter
+    from app.core.structure import StructuredSplitter, format_context_chunk
     logger.info("Importing Pinecone...")
     from langchain_pinecone import PineconeVectorStore
     from pinecone import Pinecone, ServerlessSpec
@@ -38,6 +44,17 @@ try:
     from app.core.config import settings
     logger.info("Importing MINDMAP_PROMPT...")
     from app.core.prompts import MINDMAP_PROMPT  # new import
+    from app.core.metadata_index import to_pinecone_filter
+    from app.services.pinecone_writer import PineconeWriter, TEXT_KEY
+    from app.services.reranker import LocalReranker
+    from app.core.chunk_store import ChunkStore, ParentWindow, sentence_spans
+    from app.core.document_manifest import ManifestMatcher, get_document_manifest
+    from app.services.digest_service import digest_store
+    from app.core.mermaid_parser import parse as parse_mermaid
+    from app.core.mermaid_repair import repair as repair_mermaid
+    from app.core.mindmap_tree import DETAIL_BUDGETS, MAX_DETAIL, MindmapTree
+    from app.services.diagram_cache import cache_key, diagram_cache
+    from app.services.topic_normalizer import topic_normalizer
     
     logger.info("✅ All imports successful (langchain_service)")
 except Exception as e:
@@ -101,11 +118,29 @@ class LangChainService:
             else:
                 logger.info(f"✅ Pinecone Index '{self.index_name}' found")
 
-            # Initialize text splitter
-            self.text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=settings.chunk_size,
-                chunk_overlap=settings.chunk_overlap,
+            self.index = self.pc.Index(self.index_name)
+            self.writer = PineconeWriter(
+                index=self.index,
+                embeddings=self.embeddings,
+                embed_batch_size=settings.pinecone_embed_batch_size,
+                upsert_batch_size=settings.pinecone_upsert_batch_size,
+                max_concurrency=settings.pinecone_upsert_concurrency,
+                max_retries=settings.pinecone_upsert_max_retries,
             )
+            self.reranker = LocalReranker(budget_ms=settings.rerank_budget_ms)
+
+            # Initialize text splitters (token-sized, single pass); chunks are cut
+            # on heading, list and page boundaries and carry section_path/char_offset
+            self.text_splitter = StructuredSplitter(
+                TokenSplitter(settings.chunk_tokens, settings.chunk_overlap_tokens)
+            )
+            # Small-to-big: parent windows live in the local chunk store,
+            # only small child chunks are embedded and indexed
+            self.parent_splitter = StructuredSplitter(TokenSplitter(settings.parent_chunk_tokens, 0))
+            self.child_splitter = TokenSplitter(settings.child_chunk_tokens, 0)
+            self.chunk_store = ChunkStore(settings.chunk_store_path)
+            # Chunk hashes + vector ids per (namespace, source) for incremental re-ingestion
+            self.manifest = get_document_manifest()
             logger.info("✅ Text splitter initialized")
 
             # Debug Test
@@ -123,7 +158,8 @@ class LangChainService:
         message: str,
         collection_name: str = "default",
         conversation_history: List[Dict[str, str]] = None,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Bulletproof chat with RAG fallback"""
         try:
@@ -131,7 +167,9 @@ class LangChainService:
             
             if vector_store:
                 logger.info("📖 Using RAG")
-                return await self.rag_chat(message, vector_store, system_prompt)
+                return await self.rag_chat(
+                    message, system_prompt, filter=filter, collection_name=collection_name
+                )
             else:
                 logger.info("💬 Using direct chat")
                 return await self.direct_chat(message, conversation_history, system_prompt)
@@ -140,22 +178,63 @@ class LangChainService:
             logger.error(f"Chat error: {e}, falling back")
             return await self.direct_chat(message, conversation_history, system_prompt)
     
+    async def retrieve(
+        self,
+        query: str,
+        collection_name: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        fetch_k: Optional[int] = None
+    ) -> List[Document]:
+        """
+        Over-fetch `fetch_k` candidates from Pinecone (with their vectors) and keep
+        the best `k` according to the local reranker. Costs one embedding call.
+        """
+        fetch_k = max(k, fetch_k or settings.rag_fetch_k)
+        query_vector = await self.embeddings.aembed_query(query)
+        result = await asyncio.to_thread(
+            self.index.query,
+            vector=query_vector,
+            top_k=fetch_k,
+            namespace=collection_name,
+            filter=to_pinecone_filter(filter),
+            include_values=fetch_k > k,
+            include_metadata=True,
+        )
+
+        matches = getattr(result, "matches", None)
+        if matches is None:
+            matches = result.get("matches", [])
+        docs, vectors = [], []
+        for match in matches:
+            metadata = dict(getattr(match, "metadata", None) or {})
+            text = metadata.pop(TEXT_KEY, "")
+            docs.append(Document(page_content=text, metadata=metadata))
+            vectors.append(getattr(match, "values", None) or [])
+
+        if len(docs) <= k or not all(vectors):
+            return docs[:k]
+        order = self.reranker.rerank(query, query_vector, docs, vectors, top_k=k)
+        return [docs[i] for i in order]
+
     async def rag_chat(
         self,
         message: str,
-        vector_store: PineconeVectorStore,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        collection_name: str = "default"
     ) -> Dict[str, Any]:
-        """RAG chat using vector store retriever directly"""
+        """RAG chat: over-fetch from Pinecone, rerank locally, answer from the top chunks"""
         try:
-            # Create retriever
-            retriever = vector_store.as_retriever(search_kwargs={"k": 4})
-            
-            # Get relevant documents
-            docs = retriever.invoke(message)
+            started = time.perf_counter()
+
+            # Get relevant documents; metadata filter is pushed down to Pinecone
+            docs = await self.retrieve(message, collection_name, k=settings.rag_top_k, filter=filter)
+            docs = await asyncio.to_thread(self.expand_windows, docs)  # parent windows are read from SQLite
+            retrieved = time.perf_counter()
             
-            # Format context from documents
-            context = "\n\n".join([doc.page_content for doc in docs])
+            # Format context from documents, labelled with where each chunk came from
+            context = "\n\n".join(format_context_chunk(doc) for doc in docs)
             
             # Create prompt
             prompt_text = system_prompt or SPARK_PERSONALITY
@@ -163,6 +242,10 @@ class LangChainService:
             
             # Invoke LLM
             response = self.llm.invoke([HumanMessage(content=prompt_text)])
+            logger.info(
+                "rag_chat: retrieve+rerank %.0f ms, llm %.0f ms, %d chunks",
+                (retrieved - started) * 1000, (time.perf_counter() - retrieved) * 1000, len(docs)
+            )
             
             # Format sources
             sources = [
@@ -215,29 +298,287 @@ class LangChainService:
             logger.error(f"Load error: {e}")
             return None
     
-    async def upsert_documents(self, documents, collection_name):
-        """Upsert documents to Pinecone namespace"""
+    async def upsert_documents(self, documents, collection_name, progress=None) -> List[str]:
+        """Upsert documents to Pinecone namespace; returns the vector ids"""
         try:
             logger.info(f"upsert_documents: namespace={collection_name} docs={len(documents)}")
             
-            # PineconeVectorStore class methods are sync/async handled by langchain wrapper
-            # Use 'from_documents' to add to existing index
-            docsearch = PineconeVectorStore.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                index_name=self.index_name,
-                namespace=collection_name
-            )
+            # Batched embed + concurrent upserts, off the event loop
+            ids = await self.writer.write(documents, namespace=collection_name, progress=progress)
             
             logger.info(f"✅ Upserted {len(documents)} documents to Pinecone namespace {collection_name}")
-            return docsearch
+            return ids
         except Exception as e:
             logger.error(f"upsert_documents error: {e}")
             raise
     
-    def split_documents(self, documents):
-        """Split documents"""
-        return self.text_splitter.split_documents(documents)
+    def split_documents(self, documents, headings=None):
+        """Split documents (`headings` carries section state across page batches)"""
+        return self.text_splitter.split_documents(documents, headings)
+
+    def split_small_to_big(self, documents, collection_name: str, headings=None):
+        """
+        Split documents into parent windows and small child chunks.
+        Returns (children, parents); children carry parent_id and their
+        sentence range so they can be expanded at query time.
+        """
+        children, parents = [], []
+        for parent_doc in self.parent_splitter.split_documents(documents, headings):
+            text = parent_doc.page_content
+            spans = sentence_spans(text) or [(0, len(text))]
+            source = str(parent_doc.metadata.get("source", ""))
+            # Content-derived id: an unchanged window keeps its id across re-uploads,
+            # so its children hash the same and their vectors are reused
+            parent_id = hashlib.sha1(f"{collection_name}\0{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+            parent = ParentWindow(
+                id=parent_id,
+                namespace=collection_name,
+                source=source,
+                text=text,
+                spans=spans,
+            )
+            parents.append(parent)
+
+            span_starts = [start for start, _ in spans]
+            offset = parent_doc.metadata.get("char_offset", 0)
+            for child in self.child_splitter.spans(text):
+                first = max(bisect.bisect_right(span_starts, child.start) - 1, 0)
+                last = max(bisect.bisect_right(span_starts, child.end - 1) - 1, first)
+                children.append(Document(
+                    page_content=text[child.start:child.end],
+                    metadata={
+                        **parent_doc.metadata,
+                        "char_offset": offset + child.start,
+                        "parent_id": parent.id,
+                        "sent_start": first,
+                        "sent_end": last,
+                    },
+                ))
+        return children, parents
+
+    async def ingest_documents(self, documents, collection_name, progress=None) -> List[str]:
+        """Ingest a list of documents in one batch; see ingest_stream. Returns vector ids."""
+        async def one_batch():
+            yield list(documents)
+
+        return await self.ingest_stream(one_batch(), collection_name, progress=progress)
+
+    async def ingest_stream(
+        self, batches, collection_name, progress=None, on_indexed=None, priority_pages: int = 0
+    ) -> List[str]:
+        """
+        Streaming ingestion. `batches` is an async iterator of Document lists
+        (e.g. a few pages at a time); each is split as it arrives, matched
+        against the manifest, and its new chunks are embedded and upserted in
+        embed-sized batches while later pages are still being extracted. The
+        stages pull from one another, so memory is bounded by the batches in
+        flight rather than the document size.
+
+        Chunks of pages up to `priority_pages` (and of documents without page
+        numbers) get writer slots ahead of the rest, so the beginning of a large
+        document becomes queryable while the remainder backfills.
+        `on_indexed(n)` is awaited whenever the first n input documents (pages)
+        are fully written.
+
+        Re-ingesting a source only embeds chunks not already in its manifest;
+        once everything is written the manifest is replaced and vectors of
+        chunks that are gone are deleted. Returns the vector ids.
+        Written vectors are added to the manifest batch by batch, so a process
+        that dies mid-way leaves them owned by their document; on an error or
+        cancellation the vectors and parent windows this run added are removed
+        and the previous manifest is restored.
+        Optional async `progress(stage, done, total)` reports "splitting" then
+        "embedding" (total = new chunks produced so far).
+        """
+        matchers: Dict[str, ManifestMatcher] = {}
+        previous: Dict[str, list] = {}     # source -> its manifest entries before this run
+        assigned: Dict[str, tuple] = {}    # new vector id -> (source, hash, position) until written
+        kept_parents: Dict[str, set] = {}
+        added_parents: List[str] = []      # parent windows this run stored for the first time
+        headings: Dict[str, list] = {}
+        produced = 0
+        doc_ends: List[int] = []           # per input document: new chunks produced once it was split
+        batch_starts: Dict[str, int] = {}  # first vector id of a batch -> its chunk offset
+        written_ranges: Dict[int, int] = {}
+        written_prefix = 0
+        reported = 0
+
+        def split(documents):
+            # one document at a time, so chunks can be attributed to their page
+            per_doc, parents = [], []
+            for doc in documents:
+                if settings.small_to_big:
+                    chunks, doc_parents = self.split_small_to_big([doc], collection_name, headings)
+                    parents.extend(doc_parents)
+                else:
+                    chunks = self.split_documents([doc], headings)
+                per_doc.append(chunks)
+            return per_doc, parents
+
+        async def new_chunks():
+            nonlocal produced
+            pending_docs, pending_ids = [], []
+            async for documents in batches:
+                per_doc, parents = await asyncio.to_thread(split, documents)
+                if parents:
+                    added_parents.extend(await asyncio.to_thread(self.chunk_store.put, parents))
+                    for parent in parents:
+                        kept_parents.setdefault(parent.source, set()).add(parent.id)
+
+                for chunks in per_doc:
+                    for chunk in chunks:
+                        source = str(chunk.metadata.get("source", ""))
+                        matcher = matchers.get(source)
+                        if matcher is None:
+                            entries = await asyncio.to_thread(self.manifest.entries, collection_name, source)
+                            previous[source] = entries
+                            matcher = matchers[source] = ManifestMatcher(entries)
+                        vid = matcher.match(chunk, lambda: uuid.uuid4().hex)
+                        if vid is None:
+                            continue  # unchanged chunk, vector reused
+                        assigned[vid] = (source, matcher.diff.hashes[-1], len(matcher.diff.ids) - 1)
+                        pending_docs.append(chunk)
+                        pending_ids.append(vid)
+                        produced += 1
+                        if len(pending_docs) >= self.writer.embed_batch_size:
+                            batch_starts[pending_ids[0]] = produced - len(pending_ids)
+                            yield pending_docs, pending_ids
+                            pending_docs, pending_ids = [], []
+                    doc_ends.append(produced)
+            if pending_docs:
+                batch_starts[pending_ids[0]] = produced - len(pending_ids)
+                yield pending_docs, pending_ids
+
+        async def report_indexed(count: int):
+            nonlocal reported
+            if on_indexed and count > reported:
+                reported = count
+                await on_indexed(count)
+
+        async def on_batch(ids: List[str]):
+            # batches finish out of order; pages count as indexed once every chunk up to theirs is written
+            nonlocal written_prefix
+            rows: Dict[str, list] = {}
+            for vid in ids:
+                source, h, position = assigned.pop(vid)
+                rows.setdefault(source, []).append((h, vid, position))
+            for source, source_rows in rows.items():
+                await asyncio.to_thread(self.manifest.add, collection_name, source, source_rows)
+            start = batch_starts.pop(ids[0])
+            written_ranges[start] = start + len(ids)
+            while written_prefix in written_ranges:
+                written_prefix = written_ranges.pop(written_prefix)
+            await report_indexed(bisect.bisect_right(doc_ends, written_prefix))
+
+        def priority(documents) -> int:
+            # by the batch's first page: a batch straddling priority_pages still holds priority pages
+            page = documents[0].metadata.get("page")
+            return 0 if page is None or page <= priority_pages else 1
+
+        async def on_upsert(done: int):
+            if progress:
+                await progress("embedding", done, produced)
+
+        if progress:
+            await progress("splitting", 0, 0)
+        try:
+            written = await self.writer.write_stream(
+                new_chunks(), namespace=collection_name, progress=on_upsert, on_batch=on_batch, priority=priority
+            )
+        except BaseException:
+            # shielded: a cancelled ingestion still takes back what it wrote
+            await asyncio.shield(self._discard_run(collection_name, matchers, previous, added_parents))
+            raise
+        if progress and not written:
+            await progress("embedding", 0, 0)
+        await report_indexed(len(doc_ends))
+
+        # Record the new state before deleting, so a crash leaves orphans rather than holes
+        ids: List[str] = []
+        for source, matcher in matchers.items():
+            diff = matcher.result()
+            logger.info(
+                f"ingest_stream: {source}: {len(diff.new)} new, {diff.kept} unchanged, {len(diff.stale)} removed chunks"
+            )
+            await asyncio.to_thread(self.manifest.replace, collection_name, source, diff.hashes, diff.ids)
+            await self.writer.delete(diff.stale, namespace=collection_name)
+            if settings.small_to_big:
+                await asyncio.to_thread(
+                    self.chunk_store.prune, collection_name, source, kept_parents.get(source, set())
+                )
+            ids.extend(diff.ids)
+        return ids
+
+    async def _discard_run(
+        self, collection_name: str, matchers: Dict[str, ManifestMatcher], previous: Dict[str, list],
+        added_parents: List[str],
+    ):
+        """Undo an unfinished ingest_stream: delete the vectors it assigned, restore each manifest."""
+        for source, matcher in matchers.items():
+            new_ids = [matcher.diff.ids[i] for i in matcher.diff.new]
+            await self.writer.delete(new_ids, namespace=collection_name)
+            # restore the manifest last, so a failed vector delete leaves them owned by the document
+            if previous[source]:
+                hashes, ids = zip(*previous[source])
+                await asyncio.to_thread(self.manifest.replace, collection_name, source, hashes, ids)
+            else:
+                await asyncio.to_thread(self.manifest.delete, collection_name, source)
+            logger.warning(f"ingest_stream: {source}: discarded {len(new_ids)} vectors of an unfinished ingestion")
+        await asyncio.to_thread(self.chunk_store.discard, added_parents)
+
+    async def delete_document(self, collection_name: str, source: str) -> int:
+        """
+        Remove one document from a namespace: its vectors (batched deletes of
+        exactly the ids in its manifest), parent windows and catalog entry.
+        Returns the number of vectors deleted.
+        """
+        ids = [vid for _, vid in await asyncio.to_thread(self.manifest.entries, collection_name, source)]
+        await self.writer.delete(ids, namespace=collection_name)
+        await asyncio.to_thread(self.chunk_store.delete, collection_name, source)
+        # forget the document last, so a failed vector delete can be retried
+        await asyncio.to_thread(self.manifest.delete, collection_name, source)
+        logger.info(f"delete_document: {source} removed from {collection_name} ({len(ids)} vectors)")
+        return len(ids)
+
+    def expand_windows(self, docs: List[Document], context_sentences: Optional[int] = None) -> List[Document]:
+        """
+        Replace matched child chunks with their sentence window plus neighbouring
+        context from the parent. Windows from the same parent are merged; chunks
+        without a stored parent are returned unchanged.
+        """
+        if context_sentences is None:
+            context_sentences = settings.window_context_sentences
+        parents = self.chunk_store.get_many(d.metadata.get("parent_id") for d in docs)
+        if not parents:
+            return docs
+
+        merged: List[Any] = []  # Document, or [parent, lo, hi, metadata] to render
+        open_windows: Dict[str, List[Any]] = {}
+        for doc in docs:
+            parent = parents.get(doc.metadata.get("parent_id"))
+            if parent is None:
+                merged.append(doc)
+                continue
+            lo, hi = parent.window(
+                int(doc.metadata.get("sent_start", 0)),
+                int(doc.metadata.get("sent_end", 0)),
+                context_sentences,
+            )
+            existing = open_windows.get(parent.id)
+            if existing and lo <= existing[2] and hi >= existing[1]:
+                existing[1], existing[2] = min(existing[1], lo), max(existing[2], hi)
+                continue
+            window = [parent, lo, hi, doc.metadata]
+            open_windows[parent.id] = window
+            merged.append(window)
+
+        return [
+            item if isinstance(item, Document) else Document(
+                page_content=item[0].text_for(item[1], item[2]),
+                metadata={**item[3], "sent_start": item[1], "sent_end": item[2] - 1},
+            )
+            for item in merged
+        ]
 
     def _extract_mermaid(self, text: str) -> str:
         # ...existing helper...
@@ -584,92 +925,12 @@ class LangChainService:
     def _sanitize_mindmap_strict(self, mermaid: str, topic: str, depth: int = 3) -> str:
         """
         Enforce strict Mermaid mindmap grammar and clean common LLM artifacts.
-        Returns a cleaned mindmap string safe for mermaid.parse().
+        Returns a cleaned mindmap string safe for mermaid.parse(): one root
+        (the topic when the output has none), labels without markup of at most
+        120 characters, duplicate siblings merged, at most `depth` levels.
         """
-        if not mermaid:
-            return f"mindmap\n  root(({topic}))\n"
-
-        # Split lines and normalize whitespace
-        lines = mermaid.splitlines()
-
-        # Remove any leading/trailing empty lines
-        while lines and not lines[0].strip():
-            lines.pop(0)
-        while lines and not lines[-1].strip():
-            lines.pop()
-
-        # Ensure header exists
-        if not lines or not lines[0].strip().lower().startswith("mindmap"):
-            # if first line contains something like 'graph' or 'flowchart', discard and create header
-            # keep the rest as content
-            lines.insert(0, "mindmap")
-
-        # Ensure second line is root((Title)) — if missing, create one from topic
-        if len(lines) < 2 or not re.match(r'^\s*root\s*\(\(.*\)\)\s*$', lines[1], flags=re.I):
-            root_label = topic.strip()[:100] or "Topic"
-            # sanitize root label characters
-            root_label = re.sub(r'[\[\]\{\}]', '', root_label)
-            lines.insert(1, f"  root(({root_label}))")
-
-        # Process subsequent lines
-        clean_lines = [lines[0], lines[1]]
-        # Allowed characters inside labels (keep parentheses, colon, comma, period)
-        allowed_re = re.compile(r"[^A-ZaZ0-9 \,\.\:\(\)\?\!\/\+\-%&_@]")
-        # Normalize indentation: use 2 spaces per level
-        for ln in lines[2:]:
-            orig = ln
-            # Convert tabs to two spaces
-            ln = ln.replace("\t", "  ")
-            # Remove leading/trailing spaces
-            ln_strip = ln.rstrip()
-            leading = len(ln_strip) - len(ln_strip.lstrip(" "))
-            content = ln_strip.lstrip(" ")
-
-            # Remove common list markers and markdown bullets at start
-            content = re.sub(r'^[-\*\u2022\u2013\u2014]\s+', '', content)
-            content = re.sub(r'^\d+[\.\)]\s+', '', content)
-            # Remove markdown headers like '# '
-            content = re.sub(r'^\s*#{1,6}\s*', '', content)
-
-            # Remove bracket/box syntax leftovers
-            content = re.sub(r'[\[\]\{\}]', '', content)
-
-            # Remove inline markdown bullets like '- ' in middle of label
-            content = re.sub(r'\s*-\s*', ' - ', content)
-
-            # Collapse multiple spaces
-            content = re.sub(r'\s+', ' ', content).strip()
-
-            # Truncate overly long labels
-            if len(content) > 120:
-                content = content[:117].rstrip() + "..."
-
-            # Remove disallowed characters
-            content = allowed_re.sub('', content).strip()
-
-            # If content becomes empty, skip line
-            if not content:
-                continue
-
-            # Normalize indentation level based on original leading spaces
-            # Each level = 2 spaces. Compute level = round(leading / 2).
-            level = max(0, int(round(leading / 2)))
-            # Cap level by depth (plus 1 for root)
-            if level > depth:
-                level = depth
-            indent = "  " * (level + 1)  # +1 because root is at level 0 occupying second line
-            clean_lines.append(f"{indent}{content}")
-
-        # Remove duplicate adjacent lines
-        final_lines = []
-        prev = None
-        for ln in clean_lines:
-            if ln.strip() == prev:
-                continue
-            final_lines.append(ln.rstrip())
-            prev = ln.strip()
-
-        return "\n".join(final_lines) + "\n"
+        tree = MindmapTree.from_mermaid(mermaid, topic.strip()[:100] or "Topic")
+        return tree.clean_labels(max_chars=120).limit_depth(max(depth, 2)).to_mermaid() + "\n"
 
     def _normalize_mindmap_output(self, text: str, topic: str, depth: int = 3) -> str:
         """
@@ -763,43 +1024,16 @@ class LangChainService:
 
     def _is_mindmap_valid(self, text: str, max_depth: int = 6) -> bool:
         """
-        Simple strict validator for Mermaid mindmap:
-        - first non-empty line == 'mindmap'
-        - second non-empty line matches: two-space indent + root((...))
-        - all subsequent lines: indentation is multiple of 2 spaces and label length <= 120
-        - forbidden tokens not present: --> , -> , [], {}, subgraph, graph, flowchart
+        Strict validator for Mermaid mindmap: parses cleanly, one root with at
+        least one child, and no node deeper than max_depth (root = 1).
         """
-        if not text:
-            return False
-        # remove leading/trailing blank lines
-        lines = [ln.rstrip() for ln in text.splitlines() if ln.strip() != ""]
-        if len(lines) < 2:
+        diagram = parse_mermaid(text)
+        if diagram.kind != "mindmap" or not diagram.ok:
+            if diagram.errors:
+                logger.debug(f"Mindmap invalid: {diagram.errors[0]}")
             return False
-        if not re.match(r'^\s*mindmap\s*$', lines[0], flags=re.I):
-            return False
-        if not re.match(r'^\s{2}root\s*\(\(.{1,120}\)\)\s*$', lines[1], flags=re.I):
-            return False
-        for ln in lines[2:]:
-            # check forbidden tokens
-            if re.search(r'-->|->|\[.*\]|\{|\}|subgraph\b|graph\b|flowchart\b', ln, flags=re.I):
-                return False
-            # leading spaces must be multiple of 2
-            leading = len(ln) - len(ln.lstrip(" "))
-            if leading % 2 != 0:
-                return False
-            # label length after trimming should be <=120
-            label = ln.strip()
-            if len(label) > 120:
-                return False
-        # depth check
-        max_seen_depth = 0
-        for ln in lines[2:]:
-            level = (len(ln) - len(ln.lstrip(" "))) // 2
-            if level > max_seen_depth:
-                max_seen_depth = level
-        if max_seen_depth > max_depth:
-            return False
-        return True
+        nodes = diagram.of("node")
+        return len(nodes) >= 2 and max(n.data["depth"] for n in nodes) <= max_depth
 
     # Strict regeneration system prompt used on retries
     _REGEN_PROMPT = (
@@ -811,6 +1045,28 @@ class LangChainService:
         "Make sure that whatever you output can be parsed by Mermaid without errors."
     )
 
+    async def generation_context(
+        self, topic: str, collection_name: str, source: Optional[str] = None, k: int = 6
+    ) -> Tuple[str, bool]:
+        """
+        Context for the quiz / flashcard / mindmap generators: the stored digest
+        of `source` when there is one (small and identical across requests),
+        else the text of the top-k retrieved chunks. Returns (text, from_digest).
+        """
+        if source:
+            digest = await asyncio.to_thread(digest_store.context, collection_name, source)
+            if digest:
+                return digest, True
+        try:
+            vector_store = self.load_vector_store(collection_name)
+            if vector_store:
+                retriever = vector_store.as_retriever(search_kwargs={"k": k})
+                docs = retriever.invoke(topic)
+                return "\n\n".join(doc.page_content for doc in docs), False
+        except Exception as e:
+            logger.warning(f"Retrieval skipped: {e}")
+        return "", False
+
     async def generate_research_mindmap(
         self,
         topic: str,
@@ -818,24 +1074,73 @@ class LangChainService:
         diagram_type: str = "mindmap",
         custom_prompt: Optional[str] = None,
         color_scheme: Optional[str] = "auto",
-        student_level: Optional[str] = "beginner"
+        student_level: Optional[str] = "beginner",
+        collection_name: str = "default",
+        source: Optional[str] = None,
+        fresh: bool = False
     ) -> Dict[str, Any]:
         """
         Generate a Mermaid diagram and return dict with mermaidCode and themeVars.
+        With `source`, the document's digest is the context instead of retrieved chunks.
+        The topic is canonicalized locally (spelling, casing, a type request such
+        as "class diagram of") when the normalizer is confident and agrees with
+        `diagram_type`; the diagram is generated from that topic and shared
+        through the diagram cache, keyed by it, the options and the content
+        version of the namespace (or of `source`);
+        fresh=True generates a new variant instead of reading the cache. A mindmap
+        is generated once at full depth and pruned to `depth` locally.
         Always returns: {"mermaidCode": str, "themeVars": dict}
         """
+        # mindmaps are generated once at full depth; shallower ones are pruned from it locally
+        mindmap = diagram_type == "mindmap"
+        level = MAX_DETAIL if mindmap else depth
+        # generate from the string the cache entry is keyed on
+        canonical = await asyncio.to_thread(topic_normalizer.normalize, topic, diagram_type)
+        if canonical.confidence >= settings.topic_confidence_threshold and canonical.diagram_type == diagram_type:
+            topic = canonical.topic
+        else:
+            topic = " ".join(topic.split())
+
+        async def build() -> Dict[str, Any]:
+            result = await self._research_mindmap(
+                topic, level, diagram_type, custom_prompt, color_scheme, student_level, collection_name, source
+            )
+            return {**result, "diagramType": diagram_type}  # expand() only accepts mindmaps
+
+        if diagram_cache is None:
+            result = await build()
+        else:
+            version = await asyncio.to_thread(self.manifest.version, collection_name, source)
+            key = cache_key(
+                "research_mindmap", topic.lower(), diagram_type, level, custom_prompt or "",
+                color_scheme, student_level, collection_name, source or "", version,
+            )
+            result = await diagram_cache.get_or_generate(
+                key, build, fresh, cacheable=lambda result: not result.get("fallback")
+            )
+            if mindmap:
+                result = {**result, "diagramId": key}  # for /api/mindmap/expand
+        if not mindmap or level == depth or result.get("fallback"):
+            return result
+        tree = MindmapTree.from_mermaid(result["mermaidCode"], topic).at_detail(depth)
+        return {**result, "mermaidCode": tree.to_mermaid() + "\n"}
+
+    async def _research_mindmap(
+        self,
+        topic: str,
+        depth: int,
+        diagram_type: str,
+        custom_prompt: Optional[str],
+        color_scheme: Optional[str],
+        student_level: Optional[str],
+        collection_name: str,
+        source: Optional[str]
+    ) -> Dict[str, Any]:
+        """Uncached generate_research_mindmap; placeholder diagrams are marked "fallback": True."""
+        fallback = False
         try:
-            # Retrieval logic (optional)
-            context_text = ""
-            try:
-                vector_store = self.load_vector_store("default")
-                if vector_store:
-                    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
-                    docs = retriever.invoke(topic) if hasattr(retriever, "invoke") else []
-                    if docs:
-                        context_text = "\n\n".join([getattr(d, "page_content", "") for d in docs if hasattr(d, "page_content")])
-            except Exception as e:
-                logger.warning(f"Retrieval skipped: {e}")
+            # Digest or retrieval context (optional)
+            context_text, from_digest = await self.generation_context(topic, collection_name, source, k=4)
             
             # Build system prompt
             base_prompt = MINDMAP_PROMPT if diagram_type == "mindmap" else (
@@ -851,7 +1156,7 @@ class LangChainService:
             # Build user prompt
             user_prompt = f"Topic: {topic}\nDepth: {depth}\nDiagram type: {diagram_type}\n"
             if context_text:
-                user_prompt += f"Context: {context_text[:400]}...\n"
+                user_prompt += f"Context: {context_text}\n" if from_digest else f"Context: {context_text[:400]}...\n"
             user_prompt += "Generate the diagram now."
             
             # Call LLM
@@ -864,6 +1169,8 @@ class LangChainService:
             
             # Sanitize and validate for mindmap only
             if diagram_type == "mindmap":
+                # depth is a detail level; the tree may be as deep as that level's budget
+                _, max_depth = DETAIL_BUDGETS.get(depth, DETAIL_BUDGETS[3])
                 # Strip prefix commentary
                 mermaid_text = self._strip_to_first_mindmap(mermaid_text)
                 # Remove forbidden tokens
@@ -878,12 +1185,19 @@ class LangChainService:
                 RETRY_MAX = 1
                 attempt = 0
                 while attempt <= RETRY_MAX:
-                    if self._is_mindmap_valid(mermaid_text, max_depth=depth):
+                    if self._is_mindmap_valid(mermaid_text, max_depth=max_depth):
                         try:
-                            mermaid_text = self._sanitize_mindmap_strict(mermaid_text, topic, depth)
+                            mermaid_text = self._sanitize_mindmap_strict(mermaid_text, topic, max_depth)
                         except:
                             pass
                         break
+
+                    # Local repair first; regenerate only when it cannot fix the text
+                    local = repair_mermaid(mermaid_text, "mindmap", topic)
+                    if local.ok and self._is_mindmap_valid(local.code, max_depth=max_depth):
+                        logger.info(f"Repaired mindmap locally: {'; '.join(local.fixes)}")
+                        mermaid_text = local.code
+                        continue
                     
                     # Retry with strict prompt
                     attempt += 1
@@ -901,8 +1215,9 @@ class LangChainService:
                         break
                 
                 # Final fallback
-                if not self._is_mindmap_valid(mermaid_text, max_depth=depth):
+                if not self._is_mindmap_valid(mermaid_text, max_depth=max_depth):
                     logger.warning(f"Using fallback for {topic}")
+                    fallback = True
                     mermaid_text = (
                         f"mindmap\n  root(({topic}))\n"
                         "    Overview\n      Key points\n"
@@ -916,10 +1231,13 @@ class LangChainService:
             # Build theme vars
             theme_vars = self._get_theme_vars(color_scheme, student_level)
             
-            return {
+            result = {
                 "mermaidCode": mermaid_text,
                 "themeVars": theme_vars
             }
+            if fallback:
+                result["fallback"] = True
+            return result
             
         except Exception as e:
             logger.error(f"Mindmap generation failed: {e}")
@@ -928,7 +1246,8 @@ class LangChainService:
             # Return safe fallback
             return {
                 "mermaidCode": f"mindmap\n  root(({topic}))\n    Error\n      Generation failed\n",
-                "themeVars": {}
+                "themeVars": {},
+                "fallback": True
             }
     
     async def generate_quiz(
@@ -937,24 +1256,16 @@ class LangChainService:
         num_questions: int = 5,
         difficulty: str = "medium",
         custom_prompt: Optional[str] = None,
-        collection_name: str = "default"
+        collection_name: str = "default",
+        source: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        Generate a quiz from a topic (RAG enabled).
+        Generate a quiz from a topic (RAG enabled; digest of `source` when given).
         Returns list of question objects.
         """
         try:
-            # Retrieval logic
-            context_text = ""
-            try:
-                vector_store = self.load_vector_store(collection_name)
-                if vector_store:
-                    retriever = vector_store.as_retriever(search_kwargs={"k": 6})
-                    docs = retriever.invoke(topic)
-                    if docs:
-                        context_text = "\n\n".join([doc.page_content for doc in docs])
-            except Exception as e:
-                logger.warning(f"Quiz retrieval skipped: {e}")
+            # Digest of the requested document, else retrieved chunks
+            context_text, from_digest = await self.generation_context(topic, collection_name, source)
 
             system_prompt = (
                 "You are an expert educator. Create a high-quality quiz based on the topic and context provided.\n"
@@ -968,7 +1279,7 @@ class LangChainService:
 
             user_prompt = f"Topic: {topic}\nNumber of questions: {num_questions}\n"
             if context_text:
-                user_prompt += f"Context: {context_text[:1200]}\n"
+                user_prompt += f"Context: {context_text if from_digest else context_text[:1200]}\n"
             user_prompt += "Generate the JSON quiz now."
 
             messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
@@ -993,24 +1304,16 @@ class LangChainService:
         topic: str,
         count: int = 10,
         custom_prompt: Optional[str] = None,
-        collection_name: str = "default"
+        collection_name: str = "default",
+        source: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        Generate flashcards from a topic (RAG enabled).
+        Generate flashcards from a topic (RAG enabled; digest of `source` when given).
         Returns list of flashcard objects: {"front": "...", "back": "..."}
         """
         try:
-            # Retrieval logic
-            context_text = ""
-            try:
-                vector_store = self.load_vector_store(collection_name)
-                if vector_store:
-                    retriever = vector_store.as_retriever(search_kwargs={"k": 6})
-                    docs = retriever.invoke(topic)
-                    if docs:
-                        context_text = "\n\n".join([doc.page_content for doc in docs])
-            except Exception as e:
-                logger.warning(f"Flashcard retrieval skipped: {e}")
+            # Digest of the requested document, else retrieved chunks
+            context_text, from_digest = await self.generation_context(topic, collection_name, source)
 
             system_prompt = (
                 "You are an expert study assistant. Create effective flashcards for active recall.\n"
@@ -1023,7 +1326,7 @@ class LangChainService:
 
             user_prompt = f"Topic: {topic}\nNumber of cards: {count}\n"
             if context_text:
-                user_prompt += f"Context: {context_text[:1200]}\n"
+                user_prompt += f"Context: {context_text if from_digest else context_text[:1200]}\n"
             user_prompt += "Generate the JSON flashcards now."
 
             messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
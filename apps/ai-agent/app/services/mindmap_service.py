@@ -2,22 +2,44 @@
 Robust Mindmap & Diagram Service (Groq-compatible)
 
 Features:
-- topic normalization + diagram-type detection
+- local topic normalization + diagram-type detection (LLM only when unsure)
 - optional short research to improve labels
 - strict Mermaid-only generation prompt
-- validation & one automatic repair attempt
+- validation with the Mermaid parser (app.core.mermaid_parser)
+- local repair of invalid output (app.core.mermaid_repair); one LLM repair
+  attempt only when that fails
+- shared diagram cache (app.services.diagram_cache) in front of generation
+- on-demand expansion of one mindmap node (expand())
 - raises on final failure (no silent fallbacks)
+
+Modes:
+- "fast" (default): the research hints are folded into the generation
+  prompt, so a valid diagram takes a single LLM call; the repair call only
+  happens when that output fails validation.
+- "quality": a separate research call feeds the generation prompt.
 """
 
+import asyncio
 import json
 import re
 import logging
-from typing import Optional, Dict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
+from app.core.config import settings
 from app.core.llm import generate_response
+from app.core.mermaid_parser import HEADERS, header_kind, parse as parse_mermaid
+from app.core.mermaid_repair import RepairResult, clean_text, repair
+from app.core.mindmap_tree import DETAIL_BUDGETS, MAX_DETAIL, MindmapNode, MindmapTree, clean_label
+from app.services.diagram_cache import DiagramCache, cache_key, diagram_cache
+from app.services.topic_normalizer import TopicNormalizer, topic_normalizer
 
 logger = logging.getLogger(__name__)
 
+MODES = ("fast", "quality")
+
+# mindmaps are pruned to this many nodes (root included): the full-detail budget
+MAX_MINDMAP_NODES = DETAIL_BUDGETS[MAX_DETAIL][0]
+
 DIAGRAM_TYPES = {
     "mindmap": "mindmap",
     "flowchart": "flowchart TD",
@@ -127,9 +149,53 @@ GOLD_STANDARD_EXAMPLES = {
 # helper regexes
 _CODE_FENCE_RE = re.compile(r"```(?:[\s\S]*?)```", re.DOTALL)
 _JSON_RE = re.compile(r"\{[\s\S]*\}", re.DOTALL)
+# statements that make a diagram non-empty, per kind
+_CONTENT = {
+    "mindmap": ("node",),
+    "flowchart": ("node", "edge"),
+    "sequence": ("message",),
+    "class": ("class",),
+    "er": ("entity",),
+    "state": ("transition",),
+}
+
+# the research step of the quality pipeline, asked for inline instead of as a separate call
+_RESEARCH_HINTS = (
+    "Before writing, silently recall the 4-6 most important facts about the topic "
+    "and use them to choose accurate node labels. Do NOT output the facts."
+)
+
+
+def _stored_tree(value: Dict) -> MindmapTree:
+    """Tree of a cached mindmap; entries written before trees were stored are parsed from their code."""
+    if value.get("tree"):
+        return MindmapTree.from_dict(value["tree"])
+    return MindmapTree.from_mermaid(value.get("mermaid_code") or value.get("mermaidCode") or "")
+
+
+def _find_node(mindmap: MindmapTree, path: List[str]) -> Tuple[MindmapNode, List[str]]:
+    """(node, labels from the root down to it) at `path`; LookupError when a label is missing."""
+    node, branch = mindmap.root, [mindmap.root.label]
+    for label in path:
+        node = next((c for c in node.children if c.label.lower() == label.strip().lower()), None)
+        if node is None:
+            raise LookupError(f"no node {label!r} under {branch[-1]!r}")
+        branch.append(node.label)
+    return node, branch
 
 
 class MindmapService:
+    def __init__(
+        self,
+        llm: Callable[..., Awaitable[str]] = generate_response,
+        normalizer: Optional[TopicNormalizer] = None,
+        cache: Optional[DiagramCache] = diagram_cache,
+    ):
+        # async (prompt, system_prompt=...) -> str; every LLM call of the service goes through it
+        self.llm = llm
+        self.normalizer = normalizer or topic_normalizer
+        self.cache = cache  # None disables caching
+
     async def generate(
         self,
         topic: str,
@@ -137,29 +203,194 @@ class MindmapService:
         detail_level: int = 3,
         research: bool = True,
         custom_prompt: Optional[str] = None,
+        mode: str = "fast",
+        context: str = "",
+        fresh: bool = False,
     ) -> str:
         """
         Top-level method used by the FastAPI route.
+        `context` (e.g. a document digest) is passed to the generation prompt as-is.
+        Diagrams are cached per canonical topic, type, detail level, options and
+        context; fresh=True generates a new variant instead of reading the cache.
+        Mindmaps share one full-detail entry across detail levels and are pruned
+        to the requested level locally.
         Raises Exception on failure.
         """
+        result = await self.generate_diagram(
+            topic, diagram_type, detail_level, research, custom_prompt, mode, context, fresh
+        )
+        return result["mermaid_code"]
 
+    async def generate_diagram(
+        self,
+        topic: str,
+        diagram_type: Optional[str] = None,
+        detail_level: int = 3,
+        research: bool = True,
+        custom_prompt: Optional[str] = None,
+        mode: str = "fast",
+        context: str = "",
+        fresh: bool = False,
+    ) -> Dict:
+        """
+        generate(), returning {"mermaid_code", "diagram_type", "diagram_id"}.
+        `diagram_id` names the cache entry of a mindmap (None for other diagram
+        types or without a cache); expand() takes it.
+        """
         if not topic or not topic.strip():
             raise ValueError("Topic must be a non-empty string")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        fast = mode == "fast"
 
         # 1) Normalize: fix spelling, extract canonical topic & target diagram type
-        normalized = await self._normalize_topic_and_type(topic, diagram_type)
+        normalized = await self._normalize(topic, diagram_type)
         canonical_topic = normalized["topic"]
         diagram_key = normalized["diagram_type"]  # one of DIAGRAM_TYPES keys
+
+        # mindmaps are generated once at full detail; lower levels are pruned from that tree locally
+        mindmap = diagram_key == "mindmap"
+        level = MAX_DETAIL if mindmap else detail_level
+
+        async def build() -> Dict:
+            code = await self._generate_diagram(
+                canonical_topic, diagram_key, level, research, custom_prompt, fast, context
+            )
+            if mindmap:
+                return {
+                    "mermaid_code": code,
+                    "diagram_type": diagram_key,
+                    "tree": MindmapTree.from_mermaid(code, canonical_topic).to_dict(),
+                }
+            return {"mermaid_code": code, "diagram_type": diagram_key}
+
+        key = None
+        if self.cache is None:
+            value = await build()
+        else:
+            key = cache_key(
+                "mindmap_service", canonical_topic.lower(), diagram_key, level, mode, research,
+                custom_prompt or "", context.strip(),
+            )
+            value = await self.cache.get_or_generate(key, build, fresh)
+        code = value["mermaid_code"]
+        if mindmap:
+            code = self.at_detail(value.get("tree") or MindmapTree.from_mermaid(code).to_dict(), detail_level)
+        return {"mermaid_code": code, "diagram_type": diagram_key, "diagram_id": key if mindmap else None}
+
+    def at_detail(self, tree: Dict, detail_level: int) -> str:
+        """Mindmap of a full-detail tree (MindmapTree.to_dict()) at a lower detail level; sub-millisecond."""
+        return MindmapTree.from_dict(tree).at_detail(detail_level).to_mermaid()
+
+    # ---------------------------------------------------------------------
+    # Expansion: children of one mindmap node, spliced into the tree
+    # ---------------------------------------------------------------------
+    async def expand(
+        self,
+        path: List[str],
+        diagram_id: Optional[str] = None,
+        tree: Optional[Dict] = None,
+        max_children: int = 5,
+    ) -> Dict:
+        """
+        Generate children for the node at `path` (labels from below the root
+        down to the node) of a cached diagram (`diagram_id`) or of a given
+        `tree` (MindmapTree.to_dict()). One small prompt with the branch and
+        its current children; nodes already there are not repeated. A cached
+        diagram is updated in place, in one transaction on top of expansions
+        that landed meanwhile, so later requests include the expansion (lower
+        detail levels keep it only while it fits their budget).
+        Returns {"diagram_id", "path", "children", "tree", "mermaid_code"}.
+        Raises LookupError for an unknown diagram or path, ValueError for bad
+        input (including a diagram that is not a mindmap).
+        """
+        value = None
+        if diagram_id:
+            if self.cache is None:
+                raise LookupError("diagram cache is disabled; pass the tree instead")
+            value, _ = await asyncio.to_thread(self.cache.get, diagram_id)
+            if value is None:
+                raise LookupError(f"unknown or expired diagram: {diagram_id}")
+            code = value.get("mermaid_code") or value.get("mermaidCode") or ""
+            # entries written before the type was stored are judged by their header
+            kind = value.get("diagram_type") or value.get("diagramType") or header_kind(code.lstrip().split("\n", 1)[0])
+            if kind != "mindmap":
+                raise ValueError(f"only mindmaps can be expanded; diagram {diagram_id} is a {kind or 'unknown'} diagram")
+            tree = _stored_tree(value).to_dict()
+        if not tree:
+            raise ValueError("either diagram_id or tree is required")
+
+        mindmap = MindmapTree.from_dict(tree)
+        node, branch = _find_node(mindmap, path)
+
+        existing = [child.label for child in node.children]
+        prompt = f"""
+Mindmap topic: {mindmap.root.label}
+Branch: {" > ".join(branch)}
+Sub-topics it already has: {", ".join(existing) or "none"}
+
+List up to {max_children} more specific sub-topics of "{node.label}" that are not listed above.
+One per line, 1-4 words each, no numbering, no commentary.
+"""
+        out = await self.llm(prompt, system_prompt="Output only the sub-topic labels, one per line.")
+        seen = {label.lower() for label in existing}
+        children = []
+        for line in clean_text(out).splitlines():
+            label = clean_label(line, max_words=4)
+            if label and label.lower() not in seen and len(children) < max_children:
+                seen.add(label.lower())
+                children.append(MindmapNode(label))
+
+        def splice(current: Dict) -> Dict:
+            # applied to the entry as stored now, so concurrent expansions of the diagram all survive
+            latest = _stored_tree(current)
+            target, _ = _find_node(latest, path)
+            present = {child.label.lower() for child in target.children}
+            target.children.extend(child for child in children if child.label.lower() not in present)
+            current["tree"] = latest.to_dict()
+            current["mermaid_code" if "mermaid_code" in current else "mermaidCode"] = latest.to_mermaid()
+            return current
+
+        if value is not None and children:
+            updated = await asyncio.to_thread(self.cache.update, diagram_id, splice)
+            if updated is not None:
+                mindmap = MindmapTree.from_dict(updated["tree"])
+            else:
+                node.children.extend(children)  # the entry expired meanwhile
+        else:
+            node.children.extend(children)
+        code = mindmap.to_mermaid()
+        return {
+            "diagram_id": diagram_id,
+            "path": branch[1:],
+            "children": [child.to_dict() for child in children],
+            "tree": mindmap.to_dict(),
+            "mermaid_code": code,
+        }
+
+    async def _generate_diagram(
+        self,
+        canonical_topic: str,
+        diagram_key: str,
+        detail_level: int,
+        research: bool,
+        custom_prompt: Optional[str],
+        fast: bool,
+        context: str,
+    ) -> str:
+        """Research, generate, validate and repair one diagram (steps 2-7); raises when no valid one comes out."""
         mermaid_keyword = DIAGRAM_TYPES[diagram_key]
 
-        # 2) Optional research to improve node labels
-        research_text = ""
-        if research:
+        # 2) Optional research to improve node labels (folded into the prompt in fast mode)
+        research_text = context.strip()
+        if research and fast:
+            research_text = "\n".join(filter(None, (_RESEARCH_HINTS, research_text)))
+        elif research:
             try:
-                research_text = await self._short_research(canonical_topic)
+                bullets = await self._short_research(canonical_topic)
+                research_text = "\n".join(filter(None, (bullets, research_text)))
             except Exception as e:
                 logger.debug("Research step failed: %s", e)
-                research_text = ""
 
         # 3) Generate strict Mermaid code
         mermaid = await self._generate_strict_mermaid(
@@ -172,18 +403,29 @@ class MindmapService:
 
         # 4) Validate
         if self._is_valid(mermaid, mermaid_keyword, detail_level):
+            await asyncio.to_thread(self.normalizer.observe, canonical_topic)
             return mermaid
 
-        # 5) Attempt one repair / regeneration
-        logger.warning("Mermaid invalid on first attempt; trying repair/regenerate.")
+        # 5) Local repair; the LLM repair call is the last resort
+        expected = HEADERS[mermaid_keyword.split()[0]]
+        local = repair(mermaid or "", expected, canonical_topic)
+        if local.ok and self._is_valid(local.code, mermaid_keyword, detail_level):
+            logger.info("Repaired Mermaid locally: %s", "; ".join(local.fixes))
+            await asyncio.to_thread(self.normalizer.observe, canonical_topic)
+            return local.code
+        await asyncio.to_thread(self._log_repair_miss, expected, mermaid or "", local)
+
+        # 6) Attempt one LLM repair / regeneration
+        logger.warning("Mermaid invalid after local repair; trying LLM repair/regenerate.")
         repaired = await self._repair_mermaid(
             mermaid or "", canonical_topic, mermaid_keyword, detail_level, custom_prompt
         )
 
         if self._is_valid(repaired, mermaid_keyword, detail_level):
+            await asyncio.to_thread(self.normalizer.observe, canonical_topic)
             return repaired
 
-        # 6) Final failure
+        # 7) Final failure
         logger.error("Failed to produce valid Mermaid after retry. Raw outputs: first=%r repaired=%r", mermaid, repaired)
         raise RuntimeError("Could not generate a valid Mermaid diagram (see server logs).")
 
@@ -216,7 +458,7 @@ Rules:
 {{"topic": "Investment Banking", "diagram_type": "mindmap"}}
 """
 
-        raw = await generate_response(prompt, system_prompt="You are a concise JSON-only normalizer.")
+        raw = await self.llm(prompt, system_prompt="You are a concise JSON-only normalizer.")
         # extract JSON substring
         m = _JSON_RE.search(raw)
         if not m:
@@ -229,7 +471,10 @@ Rules:
             parsed = json.loads(m.group(0))
             topic_out = parsed.get("topic", "").strip()
             dtype = parsed.get("diagram_type", "").strip().lower()
-            if not topic_out:
+            if topic_out:
+                # an LLM-corrected topic may add its words to the local spelling dictionary
+                await asyncio.to_thread(self.normalizer.observe, topic_out, True)
+            else:
                 topic_out = self._clean_label(raw_topic)
             if dtype not in DIAGRAM_TYPES:
                 dtype = self._infer_type_from_hint(requested_type_hint, raw_topic)
@@ -239,30 +484,23 @@ Rules:
             dtype = self._infer_type_from_hint(requested_type_hint, raw_topic)
             return {"topic": topic_clean, "diagram_type": dtype}
 
+    async def _normalize(self, raw_topic: str, requested_type: Optional[str]) -> Dict[str, str]:
+        """Local normalization; the LLM normalizer only runs when the spelling or diagram type is uncertain."""
+        local = self.normalizer.normalize(raw_topic, requested_type)
+        if local.confidence >= settings.topic_confidence_threshold:
+            return {"topic": local.topic, "diagram_type": local.diagram_type}
+        logger.debug("Low-confidence normalization of %r (%.2f); asking the LLM", raw_topic, local.confidence)
+        return await self._normalize_topic_and_type(raw_topic, requested_type)
+
     def _infer_type_from_hint(self, hint: str, raw_topic: str) -> str:
-        # small deterministic heuristics
-        if hint in DIAGRAM_TYPES:
-            return hint
-        lowered = raw_topic.lower()
-        if "flow" in lowered or "process" in lowered or "workflow" in lowered:
-            return "flowchart"
-        if "sequence" in lowered or "timeline" in lowered or "interaction" in lowered:
-            return "sequence"
-        if "class" in lowered or "uml" in lowered:
-            return "class"
-        if "er" in lowered or "entity" in lowered or "schema" in lowered or "database" in lowered:
-            return "er"
-        if "state" in lowered or "state machine" in lowered:
-            return "state"
-        # default
-        return "mindmap"
+        return self.normalizer.classify(raw_topic, hint)[0]
 
     # ---------------------------------------------------------------------
     # Optional short research to help LLM pick labels (4 short facts)
     # ---------------------------------------------------------------------
     async def _short_research(self, topic: str) -> str:
         prompt = f"Provide 4 very short factual bullets (one line each) about: {topic}. No explanations."
-        out = await generate_response(prompt, system_prompt="Provide 4 short factual bullets only.")
+        out = await self.llm(prompt, system_prompt="Provide 4 short factual bullets only.")
         # strip code fences and return up to ~600 chars
         out = _CODE_FENCE_RE.sub("", out).strip()
         return out[:800]
@@ -321,7 +559,7 @@ Gold Standard Example (follow this structure and quality):
 Now output the Mermaid diagram for the topic. Begin with the {mermaid_keyword} line and nothing else.
 """
 
-        raw = await generate_response(user_prompt, system_prompt="You are strict: output only valid mermaid code.")
+        raw = await self.llm(user_prompt, system_prompt="You are strict: output only valid mermaid code.")
         return self._extract_mermaid(raw, mermaid_keyword, safe_topic)
 
     # ---------------------------------------------------------------------
@@ -331,10 +569,8 @@ Now output the Mermaid diagram for the topic. Begin with the {mermaid_keyword} l
         if not raw:
             return ""
 
-        # remove fenced code blocks
-        cleaned = _CODE_FENCE_RE.sub("", raw).strip()
-        # strip any internal <think>...</think> blocks that may have leaked through
-        cleaned = re.sub(r"<think>[\s\S]*?<\/think>", "", cleaned, flags=re.IGNORECASE).strip()
+        # unwrap fenced code blocks and strip <think>...</think> blocks that leaked through
+        cleaned = clean_text(raw).strip()
 
         # look for the first line that starts with the mermaid keyword
         lines = [l.rstrip() for l in cleaned.splitlines()]
@@ -393,85 +629,40 @@ ORIGINAL:
 
 Return the corrected Mermaid code only.
 """
-        out = await generate_response(prompt, system_prompt="Fix Mermaid code and output only the corrected code.")
+        out = await self.llm(prompt, system_prompt="Fix Mermaid code and output only the corrected code.")
         return self._extract_mermaid(out, mermaid_keyword, self._clean_label(topic))
 
+    def _log_repair_miss(self, kind: str, raw: str, result: RepairResult):
+        """Append an output the local repair could not fix to settings.mermaid_repair_log."""
+        if not settings.mermaid_repair_log:
+            return
+        errors = [f"{e.line}:{e.column} {e.code}" for e in result.diagram.errors]
+        try:
+            with open(settings.mermaid_repair_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"kind": kind, "raw": raw, "errors": errors}) + "\n")
+        except OSError as e:
+            logger.debug("Could not write the Mermaid repair log: %s", e)
+
     # ---------------------------------------------------------------------
     # Validation: diagram-specific checks
     # ---------------------------------------------------------------------
     def _is_valid(self, code: str, mermaid_keyword: str, detail_level: int) -> bool:
         if not code or not code.strip():
             return False
-        lines = [l.rstrip() for l in code.splitlines() if l.strip()]
-
-        if not lines:
+        diagram = parse_mermaid(code)
+        expected = HEADERS[mermaid_keyword.split()[0]]
+        if diagram.kind != expected:
+            logger.debug("Validation failed: expected a %s diagram, got %r", expected, diagram.header)
             return False
-        # first line must match keyword
-        if lines[0].strip() != mermaid_keyword:
-            logger.debug("Validation failed: first line not keyword (%r != %r)", lines[0].strip(), mermaid_keyword)
+        if diagram.errors:
+            logger.debug("Validation failed: %s", diagram.errors[0])
             return False
 
-        # general no-HTML check
-        if re.search(r"<\/?\w+>", code):
-            logger.debug("Validation failed: HTML-like tags found")
+        # the diagram must have content of its kind (a mindmap needs a root and a child)
+        content = diagram.of(*_CONTENT[expected])
+        if len(content) < (2 if expected == "mindmap" else 1):
+            logger.debug("Validation failed: %s diagram has no %s", expected, "/".join(_CONTENT[expected]))
             return False
-
-        # must have at least 2 non-empty lines
-        if len(lines) < 2:
-            logger.debug("Validation failed: too few lines")
-            return False
-
-        body = "\n".join(lines[1:])
-
-        # diagram-specific heuristics
-        if mermaid_keyword == "mindmap":
-            # root should exist
-            if not re.search(r"root\(\(", body, flags=re.IGNORECASE):
-                logger.debug("Validation failed: mindmap missing root")
-                return False
-            # basic indentation sanity: at least one child with indentation
-            if not re.search(r"^\s{2,}\S", body, flags=re.MULTILINE):
-                logger.debug("Validation failed: mindmap missing indented nodes")
-                return False
-            return True
-
-        if mermaid_keyword.startswith("flowchart"):
-            if not re.search(r"-->|->", body):
-                logger.debug("Validation failed: flowchart missing arrows")
-                return False
-            return True
-
-        if mermaid_keyword == "sequenceDiagram":
-            if not re.search(r"participant\s+\w+", body):
-                logger.debug("Validation failed: sequence missing participants")
-                return False
-            if not re.search(r"-->|->>|-->>", body):
-                # sequence uses ->> and -->> patterns
-                # accept single arrow too
-                logger.debug("Validation failed: sequence missing message arrows")
-                return False
-            return True
-
-        if mermaid_keyword == "classDiagram":
-            if not re.search(r"class\s+\w+", body):
-                logger.debug("Validation failed: classDiagram missing class")
-                return False
-            return True
-
-        if mermaid_keyword == "erDiagram":
-            if not re.search(r"\b[A-Z0-9_]+\s*\{", body):
-                # look for entity blocks like NAME {
-                logger.debug("Validation failed: erDiagram missing entity block")
-                return False
-            return True
-
-        if mermaid_keyword == "stateDiagram-v2":
-            if not re.search(r"-->|--\>|->", body):
-                logger.debug("Validation failed: state diagram missing transitions")
-                return False
-            return True
-
-        # default accept if first line matched and there are content lines
         return True
 
     # ---------------------------------------------------------------------
@@ -485,134 +676,17 @@ Return the corrected Mermaid code only.
 
     def _postprocess_mermaid(self, candidate: str, safe_topic: str) -> str:
         """
-        Clean and normalize a mindmap Mermaid block.
-        - remove stray prose and <think> blocks
-        - ensure first line is exactly 'mindmap'
-        - ensure a single canonical root `root((Label))`
-        - normalize indentation to 2 spaces per level
-        - sanitize labels (1-4 words, no special chars)
-        - prune deepest nodes until total nodes between 12-18 (prefer 12-18)
+        Normalize a mindmap through the tree form (app.core.mindmap_tree):
+        a single root, 2-space levels, labels of 1-4 words and at most
+        MAX_MINDMAP_NODES nodes. Mindmaps written as edges are rebuilt as a
+        tree by the local repair first.
         """
         if not candidate:
             return candidate
+        repaired = repair(candidate, "mindmap", safe_topic)
+        tree = MindmapTree.from_mermaid(repaired.code if repaired.ok else candidate, safe_topic)
+        return tree.clean_labels(max_words=4).prune(MAX_MINDMAP_NODES).to_mermaid()
 
-        # remove any residual <think>...</think>
-        candidate = re.sub(r"<think>[\s\S]*?<\/think>", "", candidate, flags=re.IGNORECASE).strip()
-
-        lines = [l.rstrip() for l in candidate.splitlines() if l.strip()]
-        if not lines:
-            return candidate
 
-        # enforce header
-        header = lines[0].strip()
-        if header.lower() != "mindmap":
-            lines[0] = "mindmap"
-
-        body_lines = lines[1:]
-
-        # normalize leading whitespace and sanitize labels
-        norm_lines = []
-        for ln in body_lines:
-            # trim
-            raw = ln.rstrip()
-            # remove leading non-space tokens before indentation (injected prose)
-            m = re.match(r"^(\s*)(.*)$", raw)
-            indent = m.group(1) if m else ""
-            text = m.group(2) if m else raw
-
-            # strip numeric bullets or prefixes like '1.' or '1)'
-            text = re.sub(r"^\s*\d+[\).\-:]?\s*", "", text)
-
-            # sanitize label: remove parentheses around non-root nodes
-            text = text.strip()
-            # If this line is a root declaration, keep inside later
-            # compute approximate level by counting spaces (2 spaces = 1 level)
-            level = max(0, len(indent) // 2)
-
-            # sanitize label content to 1-4 words, no special chars
-            label = re.sub(r"[^A-Za-z0-9\s\-()]", " ", text)
-            label_parts = [p for p in label.split() if p]
-            # if this looks like a root((...)) keep content inside parentheses
-            root_match = re.match(r"root\(\((.*?)\)\)", text, flags=re.IGNORECASE)
-            if root_match:
-                label = root_match.group(1)
-
-            label = " ".join(label_parts[:4])
-            label = label.strip() or "Node"
-
-            norm_lines.append((level, label))
-
-        # ensure there is a root - if first node is not root, promote first node as root
-        if not any(lbl.lower().startswith("root((") or lbl.lower().startswith("root(") for _, lbl in norm_lines):
-            # create a root with safe_topic
-            root_label = safe_topic or "Topic"
-            # insert at top
-            norm_lines.insert(0, (0, root_label))
-
-        # Now build a list of node entries (excluding header) with levels
-        # If first element has level >0, normalize it to 0 (root)
-        if norm_lines and norm_lines[0][0] > 0:
-            norm_lines[0] = (0, norm_lines[0][1])
-
-        # Count nodes and prune deepest nodes if too many
-        def count_nodes(entries):
-            return len(entries)
-
-        total = count_nodes(norm_lines)
-        # desired range
-        MIN_NODES = 12
-        MAX_NODES = 18
-
-        # If too few nodes, we won't invent nodes here — leave to LLM generation
-        # If too many, prune deepest nodes first
-        if total > MAX_NODES:
-            # sort candidate indices by (level desc, index desc) and remove until <= MAX_NODES
-            indices = list(range(len(norm_lines)))
-            # compute levels
-            levels = [lvl for lvl, _ in norm_lines]
-            # create prioritized list of indices to remove (deepest, later ones first)
-            removable = sorted(indices, key=lambda i: (levels[i], i), reverse=True)
-            to_remove = []
-            while total - len(to_remove) > MAX_NODES and removable:
-                idx = removable.pop(0)
-                # never remove root (index 0)
-                if idx == 0:
-                    continue
-                to_remove.append(idx)
-
-            # remove by building new list
-            norm_lines = [entry for i, entry in enumerate(norm_lines) if i not in set(to_remove)]
-
-        # Re-normalize levels to avoid level gaps: ensure each level >0 has a parent at level-1 earlier
-        cleaned = []
-        parent_levels = {0: True}
-        for lvl, lbl in norm_lines:
-            # clamp level to non-negative
-            l = max(0, lvl)
-            # if no parent exists for this level, reduce level until it has a parent
-            while l > 0 and not any(pl < l for pl in parent_levels.keys()):
-                l -= 1
-            cleaned.append((l, lbl))
-            parent_levels[l] = True
-
-        # Compose mermaid lines: header + root + children
-        out_lines = ["mindmap"]
-
-        # First line should be root((Label))
-        root_label = cleaned[0][1] if cleaned else (safe_topic or "Topic")
-        root_label = re.sub(r"[^A-Za-z0-9\s\-]", " ", root_label).strip()
-        root_label = " ".join(root_label.split()[:4]) or "Topic"
-        out_lines.append(f"  root(({root_label}))")
-
-        # Add remaining nodes with normalized indentation (2 spaces per level)
-        for lvl, lbl in cleaned[1:]:
-            # sanitize label
-            lab = re.sub(r"[^A-Za-z0-9\s\-]", " ", lbl).strip()
-            lab = " ".join(lab.split()[:4]) or "Node"
-            indent = "  " * (lvl + 1)  # children of root start at level 1 (two spaces)
-            out_lines.append(f"{indent}{lab}")
-
-        return "\n".join(out_lines)
-
-    # exported instance
+# exported instance
 mindmap_service = MindmapService()
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Async batched Pinecone ingestion writer.
+
+Chunks are embedded in provider-sized batches and upserted concurrently under a
+semaphore, so a large document neither blocks the event loop nor waits on one
+serial round trip per batch. Failed batches are retried with jittered backoff.
+`write_stream` does the same for batches produced on the fly by a pipeline.
+All writes share one set of slots, handed out by batch priority under load.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+logger = logging.getLogger(__name__)
+
+# PineconeVectorStore reads chunk text back from this metadata key
+TEXT_KEY = "text"
+
+
+class PrioritySlots:
+    """
+    Concurrency limit shared by every write of a writer. When slots are
+    contended, waiting batches are admitted lowest priority value first
+    (FIFO within a priority), so urgent work overtakes bulk backfill.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future  # resolved by release(), which hands its slot over
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # slot was handed over just as we were cancelled
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class PineconeWriter:
+    """Embed and upsert documents into a Pinecone index with bounded concurrency."""
+
+    def __init__(
+        self,
+        index,
+        embeddings,
+        embed_batch_size: int = 100,
+        upsert_batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+    ):
+        self.index = index
+        self.embeddings = embeddings
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(1, max_retries)
+        self.slots = PrioritySlots(self.max_concurrency)
+
+    def _retrying(self) -> AsyncRetrying:
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.max_retries),
+            wait=wait_random_exponential(multiplier=0.5, max=20),
+            retry=retry_if_exception_type(Exception),
+            reraise=True,
+        )
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        async for attempt in self._retrying():
+            with attempt:
+                return await self.embeddings.aembed_documents(texts)
+
+    async def _upsert(self, vectors: List[dict], namespace: str):
+        async for attempt in self._retrying():
+            with attempt:
+                # pinecone client is sync; keep it off the event loop
+                await asyncio.to_thread(self.index.upsert, vectors=vectors, namespace=namespace)
+
+    async def _write_batch(
+        self,
+        documents: List[Document],
+        ids: List[str],
+        namespace: str,
+        on_done: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        values = await self._embed([d.page_content for d in documents])
+        vectors = [
+            {
+                "id": vid,
+                "values": vec,
+                "metadata": {**(doc.metadata or {}), TEXT_KEY: doc.page_content},
+            }
+            for vid, vec, doc in zip(ids, values, documents)
+        ]
+        for start in range(0, len(vectors), self.upsert_batch_size):
+            await self._upsert(vectors[start:start + self.upsert_batch_size], namespace)
+        if on_done:
+            await on_done(len(vectors))
+
+    async def _write_limited(self, *args):
+        await self.slots.acquire(0)
+        try:
+            await self._write_batch(*args)
+        finally:
+            self.slots.release()
+
+    async def write(
+        self,
+        documents: List[Document],
+        namespace: str,
+        ids: Optional[List[str]] = None,
+        progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> List[str]:
+        """
+        Embed and upsert `documents`; returns the vector ids in input order.
+        `progress(done, total)` is awaited after each batch is written.
+        """
+        if not documents:
+            return []
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in documents]
+        if len(ids) != len(documents):
+            raise ValueError("ids and documents must have the same length")
+
+        written = 0
+
+        async def on_done(count: int):
+            nonlocal written
+            written += count
+            if progress:
+                await progress(written, len(documents))
+
+        step = self.embed_batch_size
+        await asyncio.gather(*[
+            self._write_limited(documents[i:i + step], ids[i:i + step], namespace, on_done)
+            for i in range(0, len(documents), step)
+        ])
+        logger.info("PineconeWriter: upserted %d vectors to namespace %s", len(ids), namespace)
+        return ids
+
+    async def write_stream(
+        self,
+        batches: AsyncIterator[Tuple[List[Document], List[str]]],
+        namespace: str,
+        progress: Optional[Callable[[int], Awaitable[None]]] = None,
+        on_batch: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+        priority: Optional[Callable[[List[Document]], int]] = None,
+    ) -> int:
+        """
+        Embed and upsert (documents, ids) batches as the producer yields them,
+        sharing the writer's max_concurrency slots with every other write. The
+        next batch is only pulled once it has a slot, so a fast producer waits
+        instead of piling up chunks. `priority(documents)` ranks a batch for a
+        slot (lower first, default 0). `progress(written)` and `on_batch(ids)`
+        are awaited after each batch; returns vectors written.
+        """
+        written = 0
+
+        async def run(documents: List[Document], ids: List[str]):
+            nonlocal written
+            try:
+                await self._write_batch(documents, ids, namespace)
+            finally:
+                self.slots.release()
+            written += len(ids)
+            if on_batch:
+                await on_batch(ids)
+            if progress:
+                await progress(written)
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                async for documents, ids in batches:
+                    await self.slots.acquire(priority(documents) if priority else 0)
+                    tasks.create_task(run(documents, ids))
+        except ExceptionGroup as group:
+            raise group.exceptions[0]  # a failed batch cancels the rest; report its own error
+        if written:
+            logger.info("PineconeWriter: upserted %d vectors to namespace %s", written, namespace)
+        return written
+
+    async def delete(self, ids: List[str], namespace: str, batch_size: int = 1000):
+        """Delete vectors by id (Pinecone accepts at most 1000 ids per call)."""
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            async for attempt in self._retrying():
+                with attempt:
+                    await asyncio.to_thread(self.index.delete, ids=batch, namespace=namespace)
+        if ids:
+            logger.info("PineconeWriter: deleted %d vectors from namespace %s", len(ids), namespace)
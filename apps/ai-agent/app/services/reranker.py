@@ -0,0 +1,135 @@
+"""
+Local lightweight reranker for over-fetched retrieval candidates.
+
+Scores each candidate chunk with a blend of
+  - cosine similarity between the query vector and the chunk vector,
+  - BM25 over the query terms, with the candidate set as the corpus,
+and then picks the final top-k greedily with a per-source diversity penalty.
+Everything is plain NumPy over vectors that came back with the candidates,
+so reranking costs no provider calls. Work is capped: only the first
+`max_candidates` candidates (in retrieval order) are scored, which bounds the
+cosine and diversity passes, and candidates are tokenized against a per-query
+CPU budget; when that runs out, the BM25 term is dropped.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokenize(text: str, limit: int) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())[:limit]
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    span = float(x.max() - x.min()) if x.size else 0.0
+    if span <= 1e-12:
+        return np.zeros_like(x)
+    return (x - x.min()) / span
+
+
+class LocalReranker:
+    def __init__(
+        self,
+        cosine_weight: float = 0.6,
+        bm25_weight: float = 0.4,
+        diversity_penalty: float = 0.15,
+        budget_ms: float = 20.0,
+        max_candidates: int = 100,
+        max_terms_per_doc: int = 400,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.cosine_weight = cosine_weight
+        self.bm25_weight = bm25_weight
+        self.diversity_penalty = diversity_penalty
+        self.budget_ms = budget_ms
+        self.max_candidates = max_candidates
+        self.max_terms_per_doc = max_terms_per_doc
+        self.k1 = k1
+        self.b = b
+
+    def cosine(self, query_vector: Sequence[float], vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        return matrix @ query / np.where(norms == 0, 1.0, norms)
+
+    def bm25(self, query: str, doc_tokens: List[List[str]]) -> np.ndarray:
+        terms = list(dict.fromkeys(_tokenize(query, 64)))
+        if not terms or not doc_tokens:
+            return np.zeros(len(doc_tokens), dtype=np.float32)
+
+        tf = np.zeros((len(doc_tokens), len(terms)), dtype=np.float32)
+        for row, tokens in enumerate(doc_tokens):
+            counts = Counter(tokens)
+            tf[row] = [counts.get(t, 0) for t in terms]
+
+        n = len(doc_tokens)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        lengths = np.array([len(t) for t in doc_tokens], dtype=np.float32)
+        avg = float(lengths.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg)
+        return (idf * tf * (self.k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+    def rerank(
+        self,
+        query: str,
+        query_vector: Sequence[float],
+        docs: List[Any],
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 4,
+        sources: Optional[List[str]] = None,
+    ) -> List[int]:
+        """
+        Return indices into `docs` of the best `top_k` candidates, best first.
+        `docs` only need a `page_content` attribute; `sources` defaults to
+        each doc's metadata["source"]. Candidates past `max_candidates` are not
+        considered.
+        """
+        docs = docs[: self.max_candidates]
+        vectors = vectors[: len(docs)]
+        if not docs:
+            return []
+        if len(docs) <= top_k and not self.diversity_penalty:
+            return list(range(len(docs)))
+
+        started = time.perf_counter()
+        deadline = started + self.budget_ms / 1000
+        scores = self.cosine_weight * _minmax(self.cosine(query_vector, vectors))
+
+        doc_tokens: List[List[str]] = []
+        for d in docs:
+            if time.perf_counter() > deadline:
+                logger.debug("Rerank budget exceeded after %d of %d candidates; skipping BM25", len(doc_tokens), len(docs))
+                break
+            doc_tokens.append(_tokenize(getattr(d, "page_content", "") or "", self.max_terms_per_doc))
+        else:
+            scores = scores + self.bm25_weight * _minmax(self.bm25(query, doc_tokens))
+
+        if sources is None:
+            sources = [str((getattr(d, "metadata", None) or {}).get("source", i)) for i, d in enumerate(docs)]
+        sources = sources[: len(docs)]
+
+        # greedy selection with a penalty per already-selected chunk from the same source
+        source_ids = np.unique(np.asarray(sources, dtype=object), return_inverse=True)[1]
+        selected: List[int] = []
+        remaining = scores.astype(np.float64).copy()
+        for _ in range(min(top_k, len(docs))):
+            best = int(np.argmax(remaining))
+            selected.append(best)
+            remaining[best] = -np.inf
+            remaining[source_ids == source_ids[best]] -= self.diversity_penalty
+
+        logger.debug("Reranked %d candidates in %.2f ms", len(docs), (time.perf_counter() - started) * 1000)
+        return selected
+
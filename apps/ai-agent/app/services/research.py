@@ -8,6 +8,7 @@ from bs4 import BeautifulSoup
 from readability import Document
 
 from app.core.vector_store import get_vector_store
+from app.core.text_splitter import get_text_splitter
 from app.core.llm import get_llm
 
 
@@ -93,11 +94,7 @@ async def ingest_search_results(query: str, num_results: int = 5) -> List[Dict[s
         if not text or len(text) < 200:
             continue
 
-        # Chunk text (simple strategy)
-        chunk_size = 700
-        chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-
-        for c in chunks:
+        for c in get_text_splitter().split_text(text):
             meta = {
                 "source": url,
                 "title": r["title"],
@@ -0,0 +1,347 @@
+"""
+Local topic normalization: spelling correction, title casing and diagram-type
+classification, in place of an LLM round trip.
+
+Diagram type comes from explicit hints ("er diagram", "as a flowchart", the
+requested type) and otherwise from per-type keyword weights over the topic's
+words; confidence is the winning score's share of the top two. Type names
+that are subjects in their own right ("Finite State Machine") only count as
+a request with a connector ("as a state machine", "state machine of ..."). Spelling is
+corrected against a word-frequency dictionary built from the vocabulary of
+ingested documents and from topics the LLM normalizer confirmed, with
+symmetric-delete lookup (SymSpell): the deletes of every dictionary word are
+indexed once, so a lookup is a few dozen dict probes and a handful of
+edit-distance checks. A word is only rewritten into a dictionary word that is
+frequent enough for the edit distance, and every correction lowers the
+confidence.
+
+Callers fall back to the LLM normalizer when `confidence` (the lower of the
+type and spelling confidences) is below settings.topic_confidence_threshold.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.sqlite_store import SQLiteStore
+from app.services.digest_service import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_KEYS = ("mindmap", "flowchart", "sequence", "class", "er", "state")
+
+_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9'+#-]*|\d+")
+
+# requests that name the diagram itself ("er diagram", "flowchart"): removed from the topic once matched
+_EXPLICIT = (
+    ("mindmap", re.compile(r"\bmind[\s-]?maps?\b", re.I)),
+    ("flowchart", re.compile(r"\bflow[\s-]?charts?\b|\bflow\s+diagrams?\b|\bactivity\s+diagrams?\b", re.I)),
+    ("sequence", re.compile(r"\bsequence\s*diagrams?\b", re.I)),
+    ("class", re.compile(r"\b(?:uml\s+)?class\s*diagrams?\b", re.I)),
+    ("er", re.compile(r"\berds?\b|\b(?:er|entity[\s-]+relationship)\s*diagrams?\b", re.I)),
+    ("state", re.compile(r"\bstate\s*(?:diagrams?|charts?)\b|\bstatediagram(?:-v2)?\b", re.I)),
+)
+# type names that are also subjects ("Finite State Machine", "Entity Relationship Model", "ER visits"):
+# a request only when introduced by "as (a)" or followed by "of"/"for", else left to the keyword weights
+_NAMED_TYPES = (
+    ("er", r"er|entity[\s-]+relationship(?:\s+model)?"),
+    ("state", r"(?:finite\s+)?state\s*machines?"),
+)
+_NAMED = tuple(
+    (
+        dtype,
+        re.compile(name, re.I),  # the requested type on its own (fullmatch)
+        re.compile(rf"\bas\s+(?:an?\s+)?(?:{name})\b|\b(?:{name})(?=\s+(?:of|for)\b)", re.I),
+    )
+    for dtype, name in _NAMED_TYPES
+)
+_GENERIC_HINT = re.compile(r"\b(?:diagram|chart|graph|visuali[sz]ation)s?\b", re.I)
+_CONNECTORS = frozenset("a an as of for about on showing show make draw create generate the to in".split())
+
+# evidence for a diagram type from the topic's own words
+KEYWORD_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "mindmap": {"overview": 2, "concepts": 1.5, "introduction": 1.5, "summary": 1.5, "types": 1, "history": 1,
+                "principles": 1, "branches": 1},
+    "flowchart": {"flow": 2, "flowchart": 3, "process": 2, "processes": 2, "workflow": 3, "workflows": 3,
+                  "procedure": 2, "steps": 2, "step": 1.5, "algorithm": 2, "pipeline": 2, "decision": 1.5,
+                  "processing": 1.5, "how": 1, "troubleshooting": 2},
+    "sequence": {"sequence": 2.5, "interaction": 2, "interactions": 2, "handshake": 3, "request": 1.5,
+                 "response": 1.5, "protocol": 1.5, "messages": 1.5, "api": 1, "oauth": 2, "login": 1,
+                 "authentication": 1.5, "timeline": 1.5, "call": 1},
+    "class": {"class": 2, "classes": 2, "uml": 3, "inheritance": 3, "oop": 3, "object-oriented": 3,
+              "polymorphism": 2, "interface": 1.5, "interfaces": 1.5, "hierarchy": 1},
+    "er": {"er": 1, "erd": 4, "entity": 3, "entities": 3, "schema": 2.5, "database": 2.5, "relational": 2.5,
+           "tables": 1.5, "table": 1, "sql": 2, "foreign": 1.5, "normalization": 1},
+    "state": {"state": 1, "states": 1, "lifecycle": 2.5, "transition": 2, "transitions": 2.5, "fsm": 4,
+              "automaton": 3, "automata": 3, "machine": 1},
+}
+MINDMAP_PRIOR = 1.0
+EXPLICIT_WEIGHT = 10.0
+
+_MINOR_WORDS = frozenset("a an and as at but by for from in into of on or the to vs via with".split())
+
+
+class Normalized(NamedTuple):
+    topic: str
+    diagram_type: str
+    confidence: float
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    out, frontier = set(), {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count 1), or limit + 1 past `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def title_case(words: List[str]) -> str:
+    out = []
+    for i, word in enumerate(words):
+        if word.isupper() or any(c.isupper() for c in word[1:]) or not word[:1].isalpha():
+            out.append(word)  # acronyms, camelCase names, numbers
+        elif i and word.lower() in _MINOR_WORDS:
+            out.append(word.lower())
+        else:
+            out.append(word[:1].upper() + word[1:].lower())
+    return " ".join(out)
+
+
+class TopicVocabulary(SQLiteStore):
+    """Word frequencies for spelling correction, shared by every worker process."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS vocabulary (word TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    )
+
+    def add(self, counts: Mapping[str, int]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO vocabulary (word, count) VALUES (?, ?)"
+                " ON CONFLICT(word) DO UPDATE SET count = count + excluded.count",
+                list(counts.items()),
+            )
+
+    def load(self, limit: int) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT word, count FROM vocabulary ORDER BY count DESC LIMIT ?", (limit,))
+            return dict(rows.fetchall())
+
+
+class SpellingCorrector:
+    """
+    Symmetric-delete spelling correction over a word-frequency dictionary.
+
+    A dictionary word replaces an unknown word at edit distance d only when it
+    occurred at least min_count * margin ** (d - 1) times, so rare words
+    (a typo recorded once, a keyword seed) only ever fix single-edit typos.
+    """
+
+    def __init__(self, max_distance: int = 2, min_count: int = 3, margin: int = 4, min_length: int = 5,
+                 cache_size: int = 10000):
+        self.max_distance = max_distance
+        self.min_count = min_count
+        self.margin = margin
+        self.min_length = min_length  # shorter words have too many neighbours to correct safely
+        self.cache_size = cache_size
+        self.counts: Counter = Counter()
+        self.known: Set[str] = set()  # accepted as spelled, never suggested
+        self._index: Dict[str, List[str]] = {}
+        self._cache: Dict[str, Tuple[str, float]] = {}
+
+    def _distance(self, word: str) -> int:
+        return 1 if len(word) <= 5 else self.max_distance
+
+    def add(self, counts: Mapping[str, int]):
+        for word, count in counts.items():
+            if word not in self.counts and len(word) >= self.min_length:
+                for variant in _deletes(word, self._distance(word)):
+                    self._index.setdefault(variant, []).append(word)
+            self.counts[word] += count
+        self._cache.clear()
+
+    def correct(self, word: str) -> str:
+        """The most frequent dictionary word closest to `word`, or `word` when it is known or has no match."""
+        return self.suggest(word)[0]
+
+    def suggest(self, word: str) -> Tuple[str, float]:
+        """
+        (correction, confidence): confidence is 1.0 when `word` is left as is and
+        count / (count + required count) for a correction, so a correction only
+        clears 0.6 when its word is at least 1.5 times as frequent as required.
+        """
+        if len(word) < self.min_length or word in self.counts or word in self.known or not word.isalpha():
+            return word, 1.0
+        cached = self._cache.get(word)
+        if cached is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            cached = self._cache[word] = self._lookup(word)
+        return cached
+
+    def _required(self, distance: int) -> int:
+        return self.min_count * self.margin ** (distance - 1)
+
+    def _lookup(self, word: str) -> Tuple[str, float]:
+        limit = self._distance(word)
+        candidates = set(self._index.get(word, ()))
+        for variant in _deletes(word, limit):
+            if variant in self.counts:
+                candidates.add(variant)
+            candidates.update(self._index.get(variant, ()))
+
+        best, best_key, confidence = word, None, 1.0
+        for candidate in candidates:
+            count = self.counts[candidate]
+            if count < self.min_count:
+                continue
+            distance = _edit_distance(word, candidate, limit)
+            if distance > limit or count < self._required(distance):
+                continue
+            key = (distance, -count)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+                confidence = count / (count + self._required(distance))
+        return best, confidence
+
+
+class TopicNormalizer:
+    """Canonical topic and diagram type from noisy user input, without an LLM call."""
+
+    def __init__(self, vocabulary: TopicVocabulary, max_words: int = 50000, refresh_s: float = 300.0):
+        self.vocabulary = vocabulary
+        self.max_words = max_words
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._speller: Optional[SpellingCorrector] = None
+        self._loaded_at = 0.0
+
+    def _corrector(self) -> SpellingCorrector:
+        """The in-memory index, reloaded now and then to pick up words added by other workers."""
+        with self._lock:
+            if self._speller is None or time.monotonic() - self._loaded_at > self.refresh_s:
+                speller = SpellingCorrector()
+                seed = {w: speller.min_count for weights in KEYWORD_WEIGHTS.values() for w in weights}
+                speller.add(seed)
+                speller.known.update(STOPWORDS)
+                try:
+                    speller.add(self.vocabulary.load(self.max_words))
+                except Exception as e:
+                    logger.warning("Topic vocabulary unavailable: %s", e)
+                self._speller, self._loaded_at = speller, time.monotonic()
+            return self._speller
+
+    def classify(self, text: str, requested_type: Optional[str] = None) -> Tuple[str, float]:
+        """(diagram type, confidence in [0.5, 1]) for a topic and an optional requested type."""
+        scores = Counter({"mindmap": MINDMAP_PRIOR})
+        hint = (requested_type or "").strip().lower()
+        if hint in DIAGRAM_KEYS:
+            scores[hint] += EXPLICIT_WEIGHT
+        for dtype, pattern in _EXPLICIT:
+            if pattern.search(hint) or pattern.search(text):
+                scores[dtype] += EXPLICIT_WEIGHT
+        for dtype, name, request in _NAMED:
+            if name.fullmatch(hint) or request.search(text):
+                scores[dtype] += EXPLICIT_WEIGHT
+        for word in _TOKEN_RE.findall(text.lower()):
+            for dtype, weights in KEYWORD_WEIGHTS.items():
+                if word in weights:
+                    scores[dtype] += weights[word]
+
+        ranked = scores.most_common(2)
+        top_type, top = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        return top_type, top / (top + second)
+
+    def _topic_words(self, raw_topic: str) -> Tuple[List[str], float]:
+        """
+        Words of the topic with explicit diagram-type requests and their
+        connectors removed, and the share of the topic's words they keep.
+        """
+        text = raw_topic
+        for _, pattern in _EXPLICIT:
+            text = pattern.sub(" ", text)
+        for _, _, request in _NAMED:
+            text = request.sub(" ", text)
+        text = _GENERIC_HINT.sub(" ", text)
+        words = _TOKEN_RE.findall(text)
+        if text != raw_topic:
+            while words and words[0].lower() in _CONNECTORS:
+                words.pop(0)
+            while words and words[-1].lower() in _CONNECTORS:
+                words.pop()
+        total = sum(w.lower() not in _CONNECTORS for w in _TOKEN_RE.findall(raw_topic))
+        kept = sum(w.lower() not in _CONNECTORS for w in words)
+        if not words:
+            return _TOKEN_RE.findall(raw_topic), 0.0  # nothing but the request: the subject is unknown
+        return words, kept / total if total else 1.0
+
+    def normalize(self, raw_topic: str, requested_type: Optional[str] = None, max_words: int = 6) -> Normalized:
+        """
+        Corrected topic and diagram type; confidence is the lowest of the type
+        and spelling confidences and, when removing the type request took most
+        of the topic's words, 0.5 + half the share kept.
+        """
+        speller = self._corrector()
+        words, spelling = [], 1.0
+        for word in _TOKEN_RE.findall(raw_topic):
+            lowered = word.lower()
+            fixed, sure = (word, 1.0) if word.isupper() else speller.suggest(lowered)
+            words.append(word if fixed == lowered else fixed)
+            spelling = min(spelling, sure)
+        corrected = " ".join(words)
+
+        dtype, confidence = self.classify(corrected, requested_type)
+        topic_words, kept = self._topic_words(corrected)
+        if kept < 0.5:
+            confidence = min(confidence, 0.5 + kept / 2)
+        topic = title_case(topic_words[:max_words]) or "Topic"
+        return Normalized(topic, dtype, min(confidence, spelling))
+
+    def add_vocabulary(self, counts: Mapping[str, int], min_count: int = 2):
+        """Record document vocabulary (lower-case word counts) for spelling correction."""
+        kept = {w: c for w, c in counts.items() if c >= min_count and w.isalpha()}
+        if not kept:
+            return
+        self.vocabulary.add(kept)
+        with self._lock:
+            if self._speller is not None:
+                self._speller.add(kept)
+
+    def observe(self, topic: str, confirmed: bool = False, weight: int = 2):
+        """
+        Record a canonical topic; one topic counts as `weight` occurrences. Only
+        a topic the LLM normalizer `confirmed` adds new words: otherwise just
+        the words already in the dictionary are counted, so an uncorrected typo
+        never becomes a correction target.
+        """
+        words = Counter(w.lower() for w in _TOKEN_RE.findall(topic))
+        if not confirmed:
+            speller = self._corrector()
+            words = Counter({w: c for w, c in words.items() if speller.counts[w] > 0})
+        self.add_vocabulary({w: c * weight for w, c in words.items()})
+
+
+topic_normalizer = TopicNormalizer(TopicVocabulary(settings.topic_vocab_path))
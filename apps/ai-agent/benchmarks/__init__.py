@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the AI agent backend.
+
+Run from apps/ai-agent, e.g. `python -m benchmarks.query_many`.
+Each benchmark prints a JSON report to stdout so runs can be compared.
+"""
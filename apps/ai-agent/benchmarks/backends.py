@@ -0,0 +1,114 @@
+"""
+Vector backends exercised by the retrieval benchmark.
+
+All backends index the same chunk list with the same deterministic embedding
+and return chunk indices, best first.
+
+- exact:         brute-force cosine in NumPy (what Pinecone's exact top-k returns)
+- exact_rerank:  exact over-fetch + LocalReranker, as rag_chat does
+- chroma:        VectorStoreService on an in-memory Chroma client (HNSW)
+"""
+
+import asyncio
+import uuid
+from typing import Dict, List, Type
+
+import numpy as np
+
+from app.services.reranker import LocalReranker
+
+
+class Backend:
+    name = "base"
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def build(self, chunks: List):
+        raise NotImplementedError
+
+    def search(self, query: str, k: int) -> List[int]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ExactBackend(Backend):
+    name = "exact"
+
+    def build(self, chunks):
+        self.chunks = chunks
+        self.matrix = np.asarray(
+            self.embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32
+        )
+
+    def _top(self, qvec: np.ndarray, n: int) -> np.ndarray:
+        scores = self.matrix @ qvec
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query, k):
+        qvec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        return self._top(qvec, k).tolist()
+
+
+class ExactRerankBackend(ExactBackend):
+    name = "exact_rerank"
+    fetch_k = 30
+
+    def build(self, chunks):
+        super().build(chunks)
+        self.reranker = LocalReranker()
+
+    def search(self, query, k):
+        qvec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        order = self._top(qvec, self.fetch_k)
+        picked = self.reranker.rerank(
+            query, qvec, [self.chunks[i] for i in order], self.matrix[order], top_k=k
+        )
+        return [int(order[i]) for i in picked]
+
+
+class _AsyncEmbeddingAdapter:
+    """Expose the embedding_service interface VectorStoreService expects."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    async def embed_text(self, text):
+        return self.embeddings.embed_query(text)
+
+    async def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+
+class ChromaBackend(Backend):
+    name = "chroma"
+
+    def build(self, chunks):
+        import chromadb
+        from app.core.vector_store import VectorStoreService
+
+        self.store = VectorStoreService(client=chromadb.EphemeralClient())
+        self.store.embedding_service = _AsyncEmbeddingAdapter(self.embeddings)
+        self.collection = f"bench_{uuid.uuid4().hex[:12]}"
+        texts = [c.page_content for c in chunks]
+        metadatas = [{"source": str(c.metadata.get("source", "")), "chunk": i} for i, c in enumerate(chunks)]
+        ids = [f"c{i}" for i in range(len(chunks))]
+        for start in range(0, len(chunks), 1000):
+            end = start + 1000
+            asyncio.run(self.store.add_documents(self.collection, texts[start:end], metadatas[start:end], ids[start:end]))
+
+    def search(self, query, k):
+        results = asyncio.run(self.store.query_documents(self.collection, query, n_results=k))
+        return [int(r["metadata"]["chunk"]) for r in results]
+
+    def close(self):
+        self.store.delete_collection(self.collection)
+
+
+BACKENDS: Dict[str, Type[Backend]] = {
+    b.name: b for b in (ExactBackend, ExactRerankBackend, ChromaBackend)
+}
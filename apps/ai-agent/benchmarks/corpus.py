@@ -0,0 +1,123 @@
+"""
+Synthetic corpus with known relevant passages, plus a deterministic local embedding.
+
+Each topic owns a small set of keywords. Passages about a topic mix a few of its
+keywords with filler and with a keyword borrowed from another topic, so plain
+vector search is good but not perfect. Every query lists the ids of the passages
+that are relevant to it.
+"""
+
+import hashlib
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+FILLER = (
+    "the a of and to in is that for it as with was on be by this are from or "
+    "which an at have has one can all more also used such these into other"
+).split()
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "pe", "sa", "do", "gu"]
+
+
+@dataclass
+class Passage:
+    id: str
+    text: str
+    metadata: Dict[str, str]
+
+
+@dataclass
+class Query:
+    text: str
+    relevant: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Corpus:
+    passages: List[Passage]
+    queries: List[Query]
+
+    @property
+    def text(self) -> str:
+        """All passages as one document, separated by blank lines."""
+        return "\n\n".join(p.text for p in self.passages)
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4)))
+
+
+def build_corpus(
+    topics: int = 50,
+    passages_per_topic: int = 8,
+    sentences_per_passage: int = 4,
+    queries_per_topic: int = 2,
+    seed: int = 13,
+) -> Corpus:
+    rng = random.Random(seed)
+    vocab = [[_word(rng) for _ in range(8)] for _ in range(topics)]
+
+    passages: List[Passage] = []
+    by_topic: Dict[int, List[str]] = {}
+    for t in range(topics):
+        for j in range(passages_per_topic):
+            sentences = []
+            for _ in range(sentences_per_passage):
+                words = rng.sample(FILLER, 8) + rng.sample(vocab[t], 3)
+                words.append(rng.choice(vocab[rng.randrange(topics)]))
+                rng.shuffle(words)
+                sentences.append(" ".join(words).capitalize() + ".")
+            pid = f"t{t}_p{j}"
+            passages.append(Passage(pid, " ".join(sentences), {"source": f"topic_{t}_{j % 3}.txt"}))
+            by_topic.setdefault(t, []).append(pid)
+
+    queries = [
+        Query(" ".join(rng.sample(vocab[t], 3)), list(by_topic[t]))
+        for t in range(topics)
+        for _ in range(queries_per_topic)
+    ]
+    return Corpus(passages, queries)
+
+
+class HashEmbeddings:
+    """
+    Deterministic bag-of-words feature hashing, L2-normalized.
+
+    `noise` mixes in a per-text pseudo-random component so that vector ranking
+    is imperfect, like a real embedding model on out-of-vocabulary terms.
+    Exposes the LangChain Embeddings methods used by the services.
+    """
+
+    def __init__(self, dim: int = 256, noise: float = 0.35):
+        self.dim = dim
+        self.noise = noise
+
+    def _embed(self, text: str) -> List[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+        if self.noise:
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=4).digest(), "little")
+            jitter = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vec += self.noise * jitter / np.linalg.norm(jitter)
+            vec /= np.linalg.norm(vec) or 1.0
+        return vec.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
@@ -0,0 +1,227 @@
+"""
+Local Mermaid repair: how many invalid LLM outputs still need an LLM repair call.
+
+The corpus is built from the gold-standard diagrams of MindmapService, each
+broken in the ways LLM output usually is: code fences with commentary,
+<think> blocks, prose after the diagram, a missing or decorated header,
+labels with brackets, unclosed blocks, a mindmap written as flowchart edges,
+messages and relationships without their ": text", wrong state arrows.
+--mixed adds outputs with two breakages at once. --corpus replays a JSONL
+log of real outputs instead ({"kind", "raw"} per line, as written by
+settings.mermaid_repair_log).
+
+For every output, "before" is what MindmapService did without local repair
+(extract + validate; invalid means an LLM repair call) and "after" is the
+same with app.core.mermaid_repair in between.
+
+    python -m benchmarks.mermaid_repair --mixed 200 --out repair.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.mermaid_repair import repair
+from app.services.mindmap_service import DIAGRAM_TYPES, GOLD_STANDARD_EXAMPLES, MindmapService
+
+
+def _lines(code: str) -> List[str]:
+    return code.split("\n")
+
+
+def _fenced(code: str, kind: str) -> str:
+    return f"Sure! Here is the {kind} diagram you asked for:\n\n```mermaid\n{code}\n```\n\nLet me know if you need changes."
+
+
+def _think(code: str, kind: str) -> str:
+    return f"<think>\nThe user wants a {kind}. I should keep it short.\n</think>\n{code}"
+
+
+def _prose_after(code: str, kind: str) -> str:
+    return f"{code}\n\nThis diagram shows the main parts of the topic and how they relate to each other."
+
+
+def _header_extra(code: str, kind: str) -> str:
+    lines = _lines(code)
+    lines[0] = f"{lines[0].split()[0]} for the requested topic"
+    return "\n".join(lines)
+
+
+def _no_header(code: str, kind: str) -> str:
+    return "\n".join(_lines(code)[1:])
+
+
+def _tabs(code: str, kind: str) -> str:
+    return "\n".join(re.sub(r"^( {2})+", lambda m: "\t" * (len(m.group(0)) // 2), line) for line in _lines(code))
+
+
+def _unclosed_block(code: str, kind: str) -> str:
+    lines = _lines(code)
+    closers = [i for i, line in enumerate(lines) if line.strip() in ("}", "end")]
+    if not closers:
+        return code
+    del lines[closers[-1]]
+    return "\n".join(lines)
+
+
+def _mindmap_brackets(code: str, kind: str) -> str:
+    return code.replace("Bias in Data", "Bias[in (training) data]").replace("Hiring", "Hiring (CV screening")
+
+
+def _mindmap_edges(code: str, kind: str) -> str:
+    return "graph TD\n  A[AI Ethics] --> B[Principles]\n  A --> C[Challenges]\n  B --> D[Fairness]\n  C --> E[Bias]"
+
+
+def _mindmap_roots(code: str, kind: str) -> str:
+    lines = [line for line in _lines(code)[1:] if "root" not in line]
+    return "mindmap\n" + "\n".join(line[2:] for line in lines)
+
+
+def _flowchart_labels(code: str, kind: str) -> str:
+    return code.replace("[Take umbrella]", "[Take umbrella (if any)]").replace("{Is it raining?}", "{Is it raining (now)?}")
+
+
+def _flowchart_end(code: str, kind: str) -> str:
+    return code.replace("F[End]", "end").replace("[Go outside]", "[Go outside") + "\n    F -->"
+
+
+def _sequence_text(code: str, kind: str) -> str:
+    return re.sub(r": (?:Login Request|User Record)", "", code)
+
+
+def _sequence_undeclared(code: str, kind: str) -> str:
+    return "\n".join(line for line in _lines(code) if "participant" not in line) + "\n    loop Refresh\n    User->>AuthService"
+
+
+def _er_relations(code: str, kind: str) -> str:
+    return code.replace(" : places", "").replace("||--|{", "|--|{").replace("string email", "email")
+
+
+def _state_arrows(code: str, kind: str) -> str:
+    return code.replace("Idle --> Loading : fetchData", "Idle -> Loading fetchData").replace("Loading --> Success :", "Loading => Success :")
+
+
+BREAKAGES: Dict[str, Tuple[Tuple[str, ...], Callable[[str, str], str]]] = {
+    "fenced": ((), _fenced),
+    "think": ((), _think),
+    "prose_after": ((), _prose_after),
+    "header_extra": ((), _header_extra),
+    "no_header": ((), _no_header),
+    "tabs": ((), _tabs),
+    "unclosed_block": (("class", "er"), _unclosed_block),
+    "mindmap_brackets": (("mindmap",), _mindmap_brackets),
+    "mindmap_edges": (("mindmap",), _mindmap_edges),
+    "mindmap_roots": (("mindmap",), _mindmap_roots),
+    "flowchart_labels": (("flowchart",), _flowchart_labels),
+    "flowchart_end": (("flowchart",), _flowchart_end),
+    "sequence_text": (("sequence",), _sequence_text),
+    "sequence_undeclared": (("sequence",), _sequence_undeclared),
+    "er_relations": (("er",), _er_relations),
+    "state_arrows": (("state",), _state_arrows),
+}
+
+
+def build_corpus(mixed: int, seed: int) -> List[Dict]:
+    """One output per (kind, applicable breakage), plus `mixed` outputs with two breakages."""
+    corpus = []
+    applicable = {
+        kind: [name for name, (kinds, _) in BREAKAGES.items() if not kinds or kind in kinds]
+        for kind in DIAGRAM_TYPES
+    }
+    for kind, names in applicable.items():
+        for name in names:
+            corpus.append({"kind": kind, "breakage": name, "raw": BREAKAGES[name][1](GOLD_STANDARD_EXAMPLES[kind], kind)})
+    rng = random.Random(seed)
+    for _ in range(mixed):
+        kind = rng.choice(sorted(applicable))
+        # structural breakages first, text wrapping last
+        names = sorted(rng.sample(applicable[kind], 2), key=lambda n: bool(BREAKAGES[n][0]), reverse=True)
+        raw = GOLD_STANDARD_EXAMPLES[kind]
+        for name in names:
+            raw = BREAKAGES[name][1](raw, kind)
+        corpus.append({"kind": kind, "breakage": "+".join(names), "raw": raw})
+    return corpus
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [dict(json.loads(line), breakage="recorded") for line in f if line.strip()]
+
+
+def run(corpus: List[Dict]) -> Dict:
+    service = MindmapService()
+    per_kind: Dict[str, Counter] = defaultdict(Counter)
+    unrepaired: Counter = Counter()
+    fix_counts: List[int] = []
+    timings: List[float] = []
+
+    for record in corpus:
+        kind, keyword = record["kind"], DIAGRAM_TYPES[record["kind"]]
+        stats = per_kind[kind]
+        stats["outputs"] += 1
+        extracted = service._extract_mermaid(record["raw"], keyword, "Topic")
+        if service._is_valid(extracted, keyword, 3):
+            continue
+        stats["llm_repairs_before"] += 1
+
+        started = time.perf_counter()
+        result = repair(extracted, kind, "Topic")
+        timings.append(time.perf_counter() - started)
+        fix_counts.append(len(result.fixes))
+        if not (result.ok and service._is_valid(result.code, keyword, 3)):
+            stats["llm_repairs_after"] += 1
+            unrepaired[record["breakage"]] += 1
+
+    runs = []
+    for kind, stats in sorted(per_kind.items()):
+        runs.append({
+            "kind": kind,
+            "outputs": stats["outputs"],
+            "llm_repair_rate_before": round(stats["llm_repairs_before"] / stats["outputs"], 3),
+            "llm_repair_rate_after": round(stats["llm_repairs_after"] / stats["outputs"], 3),
+        })
+    total = sum(s["outputs"] for s in per_kind.values())
+    summary = {
+        "outputs": total,
+        "llm_repair_rate_before": round(sum(s["llm_repairs_before"] for s in per_kind.values()) / total, 3),
+        "llm_repair_rate_after": round(sum(s["llm_repairs_after"] for s in per_kind.values()) / total, 3),
+        "mean_fixes": round(float(np.mean(fix_counts)), 2) if fix_counts else 0.0,
+        "repair_p50_us": round(float(np.percentile(timings, 50)) * 1e6, 1) if timings else 0.0,
+        "repair_p95_us": round(float(np.percentile(timings, 95)) * 1e6, 1) if timings else 0.0,
+        "unrepaired_by_breakage": dict(unrepaired.most_common()),
+    }
+    return {"summary": summary, "runs": runs}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL of recorded outputs; default: the built-in broken gold examples")
+    parser.add_argument("--mixed", type=int, default=100, help="built-in outputs with two breakages each")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.mixed, args.seed)
+    result = run(corpus)
+    report = {
+        "benchmark": "mermaid_repair",
+        "config": {"corpus": args.corpus or "builtin", "mixed": None if args.corpus else args.mixed,
+                   "seed": args.seed, "python": platform.python_version()},
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+MindmapService latency: one-call fast path vs. the multi-call quality pipeline.
+
+Both modes run against a simulated LLM that sleeps for a log-normal latency
+per call (median --call-latency-ms) and answers from canned outputs: the
+normalizer JSON, research bullets, or the gold-standard diagram for the
+requested type. A fraction of generation outputs (--invalid-rate) is prose
+without a diagram, which fails validation and costs a repair call. Requests
+run concurrently; each is timed end to end. The diagram cache is off unless
+--cache is given; then each mode gets its own empty cache, so repeated topics
+after the first are hits.
+
+    python -m benchmarks.mindmap_latency --requests 200 --out mindmap.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.diagram_cache import DiagramCache
+from app.services.mindmap_service import DIAGRAM_TYPES, GOLD_STANDARD_EXAMPLES, MODES, MindmapService
+from app.services.topic_normalizer import TopicNormalizer, TopicVocabulary
+
+TOPICS = (
+    "Photosynthesis",
+    "Investment Banking",
+    "user login flow",
+    "library database schema",
+    "TCP handshake sequence",
+    "order lifecycle state",
+    "vehicle class hierarchy",
+    "The French Revolution",
+)
+
+
+class SimulatedLLM:
+    """Async stand-in for app.core.llm.generate_response with seeded latency and outputs."""
+
+    def __init__(self, median_ms: float, sigma: float, invalid_rate: float, seed: int):
+        self.median_s = median_ms / 1000
+        self.sigma = sigma
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, prompt: str, system_prompt: str = "") -> str:
+        self.calls += 1
+        await asyncio.sleep(self.median_s * self.random.lognormvariate(0, self.sigma))
+        if "JSON" in system_prompt:
+            topic = re.search(r'User input: "(.*)"', prompt).group(1)
+            return json.dumps({"topic": topic.title(), "diagram_type": "mindmap"})
+        if "bullets" in system_prompt:
+            return "- fact one\n- fact two\n- fact three\n- fact four"
+        if system_prompt.startswith("You are strict") and self.random.random() < self.invalid_rate:
+            return "Sure! Here is a diagram that covers the main ideas of the topic."
+        keyword = re.search(r"exactly: (\S+)", prompt).group(1)
+        dtype = next(k for k, v in DIAGRAM_TYPES.items() if v.split()[0] == keyword)
+        return GOLD_STANDARD_EXAMPLES[dtype]
+
+
+def _percentiles(values: List[float]) -> Dict:
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(values, 95)) * 1000, 1),
+        "mean_ms": round(float(np.mean(values)) * 1000, 1),
+    }
+
+
+async def _run_mode(mode: str, requests: int, llm: SimulatedLLM, tmp: str, cache: bool) -> Dict:
+    service = MindmapService(
+        llm=llm,
+        normalizer=TopicNormalizer(TopicVocabulary(f"{tmp}/{mode}-vocab.db")),
+        cache=DiagramCache(f"{tmp}/{mode}-cache.db") if cache else None,
+    )
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(topic: str):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await service.generate(topic, mode=mode)
+        except RuntimeError:
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(TOPICS[i % len(TOPICS)]) for i in range(requests)))
+    return {
+        "mode": mode,
+        "requests": requests,
+        "llm_calls_per_request": round(llm.calls / requests, 2),
+        "failures": failures,
+        **_percentiles(latencies),
+    }
+
+
+def run(requests: int, call_latency_ms: float, sigma: float, invalid_rate: float, seed: int, cache: bool) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [
+            asyncio.run(_run_mode(mode, requests, SimulatedLLM(call_latency_ms, sigma, invalid_rate, seed), tmp, cache))
+            for mode in MODES
+        ]
+    return {
+        "benchmark": "mindmap_latency",
+        "config": {"requests": requests, "call_latency_ms": call_latency_ms, "latency_sigma": sigma,
+                   "invalid_rate": invalid_rate, "seed": seed, "cache": cache, "python": platform.python_version()},
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--call-latency-ms", type=float, default=800.0, help="median simulated LLM call latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.35, help="log-normal spread of call latency")
+    parser.add_argument("--invalid-rate", type=float, default=0.1, help="fraction of generations that fail validation")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--cache", action="store_true", help="serve repeated topics from a diagram cache")
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("app.services.mindmap_service").setLevel(logging.ERROR)  # one warning per repair
+    report = run(args.requests, args.call_latency_ms, args.latency_sigma, args.invalid_rate, args.seed, args.cache)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
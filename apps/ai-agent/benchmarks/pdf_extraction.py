@@ -0,0 +1,118 @@
+"""
+PDF extraction throughput: sequential pypdf vs. the PageExtractor process pool.
+
+Generates a synthetic text PDF (default 300 pages), then extracts it once on
+the calling thread and once per pool size, reporting pages/s and speed-up.
+Pool runs are timed after a warm-up so worker start-up is not counted.
+
+    python -m benchmarks.pdf_extraction --pages 300 --workers 1,2,4 --out pdf.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.document_processor import extract_pdf_pages
+from app.core.extraction import PageExtractor
+
+WORDS = (
+    "cell energy protein membrane enzyme photosynthesis light chlorophyll glucose "
+    "atom bond reaction acid base equilibrium force mass velocity momentum wave "
+    "market price demand supply inflation policy loop array pointer stack queue"
+).split()
+
+
+def write_pdf(path: Path, pages: int, lines_per_page: int = 45, seed: int = 5):
+    """Write a minimal uncompressed PDF with `pages` pages of Helvetica text."""
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [f"Page {p + 1}."] + [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        ops = ["BT /F1 10 Tf 12 TL 50 800 Td"] + [f"({line}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def _timed(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(pages: int, workers: List[int], shard: int, rounds: int) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.pdf"
+        write_pdf(path, pages)
+
+        expected = extract_pdf_pages(str(path))
+        sequential = _timed(lambda: extract_pdf_pages(str(path)), rounds)
+        runs = [{"mode": "sequential", "workers": 0, "seconds": round(sequential, 3),
+                 "pages_per_s": round(pages / sequential, 1), "speedup": 1.0}]
+
+        for n in workers:
+            extractor = PageExtractor(workers=n, min_pages_per_shard=shard)
+            result = asyncio.run(extractor.extract(str(path)))  # warm-up: spawns the workers
+            assert result == expected, "pool extraction must match sequential output page for page"
+            seconds = _timed(lambda: asyncio.run(extractor.extract(str(path))), rounds)
+            extractor.close()
+            runs.append({"mode": "pool", "workers": n, "shards": len(extractor.shards(pages)),
+                         "seconds": round(seconds, 3), "pages_per_s": round(pages / seconds, 1),
+                         "speedup": round(sequential / seconds, 2)})
+
+    return {
+        "benchmark": "pdf_extraction",
+        "config": {"pages": pages, "min_pages_per_shard": shard, "rounds": rounds,
+                   "cpu_count": os.cpu_count(), "python": platform.python_version()},
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})))
+    parser.add_argument("--min-pages-per-shard", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    text = json.dumps(run(args.pages, workers, args.min_pages_per_shard, args.rounds), indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
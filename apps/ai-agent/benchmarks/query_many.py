@@ -0,0 +1,83 @@
+"""
+Throughput of VectorStoreService.query_many vs. one query_documents call per query.
+
+Uses an in-memory Chroma client and the deterministic fallback embeddings, so
+no API keys or network are needed.
+
+    python -m benchmarks.query_many --docs 5000 --queries 64
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import chromadb
+
+from app.core.vector_store import VectorStoreService
+
+WORDS = (
+    "cell energy protein membrane enzyme photosynthesis light chlorophyll glucose "
+    "atom bond reaction acid base equilibrium force mass velocity momentum wave "
+    "market price demand supply inflation policy loop array pointer stack queue"
+).split()
+
+
+def _sentence(rng: random.Random, n: int = 24) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+async def run(num_docs: int, num_queries: int, n_results: int, rounds: int) -> dict:
+    rng = random.Random(7)
+    store = VectorStoreService(client=chromadb.EphemeralClient())
+    collection = "bench_query_many"
+    store.delete_collection(collection)
+
+    texts = [_sentence(rng) for _ in range(num_docs)]
+    ids = [f"doc_{i}" for i in range(num_docs)]
+    metadatas = [{"source": f"file_{i % 20}.txt"} for i in range(num_docs)]
+    for start in range(0, num_docs, 1000):
+        end = start + 1000
+        await store.add_documents(collection, texts[start:end], metadatas=metadatas[start:end], ids=ids[start:end])
+
+    queries = [_sentence(rng, 8) for _ in range(num_queries)]
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for q in queries:
+            await store.query_documents(collection, q, n_results=n_results)
+    single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        await store.query_many(collection, queries, n_results=n_results)
+    batched = time.perf_counter() - t0
+
+    total = num_queries * rounds
+    store.delete_collection(collection)
+    return {
+        "benchmark": "query_many",
+        "docs": num_docs,
+        "queries": num_queries,
+        "rounds": rounds,
+        "n_results": n_results,
+        "single_qps": round(total / single, 1),
+        "batched_qps": round(total / batched, 1),
+        "speedup": round(single / batched, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--n-results", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.docs, args.queries, args.n_results, args.rounds))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Precision and latency of the local reranker vs. taking the vector top-k as-is.
+
+"before": top-k by cosine (what rag_chat used to send to the LLM).
+"after":  top-fetch_k by cosine, reranked locally down to k.
+
+    python -m benchmarks.rerank --fetch-k 30 --k 4
+"""
+
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.reranker import LocalReranker
+from benchmarks.corpus import HashEmbeddings, build_corpus
+
+
+def _percentile(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else 0.0
+
+
+def run(k: int, fetch_k: int, topics: int) -> dict:
+    corpus = build_corpus(topics=topics)
+    embeddings = HashEmbeddings()
+    matrix = np.asarray(embeddings.embed_documents([p.text for p in corpus.passages]), dtype=np.float32)
+    docs = [SimpleNamespace(page_content=p.text, metadata=p.metadata) for p in corpus.passages]
+    ids = [p.id for p in corpus.passages]
+    reranker = LocalReranker()
+
+    before, after, search_t, rerank_t = [], [], [], []
+    for query in corpus.queries:
+        relevant = set(query.relevant)
+        qvec = np.asarray(embeddings.embed_query(query.text), dtype=np.float32)
+
+        t0 = time.perf_counter()
+        order = np.argsort(-(matrix @ qvec))[:fetch_k]
+        search_t.append(time.perf_counter() - t0)
+        before.append(sum(ids[i] in relevant for i in order[:k]) / k)
+
+        t0 = time.perf_counter()
+        picked = reranker.rerank(query.text, qvec, [docs[i] for i in order], matrix[order], top_k=k)
+        rerank_t.append(time.perf_counter() - t0)
+        after.append(sum(ids[order[i]] in relevant for i in picked) / k)
+
+    return {
+        "benchmark": "rerank",
+        "passages": len(corpus.passages),
+        "queries": len(corpus.queries),
+        "k": k,
+        "fetch_k": fetch_k,
+        "precision_at_k_before": round(float(np.mean(before)), 4),
+        "precision_at_k_after": round(float(np.mean(after)), 4),
+        "search_ms_p50": _percentile(search_t, 50),
+        "rerank_ms_p50": _percentile(rerank_t, 50),
+        "rerank_ms_p99": _percentile(rerank_t, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=30)
+    parser.add_argument("--topics", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.k, args.fetch_k, args.topics), indent=2))
+
+
+if __name__ == "__main__":
+    main()
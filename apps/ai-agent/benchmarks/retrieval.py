@@ -0,0 +1,243 @@
+"""
+Offline retrieval benchmark: recall@k, MRR, latency and memory across vector
+backends and chunking settings.
+
+A synthetic corpus with known relevant passages is concatenated into one
+document, chunked through LangChainService (split_documents, or the
+small-to-big split), indexed in each backend with a deterministic local
+embedding, and queried. A chunk counts as a hit for every passage whose
+character range it overlaps.
+
+Each (backend, chunking) run starts a fresh interpreter, so its memory
+figures do not include earlier runs: rss_mb is the process RSS once the
+index is built and rss_growth_mb what chunking and indexing added to it.
+
+    python -m benchmarks.retrieval --backends exact,exact_rerank,chroma \\
+        --chunking 100:20,200:40,400:0,s2b --k 4 --out run.json
+    # run again and add the per-run deltas against a previous report
+    python -m benchmarks.retrieval --compare run.json --out run2.json
+"""
+
+import argparse
+import bisect
+import json
+import multiprocessing
+import platform
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.chunk_store import ChunkStore
+from app.core.config import settings
+from app.core.structure import StructuredSplitter
+from app.core.text_splitter import TokenSplitter
+from app.services.langchain_service import LangChainService
+from benchmarks.backends import BACKENDS
+from benchmarks.corpus import Corpus, HashEmbeddings, build_corpus
+
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    except ImportError:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _splitter_service(chunk_tokens: int, overlap_tokens: int, store_path: str) -> LangChainService:
+    """A LangChainService with only its splitting state; no API clients are created."""
+    svc = LangChainService.__new__(LangChainService)
+    svc.text_splitter = StructuredSplitter(TokenSplitter(chunk_tokens, overlap_tokens))
+    svc.parent_splitter = StructuredSplitter(TokenSplitter(settings.parent_chunk_tokens, 0))
+    svc.child_splitter = TokenSplitter(settings.child_chunk_tokens, 0)
+    svc.chunk_store = ChunkStore(store_path)
+    return svc
+
+
+class PassageLocator:
+    """Map chunk text back to the passages it overlaps."""
+
+    def __init__(self, corpus: Corpus):
+        self.text = corpus.text
+        self.starts, self.ends, self.ids = [], [], []
+        pos = 0
+        for p in corpus.passages:
+            self.starts.append(pos)
+            self.ends.append(pos + len(p.text))
+            self.ids.append(p.id)
+            pos += len(p.text) + 2
+
+    def passages(self, chunk_text: str) -> List[str]:
+        start = self.text.find(chunk_text)
+        if start < 0:
+            return []
+        end = start + len(chunk_text)
+        i = max(0, bisect.bisect_right(self.starts, start) - 1)
+        hits = []
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.ends[i] > start:
+                hits.append(self.ids[i])
+            i += 1
+        return hits
+
+
+def _chunk(spec: str, corpus: Corpus, store_path: str):
+    """Return (svc, chunks, small_to_big) for a chunking spec like '200:40' (tokens) or 's2b'."""
+    doc = Document(page_content=corpus.text, metadata={"source": "corpus.txt"})
+    if spec == "s2b":
+        svc = _splitter_service(settings.chunk_tokens, settings.chunk_overlap_tokens, store_path)
+        children, parents = svc.split_small_to_big([doc], "bench")
+        svc.chunk_store.put(parents)
+        return svc, children, True
+    size, overlap = (int(x) for x in spec.split(":"))
+    svc = _splitter_service(size, overlap, store_path)
+    return svc, svc.split_documents([doc]), False
+
+
+def run_one(backend_name: str, spec: str, corpus: Corpus, k: int, embeddings) -> Dict:
+    locator = PassageLocator(corpus)
+    with tempfile.TemporaryDirectory() as tmp:
+        rss_before = _rss_mb()
+        t0 = time.perf_counter()
+        svc, chunks, small_to_big = _chunk(spec, corpus, str(Path(tmp) / "chunks.db"))
+        backend = BACKENDS[backend_name](embeddings)
+        backend.build(chunks)
+        build_s = time.perf_counter() - t0
+        rss = _rss_mb()
+
+        recalls, rranks, latencies, context_chars = [], [], [], []
+        for query in corpus.queries:
+            t0 = time.perf_counter()
+            picked = [chunks[i] for i in backend.search(query.text, k)]
+            if small_to_big:
+                picked = svc.expand_windows(picked)
+            latencies.append(time.perf_counter() - t0)
+
+            relevant = set(query.relevant)
+            covered, first_hit = set(), 0
+            for rank, chunk in enumerate(picked, 1):
+                hits = relevant.intersection(locator.passages(chunk.page_content))
+                if hits and not first_hit:
+                    first_hit = rank
+                covered |= hits
+            recalls.append(len(covered) / len(relevant))
+            rranks.append(1.0 / first_hit if first_hit else 0.0)
+            context_chars.append(sum(len(c.page_content) for c in picked))
+        backend.close()
+
+    return {
+        "backend": backend_name,
+        "chunking": spec,
+        "chunks": len(chunks),
+        "k": k,
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(rranks)), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "latency_ms_p99": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "index_build_s": round(build_s, 3),
+        "rss_mb": rss,
+        "rss_growth_mb": round(rss - rss_before, 1),
+        "avg_context_chars": round(float(np.mean(context_chars)), 1),
+    }
+
+
+def _child(backend_name: str, spec: str, k: int, topics: int, seed: int, conn):
+    conn.send(run_one(backend_name, spec, build_corpus(topics=topics, seed=seed), k, HashEmbeddings()))
+    conn.close()
+
+
+def _isolated(backend_name: str, spec: str, k: int, topics: int, seed: int) -> Dict:
+    """run_one in a fresh interpreter (the corpus is rebuilt there from its seed)."""
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=_child, args=(backend_name, spec, k, topics, seed, child))
+    proc.start()
+    child.close()  # only the child's end stays open: recv() sees EOF if it dies
+    try:
+        return parent.recv()
+    except EOFError:
+        proc.join()
+        raise RuntimeError(f"{backend_name} / {spec} run failed (exit code {proc.exitcode})") from None
+    finally:
+        proc.join()
+
+
+def compare(current: Dict, previous: Dict) -> List[Dict]:
+    """Per (backend, chunking) deltas of every numeric metric, current - previous."""
+    prev = {(r["backend"], r["chunking"]): r for r in previous.get("runs", [])}
+    deltas = []
+    for run in current.get("runs", []):
+        base = prev.get((run["backend"], run["chunking"]))
+        if not base:
+            continue
+        delta = {"backend": run["backend"], "chunking": run["chunking"]}
+        for key, value in run.items():
+            if isinstance(value, (int, float)) and isinstance(base.get(key), (int, float)):
+                delta[key] = round(value - base[key], 4)
+        deltas.append(delta)
+    return deltas
+
+
+def run(backends: List[str], chunking: List[str], k: int, topics: int, seed: int) -> Dict:
+    corpus = build_corpus(topics=topics, seed=seed)
+    runs = [_isolated(b, spec, k, topics, seed) for spec in chunking for b in backends]
+    return {
+        "benchmark": "retrieval",
+        "config": {
+            "backends": backends,
+            "chunking": chunking,
+            "k": k,
+            "topics": topics,
+            "seed": seed,
+            "passages": len(corpus.passages),
+            "queries": len(corpus.queries),
+            "corpus_chars": len(corpus.text),
+            "python": platform.python_version(),
+        },
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--chunking", default="100:20,200:40,400:0,s2b", help="chunk:overlap in tokens, or s2b")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report; the new report adds deltas against it")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends: {unknown}; choose from {list(BACKENDS)}")
+
+    chunking = [c.strip() for c in args.chunking.split(",") if c.strip()]
+    for spec in chunking:
+        if spec == "s2b":
+            continue
+        try:
+            size, overlap = (int(x) for x in spec.split(":"))
+            TokenSplitter(size, overlap)
+        except ValueError as e:
+            parser.error(f"bad chunking spec {spec!r} (chunk:overlap in tokens, or s2b): {e}")
+
+    report = run(backends, chunking, args.k, args.topics, args.seed)
+    if args.compare:
+        report["delta_vs_previous"] = compare(report, json.loads(Path(args.compare).read_text()))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
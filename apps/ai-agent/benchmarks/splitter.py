@@ -0,0 +1,111 @@
+"""
+Splitter throughput: TokenSplitter vs. LangChain's RecursiveCharacterTextSplitter.
+
+Both split the same synthetic corpus at roughly matching sizes (the default
+200-token chunks with 40-token overlap against the old 1000/200-character
+settings), in three layouts: `paragraphs` (blank-line separated passages),
+`lines` (PDF-style ~80-character lines) and `dense` (no line breaks at all).
+Reports MB/s and chunk counts; `token_spans` measures the offset generator
+alone, `token_text` also slices the chunk strings.
+
+    python -m benchmarks.splitter --mb 8 --layouts paragraphs,lines,dense --out splitter.json
+"""
+
+import argparse
+import json
+import platform
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.core.text_splitter import TokenSplitter
+from benchmarks.corpus import build_corpus
+
+
+LAYOUTS = ("paragraphs", "lines", "dense")
+
+
+def _corpus_text(mb: float, layout: str = "paragraphs") -> str:
+    base = build_corpus(topics=50).text
+    if layout == "lines":
+        base = re.sub(r"(.{80}) ", r"\1\n", base.replace("\n\n", " \n"))
+    elif layout == "dense":
+        base = base.replace("\n\n", " ")
+    target = int(mb * 1024 * 1024)
+    return (base * (target // len(base) + 1))[:target]
+
+
+def _measure(name: str, fn: Callable[[str], int], text: str, rounds: int) -> Dict:
+    best, chunks = float("inf"), 0
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        chunks = fn(text)
+        best = min(best, time.perf_counter() - t0)
+    mb = len(text.encode("utf-8")) / 2 ** 20
+    return {"splitter": name, "seconds": round(best, 3), "mb_per_s": round(mb / best, 2), "chunks": chunks}
+
+
+def run(mb: float, layouts: List[str], chunk_tokens: int, overlap_tokens: int,
+        chunk_chars: int, overlap_chars: int, rounds: int) -> Dict:
+    splitter = TokenSplitter(chunk_tokens, overlap_tokens)
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        recursive = RecursiveCharacterTextSplitter(chunk_size=chunk_chars, chunk_overlap=overlap_chars)
+    except ImportError:
+        recursive = None
+
+    runs = []
+    for layout in layouts:
+        text = _corpus_text(mb, layout)
+        rows = [
+            _measure("token_spans", lambda t: sum(1 for _ in splitter.spans(t)), text, rounds),
+            _measure("token_text", lambda t: len(splitter.split_text(t)), text, rounds),
+        ]
+        if recursive is not None:
+            rows.append(_measure("recursive_character", lambda t: len(recursive.split_text(t)), text, rounds))
+            for r in rows:
+                r["speedup_vs_recursive"] = round(r["mb_per_s"] / rows[-1]["mb_per_s"], 2)
+        runs.extend({"layout": layout, **r} for r in rows)
+
+    return {
+        "benchmark": "splitter",
+        "config": {
+            "mb": mb,
+            "chunk_tokens": chunk_tokens,
+            "overlap_tokens": overlap_tokens,
+            "chunk_chars": chunk_chars,
+            "overlap_chars": overlap_chars,
+            "rounds": rounds,
+            "python": platform.python_version(),
+        },
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=8)
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--overlap-chars", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    layouts = [l.strip() for l in args.layouts.split(",") if l.strip()]
+    unknown = [l for l in layouts if l not in LAYOUTS]
+    if unknown:
+        parser.error(f"unknown layouts: {unknown}; choose from {list(LAYOUTS)}")
+
+    report = run(args.mb, layouts, args.chunk_tokens, args.overlap_tokens, args.chunk_chars, args.overlap_chars, args.rounds)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Batch vs. streaming ingestion of a PDF: peak memory and time to first upsert.
+
+Generates a synthetic text PDF per size, then ingests it through
+LangChainService with a deterministic local embedding and an in-memory index
+that simulates upsert latency. "batch" extracts every page, then calls
+ingest_documents (split everything, then embed and upsert); "streaming" feeds
+PageExtractor.iter_pages into ingest_stream, so pages are split, embedded and
+upserted while later shards are still being extracted.
+
+Peak memory is Python allocations in the ingesting process (tracemalloc);
+page extraction itself runs in the worker pool in both modes.
+
+    python -m benchmarks.streaming_ingest --pages 100,400 --out streaming.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from app.core.chunk_store import ChunkStore
+from app.core.config import settings
+from app.core.document_manifest import DocumentManifest
+from app.core.extraction import PageExtractor
+from app.core.structure import StructuredSplitter
+from app.core.text_splitter import TokenSplitter
+from app.services.langchain_service import LangChainService
+from app.services.pinecone_writer import PineconeWriter
+from benchmarks.corpus import HashEmbeddings
+from benchmarks.pdf_extraction import write_pdf
+
+MODES = ("batch", "streaming")
+
+
+class _LatencyIndex:
+    """Counts upserted vectors and records when the first upsert landed."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.vectors = 0
+        self.first_upsert: Optional[float] = None
+
+    def upsert(self, vectors, namespace):
+        time.sleep(self.latency_s)
+        if self.first_upsert is None:
+            self.first_upsert = time.perf_counter()
+        self.vectors += len(vectors)
+
+    def delete(self, ids, namespace):
+        pass
+
+
+def _service(tmp: Path, index: _LatencyIndex) -> LangChainService:
+    """A LangChainService with local stores and a fake index; no API clients are created."""
+    svc = LangChainService.__new__(LangChainService)
+    svc.text_splitter = StructuredSplitter(TokenSplitter(settings.chunk_tokens, settings.chunk_overlap_tokens))
+    svc.parent_splitter = StructuredSplitter(TokenSplitter(settings.parent_chunk_tokens, 0))
+    svc.child_splitter = TokenSplitter(settings.child_chunk_tokens, 0)
+    svc.chunk_store = ChunkStore(str(tmp / "chunks.db"))
+    svc.manifest = DocumentManifest(str(tmp / "manifest.db"))
+    svc.writer = PineconeWriter(
+        index, HashEmbeddings(),
+        embed_batch_size=settings.pinecone_embed_batch_size,
+        upsert_batch_size=settings.pinecone_upsert_batch_size,
+        max_concurrency=settings.pinecone_upsert_concurrency,
+    )
+    return svc
+
+
+async def _ingest(mode: str, svc: LangChainService, extractor: PageExtractor, path: Path) -> int:
+    metadata = {"source": path.name}
+    if mode == "batch":
+        pages = await extractor.extract(str(path))
+        docs = [Document(page_content=text, metadata={**metadata, "page": n}) for n, text in pages]
+        return len(await svc.ingest_documents(docs, "bench"))
+
+    async def batches():
+        async for shard in extractor.iter_pages(str(path)):
+            yield [Document(page_content=text, metadata={**metadata, "page": n}) for n, text in shard]
+
+    return len(await svc.ingest_stream(batches(), "bench"))
+
+
+def run_one(mode: str, pdf: Path, extractor: PageExtractor, latency_ms: float) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _LatencyIndex(latency_ms / 1000)
+        svc = _service(Path(tmp), index)
+        tracemalloc.start()
+        started = time.perf_counter()
+        chunks = asyncio.run(_ingest(mode, svc, extractor, pdf))
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "mode": mode,
+        "chunks": chunks,
+        "vectors": index.vectors,
+        "first_upsert_s": round(index.first_upsert - started, 3) if index.first_upsert else None,
+        "total_s": round(total, 3),
+        "peak_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def run(pages: List[int], workers: int, shard: int, latency_ms: float) -> Dict:
+    runs = []
+    extractor = PageExtractor(workers=workers, min_pages_per_shard=shard)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in pages:
+            pdf = Path(tmp) / f"bench-{n}.pdf"
+            write_pdf(pdf, n)
+            asyncio.run(extractor.extract(str(pdf)))  # warm-up: spawns the workers
+            for mode in MODES:
+                runs.append({"pages": n, **run_one(mode, pdf, extractor, latency_ms)})
+    extractor.close()
+    return {
+        "benchmark": "streaming_ingest",
+        "config": {"workers": extractor.workers, "min_pages_per_shard": shard, "upsert_latency_ms": latency_ms,
+                   "embed_batch_size": settings.pinecone_embed_batch_size,
+                   "small_to_big": settings.small_to_big, "cpu_count": os.cpu_count(),
+                   "python": platform.python_version()},
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="100,400")
+    parser.add_argument("--workers", type=int, default=0, help="extraction workers (0 = one per core)")
+    parser.add_argument("--min-pages-per-shard", type=int, default=25)
+    parser.add_argument("--upsert-latency-ms", type=float, default=20.0)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    pages = [int(p) for p in args.pages.split(",") if p.strip()]
+    text = json.dumps(run(pages, args.workers, args.min_pages_per_shard, args.upsert_latency_ms), indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Peak memory of concurrent document uploads: buffered vs. streamed spooling.
+
+Each run starts a fresh interpreter, builds `--files` UploadFile objects the
+way Starlette hands them to the route (a spooled temporary file per part) and
+saves them concurrently either by reading each upload whole and copying it to
+a temp file (the old `_read_file_content` path) or through the streaming
+`_save_upload` used by /api/documents/upload. Reports peak Python allocations
+(tracemalloc) and the peak RSS growth of the process.
+
+    python -m benchmarks.upload_memory --files 10 --size-mb 9 --out upload.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MODES = ("buffered", "streaming")
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _uploads(count: int, size: int):
+    from starlette.datastructures import UploadFile
+
+    block = os.urandom(1024 * 1024)
+    files = []
+    for i in range(count):
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        remaining = size
+        while remaining > 0:
+            spool.write(block[:remaining])
+            remaining -= len(block)
+        spool.seek(0)
+        files.append(UploadFile(spool, size=size, filename=f"doc_{i}.pdf"))
+    return files
+
+
+async def _buffered(file, dest_dir: Path):
+    content = await file.read()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=dest_dir) as tmp:
+        tmp.write(content)
+
+
+async def _run_mode(mode: str, count: int, size: int, workdir: str) -> Dict:
+    from app.api.routes.documents import _save_upload
+
+    files = _uploads(count, size)
+    dest = Path(workdir)
+    rss_before = _peak_rss_mb()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if mode == "buffered":
+        await asyncio.gather(*[_buffered(f, dest) for f in files])
+    else:
+        await asyncio.gather(*[_save_upload(f, dest / f"job_{i}", i) for i, f in enumerate(files)])
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "tracemalloc_peak_mb": round(peak / 2 ** 20, 2),
+        "peak_rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+    }
+
+
+def _child(mode: str, count: int, size: int, conn):
+    with tempfile.TemporaryDirectory() as workdir:
+        conn.send(asyncio.run(_run_mode(mode, count, size, workdir)))
+    conn.close()
+
+
+def run(count: int, size_mb: float) -> Dict:
+    size = int(size_mb * 1024 * 1024)
+    ctx = multiprocessing.get_context("spawn")
+    runs: List[Dict] = []
+    for mode in MODES:
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_child, args=(mode, count, size, child))
+        proc.start()
+        child.close()  # only the child's end stays open: recv() sees EOF if it dies
+        try:
+            runs.append(parent.recv())
+        except EOFError:
+            proc.join()
+            raise RuntimeError(f"{mode} run failed (exit code {proc.exitcode})") from None
+        proc.join()
+    return {
+        "benchmark": "upload_memory",
+        "config": {"files": count, "size_mb": size_mb, "python": platform.python_version()},
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-mb", type=float, default=9)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    text = json.dumps(run(args.files, args.size_mb), indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from app.core.text_splitter import MAX_CHARS_PER_TOKEN, TokenSplitter
+
+
+def _check_bounded(text: str, chunk_tokens: int = 200, overlap_tokens: int = 40):
+    splitter = TokenSplitter(chunk_tokens, overlap_tokens)
+    spans = list(splitter.spans(text))
+    assert len(spans) > 1
+    for span in spans:
+        assert span.end - span.start <= chunk_tokens * MAX_CHARS_PER_TOKEN
+        assert span.tokens <= chunk_tokens
+    assert spans[0].start == 0 and spans[-1].end == len(text)
+
+
+def test_whitespace_free_text_is_bounded():
+    _check_bounded("x" * 100000)
+
+
+def test_cjk_text_is_bounded():
+    _check_bounded("这是一个测试句子。" * 5000)
+
+
+def test_running_text_is_unchanged_by_the_char_bound():
+    text = " ".join(["lorem ipsum dolor sit amet"] * 2000)
+    spans = list(TokenSplitter(200, 40).spans(text))
+    assert all(190 <= span.tokens <= 200 for span in spans[:-1])
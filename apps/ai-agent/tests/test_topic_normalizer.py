@@ -0,0 +1,40 @@
+import pytest
+
+from app.core.config import settings
+from app.services.topic_normalizer import TopicNormalizer, TopicVocabulary
+
+
+@pytest.fixture
+def normalizer(tmp_path):
+    return TopicNormalizer(TopicVocabulary(str(tmp_path / "vocabulary.db")))
+
+
+@pytest.mark.parametrize("raw, topic, diagram_type", [
+    ("Finite State Machine", "Finite State Machine", "state"),
+    ("Entity Relationship Model", "Entity Relationship Model", "er"),
+])
+def test_type_names_that_are_the_subject_are_kept(normalizer, raw, topic, diagram_type):
+    result = normalizer.normalize(raw)
+    assert (result.topic, result.diagram_type) == (topic, diagram_type)
+
+
+def test_ambiguous_acronym_falls_back_to_the_llm(normalizer):
+    result = normalizer.normalize("ER visits in hospitals")
+    assert result.topic == "ER Visits in Hospitals"
+    assert result.confidence < settings.topic_confidence_threshold
+
+
+@pytest.mark.parametrize("raw, topic, diagram_type", [
+    ("traffic light as a state machine", "Traffic Light", "state"),
+    ("state machine of a vending machine", "Vending Machine", "state"),
+    ("ERD for a hospital", "Hospital", "er"),
+    ("login flowchart", "Login", "flowchart"),
+])
+def test_explicit_requests_are_removed_from_the_topic(normalizer, raw, topic, diagram_type):
+    result = normalizer.normalize(raw)
+    assert (result.topic, result.diagram_type) == (topic, diagram_type)
+    assert result.confidence >= settings.topic_confidence_threshold
+
+
+def test_a_topic_that_is_only_a_type_request_is_not_confident(normalizer):
+    assert normalizer.normalize("er diagram").confidence < settings.topic_confidence_threshold